@@ -12,3 +12,8 @@ python manage.py collectstatic --noinput
 # Run migrations
 python manage.py migrate --noinput
 
+# Create the shared cache table (only does anything with CACHE_BACKEND=db)
+python manage.py createcachetable
+
+# Report settings unfit for production (warnings only, the build goes on)
+python manage.py check --deploy
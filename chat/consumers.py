@@ -0,0 +1,143 @@
+"""
+WebSocket chat, served by config/asgi.py.
+
+A connection to /ws/chat/offer/<offer id>/ joins the offer's channel layer
+group. The buyer and the seller can both connect, from any number of tabs.
+Clients send {"type": "message", "content": "..."}. The message is saved
+with services.chat_service.send_message, which pushes it to every connection
+in the group, the sender's included:
+
+    {"type": "chat.message", "message": {"id": ..., "content": ..., ...}}
+
+Problems are reported as {"type": "error", "error": "..."}.
+"""
+import asyncio
+import json
+import logging
+import re
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import aget_user
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.http.cookie import parse_cookie
+
+from offers.models import Offer
+from services.chat_service import offer_group, send_message
+from utils.channel_layers import get_channel_layer
+
+logger = logging.getLogger(__name__)
+
+# Close codes sent before accepting refuse the handshake (HTTP 403)
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+
+
+async def authenticate(scope):
+    """The user of the session cookie sent with the handshake (AnonymousUser without one)"""
+    headers = dict(scope.get('headers') or [])
+    cookies = parse_cookie(headers.get(b'cookie', b'').decode('latin-1'))
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore(cookies.get(settings.SESSION_COOKIE_NAME))
+    return await aget_user(SimpleNamespace(session=session))
+
+
+def origin_allowed(scope):
+    """
+    Browsers send cookies with cross-site WebSocket handshakes, so the Origin
+    must be this host or a trusted origin, as for CSRF-protected forms.
+    """
+    headers = dict(scope.get('headers') or [])
+    origin = headers.get(b'origin', b'').decode('latin-1')
+    if not origin:
+        return True  # Not a browser
+    if origin in getattr(settings, 'CSRF_TRUSTED_ORIGINS', []):
+        return True
+    return urlsplit(origin).netloc == headers.get(b'host', b'').decode('latin-1')
+
+
+class ChatConsumer:
+    def __init__(self, scope, receive, send, offer_id):
+        self.scope = scope
+        self.receive = receive
+        self.send = send
+        self.offer_id = offer_id
+
+    async def __call__(self):
+        event = await self.receive()
+        if event['type'] != 'websocket.connect':
+            return
+        if not origin_allowed(self.scope):
+            return await self.close(CLOSE_FORBIDDEN)
+
+        self.user = await authenticate(self.scope)
+        if not self.user.is_authenticated:
+            return await self.close(CLOSE_FORBIDDEN)
+        self.offer = await Offer.objects.select_related('listing').filter(pk=self.offer_id).afirst()
+        if self.offer is None:
+            return await self.close(CLOSE_NOT_FOUND)
+        participants = {self.offer.buyer_id, self.offer.listing.seller_id}
+        if self.user.id not in participants:
+            return await self.close(CLOSE_FORBIDDEN)
+        peer_id = (participants - {self.user.id} or {self.user.id}).pop()
+        self.peer = await User.objects.aget(pk=peer_id)
+
+        await self.send({'type': 'websocket.accept'})
+        layer = get_channel_layer()
+        channel = layer.new_channel()
+        layer.group_add(offer_group(self.offer.id), channel)
+        forwarder = asyncio.create_task(self.forward(layer, channel))
+        try:
+            while True:
+                event = await self.receive()
+                if event['type'] == 'websocket.disconnect':
+                    break
+                if event['type'] == 'websocket.receive':
+                    await self.handle(event.get('text'))
+        finally:
+            forwarder.cancel()
+            layer.close_channel(channel)
+
+    async def forward(self, layer, channel):
+        """Pass group events on to the client"""
+        while True:
+            event = await layer.receive(channel)
+            await self.send_json(event)
+
+    async def handle(self, text):
+        try:
+            data = json.loads(text or '')
+        except ValueError:
+            return await self.send_json({'type': 'error', 'error': 'Expected JSON'})
+        if not isinstance(data, dict) or data.get('type') != 'message':
+            return await self.send_json({'type': 'error', 'error': 'Unknown message type'})
+        try:
+            # The saved message reaches this client through the group
+            await sync_to_async(send_message)(self.user, self.peer, str(data.get('content') or ''), self.offer)
+        except ValidationError as e:
+            await self.send_json({'type': 'error', 'error': ' '.join(e.messages)})
+
+    async def send_json(self, data):
+        await self.send({'type': 'websocket.send', 'text': json.dumps(data)})
+
+    async def close(self, code):
+        await self.send({'type': 'websocket.close', 'code': code})
+
+
+websocket_urlpatterns = [
+    (re.compile(r'^/ws/chat/offer/(?P<offer_id>\d+)/$'), ChatConsumer),
+]
+
+
+async def websocket_application(scope, receive, send):
+    """Route a WebSocket connection to its consumer"""
+    for pattern, consumer in websocket_urlpatterns:
+        match = pattern.match(scope['path'])
+        if match:
+            return await consumer(scope, receive, send, **{k: int(v) for k, v in match.groupdict().items()})()
+    await receive()
+    await send({'type': 'websocket.close', 'code': CLOSE_NOT_FOUND})
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:18
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0002_keyset_pagination_indexes'),
+        ('offers', '0002_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['offer', 'id'], name='chat_messag_offer_i_6ff548_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['sender', 'receiver', 'id'], name='chat_messag_sender__ee95ec_idx'),
+        ),
+    ]
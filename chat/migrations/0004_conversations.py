@@ -0,0 +1,115 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def create_conversations(apps, schema_editor):
+    """One conversation per (user pair, offer) of the existing messages, with inbox state"""
+    Message = apps.get_model('chat', 'Message')
+    Conversation = apps.get_model('chat', 'Conversation')
+    ConversationParticipant = apps.get_model('chat', 'ConversationParticipant')
+
+    conversations = {}
+    for message in Message.objects.order_by('id').iterator(chunk_size=2000):
+        user_a, user_b = sorted((message.sender_id, message.receiver_id))
+        state = conversations.setdefault((user_a, user_b, message.offer_id), {'unread': {user_a: 0, user_b: 0}})
+        state['last'] = message
+        if not message.is_read:
+            state['unread'][message.receiver_id] += 1
+
+    for (user_a, user_b, offer_id), state in conversations.items():
+        last = state['last']
+        conversation = Conversation.objects.create(
+            user_a_id=user_a,
+            user_b_id=user_b,
+            offer_id=offer_id,
+            last_message=last,
+            last_message_preview=last.content[:200],
+            last_message_at=last.timestamp,
+        )
+        ConversationParticipant.objects.bulk_create([
+            ConversationParticipant(
+                conversation=conversation, user_id=user, other_user_id=other,
+                unread_count=state['unread'][user], last_message_at=last.timestamp,
+            )
+            for user, other in {(user_a, user_b), (user_b, user_a)}
+        ])
+        messages = Message.objects.filter(offer_id=offer_id, sender_id__in=[user_a, user_b], receiver_id__in=[user_a, user_b])
+        messages.update(conversation=conversation)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('chat', '0003_chat_history_indexes'),
+        ('offers', '0002_keyset_pagination_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversationParticipant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unread_count', models.PositiveIntegerField(default=0)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Conversation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_message_preview', models.CharField(blank=True, max_length=200)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('last_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='chat.message')),
+                ('offer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='conversations', to='offers.offer')),
+                ('user_a', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('user_b', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='conversation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='chat.conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['conversation', 'id'], name='chat_messag_convers_0a488e_idx'),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='conversation',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participants', to='chat.conversation'),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='other_user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='conversationparticipant',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversation_memberships', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('offer__isnull', False)), fields=('user_a', 'user_b', 'offer'), name='unique_offer_conversation'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversation',
+            constraint=models.UniqueConstraint(condition=models.Q(('offer__isnull', True)), fields=('user_a', 'user_b'), name='unique_direct_conversation'),
+        ),
+        migrations.AddIndex(
+            model_name='conversationparticipant',
+            index=models.Index(fields=['user', '-last_message_at', '-id'], name='chat_conver_user_id_8aeded_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='conversationparticipant',
+            constraint=models.UniqueConstraint(fields=('conversation', 'user'), name='unique_conversation_participant'),
+        ),
+        migrations.RunPython(create_conversations, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,69 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
 from offers.models import Offer
 
+class Conversation(models.Model):
+    """
+    The messages between two users, about one offer or (offer=None) in general.
+    user_a is always the participant with the lower id, so a pair has one key.
+    The last message is denormalized here for the inbox.
+    """
+    user_a = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    user_b = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    offer = models.ForeignKey(Offer, on_delete=models.CASCADE, related_name='conversations', null=True, blank=True)
+    last_message = models.ForeignKey('Message', on_delete=models.SET_NULL, related_name='+', null=True, blank=True)
+    last_message_preview = models.CharField(max_length=200, blank=True)
+    last_message_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user_a', 'user_b', 'offer'], condition=models.Q(offer__isnull=False), name='unique_offer_conversation'),
+            models.UniqueConstraint(fields=['user_a', 'user_b'], condition=models.Q(offer__isnull=True), name='unique_direct_conversation'),
+        ]
+
+    def __str__(self):
+        return f"Conversation between {self.user_a_id} and {self.user_b_id}" + (f" about offer {self.offer_id}" if self.offer_id else "")
+
+class ConversationParticipant(models.Model):
+    """A user's inbox row for a conversation, with their unread count"""
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='participants')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='conversation_memberships')
+    other_user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    unread_count = models.PositiveIntegerField(default=0)
+    # Copy of Conversation.last_message_at, so the inbox is one index range
+    last_message_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['conversation', 'user'], name='unique_conversation_participant'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-last_message_at', '-id']),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} in conversation {self.conversation_id}"
+
 class Message(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_messages')
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_messages')
     offer = models.ForeignKey(Offer, on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
+    conversation = models.ForeignKey(Conversation, on_delete=models.CASCADE, related_name='messages', null=True, blank=True)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
     is_read = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender', 'timestamp', 'id']),
+            models.Index(fields=['receiver', 'timestamp', 'id']),
+            # Chat history pages, newest first by id (services/chat_service.py)
+            models.Index(fields=['offer', 'id']),
+            models.Index(fields=['sender', 'receiver', 'id']),
+            models.Index(fields=['conversation', 'id']),
+        ]
+
     def __str__(self):
         return f"Message from {self.sender.username} to {self.receiver.username}"
@@ -1,5 +1,6 @@
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Message
+from .models import ConversationParticipant, Message
 
 class MessageSerializer(serializers.ModelSerializer):
     sender_name = serializers.ReadOnlyField(source='sender.username')
@@ -13,3 +14,25 @@ class MessageSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         validated_data['sender'] = self.context['request'].user
         return super().create(validated_data)
+
+class ConversationSerializer(serializers.ModelSerializer):
+    """An inbox row; `id` is the conversation's"""
+    id = serializers.ReadOnlyField(source='conversation_id')
+    other_user_name = serializers.ReadOnlyField(source='other_user.username')
+    offer = serializers.ReadOnlyField(source='conversation.offer_id')
+    listing_title = serializers.SerializerMethodField()
+    last_message_preview = serializers.ReadOnlyField(source='conversation.last_message_preview')
+    chat_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ConversationParticipant
+        fields = ['id', 'other_user', 'other_user_name', 'offer', 'listing_title', 'last_message_preview', 'last_message_at', 'unread_count', 'chat_url']
+
+    def get_listing_title(self, obj):
+        offer = obj.conversation.offer
+        return offer.listing.title if offer else None
+
+    def get_chat_url(self, obj):
+        if obj.conversation.offer_id:
+            return reverse('chat_with_user', args=[obj.other_user_id, obj.conversation.offer_id])
+        return reverse('chat_with_user', args=[obj.other_user_id])
@@ -1,3 +1,212 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from chat.models import Conversation, ConversationParticipant, Message
+from listings.models import Listing
+from offers.models import Offer
+from services.chat_service import PREVIEW_LENGTH, mark_messages_read, send_message
+
+
+class ChatParticipantTests(TestCase):
+    """Only an offer's buyer and seller may chat about it"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+        self.other = User.objects.create_user('other', password='pass')
+        listing = Listing.objects.create(
+            title='Used phone', description='A used phone in good condition.',
+            price=100, seller=self.seller, status='approved',
+        )
+        self.offer = Offer.objects.create(listing=listing, buyer=self.buyer, amount=90)
+
+    def test_buyer_and_seller_can_chat_about_offer(self):
+        send_message(self.buyer, self.seller, 'Is it still available?', self.offer)
+        send_message(self.seller, self.buyer, 'Yes', self.offer)
+        self.assertEqual(Message.objects.filter(offer=self.offer).count(), 2)
+
+    def test_outsider_cannot_message_about_offer(self):
+        with self.assertRaises(PermissionDenied):
+            send_message(self.other, self.seller, 'Hello', self.offer)
+        # A participant cannot pull an outsider into the offer's chat either
+        with self.assertRaises(PermissionDenied):
+            send_message(self.buyer, self.other, 'Hello', self.offer)
+        self.assertFalse(Message.objects.exists())
+        self.assertFalse(Conversation.objects.exists())
+
+    def test_direct_chat_needs_an_offer_between_users(self):
+        send_message(self.buyer, self.seller, 'Hi')
+        with self.assertRaises(PermissionDenied):
+            send_message(self.other, self.seller, 'Hi')
+
+    def test_api_rejects_outsider(self):
+        client = APIClient()
+        client.force_authenticate(self.other)
+        response = client.post('/api/chat/', {
+            'receiver': self.seller.id, 'offer': self.offer.id, 'content': 'Hello',
+        })
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Message.objects.exists())
+
+    def test_api_accepts_participant(self):
+        client = APIClient()
+        client.force_authenticate(self.buyer)
+        response = client.post('/api/chat/', {
+            'receiver': self.seller.id, 'offer': self.offer.id, 'content': 'Hello',
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Message.objects.get().receiver, self.seller)
+
+    def test_chat_page_rejects_non_participant_receiver(self):
+        self.client.login(username='buyer', password='pass')
+        url = reverse('chat_with_user', args=[self.other.id, self.offer.id])
+        response = self.client.post(url, {'content': 'Hello'})
+        self.assertRedirects(response, reverse('home'), fetch_redirect_response=False)
+        self.assertFalse(Message.objects.exists())
+
+
+@mock.patch('chat.views.CHAT_PAGE_SIZE', 3)
+class ChatHistoryTests(TestCase):
+    """Chat history comes in pages cut by message id; only what is shown is marked read"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+        listing = Listing.objects.create(
+            title='Used phone', description='A used phone in good condition.',
+            price=100, seller=self.seller, status='approved',
+        )
+        self.offer = Offer.objects.create(listing=listing, buyer=self.buyer, amount=90)
+        self.ids = [
+            send_message(self.buyer, self.seller, f'Message {i}', self.offer).id for i in range(7)
+        ]
+        self.api = APIClient()
+        self.api.force_authenticate(self.seller)
+
+    def history(self, **params):
+        response = self.api.get('/api/chat/', {'offer': self.offer.id, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_go_back_with_before(self):
+        page = self.history(limit=3)
+        self.assertEqual([m['id'] for m in page['results']], self.ids[4:])
+        pages = [page]
+        while page['older']:
+            page = self.api.get(page['older']).data
+            pages.append(page)
+        self.assertEqual(
+            [[m['id'] for m in page['results']] for page in pages],
+            [self.ids[4:], self.ids[1:4], self.ids[:1]],
+        )
+
+    def test_after_returns_newer_messages(self):
+        page = self.history(after=self.ids[4])
+        self.assertEqual([m['id'] for m in page['results']], self.ids[5:])
+        self.assertIsNone(page['older'])
+        # Nothing new yet: the cursor stays put
+        page = self.api.get(page['newer']).data
+        self.assertEqual(page['results'], [])
+        self.assertIn(f'after={self.ids[-1]}', page['newer'])
+
+    def test_cursors_must_be_numbers(self):
+        response = self.api.get('/api/chat/', {'offer': self.offer.id, 'before': 'abc'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_chat_page_marks_only_the_messages_shown(self):
+        self.client.login(username='seller', password='pass')
+        url = reverse('chat_with_user', args=[self.buyer.id, self.offer.id])
+        response = self.client.get(url)
+        self.assertEqual([m.id for m in response.context['chat_messages']], self.ids[4:])
+        read = set(Message.objects.filter(is_read=True).values_list('id', flat=True))
+        self.assertEqual(read, set(self.ids[4:]))
+
+        self.client.get(url, {'before': response.context['older_before']})
+        read = set(Message.objects.filter(is_read=True).values_list('id', flat=True))
+        self.assertEqual(read, set(self.ids[1:]))
+
+    def test_sender_does_not_mark_messages_read(self):
+        self.client.login(username='buyer', password='pass')
+        self.client.get(reverse('chat_with_user', args=[self.seller.id, self.offer.id]))
+        self.assertFalse(Message.objects.filter(is_read=True).exists())
+
+    @mock.patch('chat.views.MAX_CHAT_PAGE_SIZE', 2)
+    def test_read_action_is_bounded(self):
+        response = self.api.post('/api/chat/read/', {'ids': self.ids}, format='json')
+        self.assertEqual(response.data, {'read': 2})
+        read = set(Message.objects.filter(is_read=True).values_list('id', flat=True))
+        self.assertEqual(read, set(self.ids[:2]))
+
+        # Only what the user received
+        buyer_api = APIClient()
+        buyer_api.force_authenticate(self.buyer)
+        self.assertEqual(buyer_api.post('/api/chat/read/', {'ids': self.ids[2:4]}, format='json').data, {'read': 0})
+        self.assertEqual(self.api.post('/api/chat/read/', {'ids': 'all'}, format='json').status_code, 400)
+
+
+class InboxTests(TestCase):
+    """Each participant's inbox row keeps their own unread count"""
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+        listing = Listing.objects.create(
+            title='Used phone', description='A used phone in good condition.',
+            price=100, seller=self.seller, status='approved',
+        )
+        self.offer = Offer.objects.create(listing=listing, buyer=self.buyer, amount=90)
+
+    def unread(self):
+        """{username: unread count} of the offer's conversation"""
+        return dict(
+            ConversationParticipant.objects.filter(conversation__offer=self.offer)
+            .values_list('user__username', 'unread_count')
+        )
+
+    def test_unread_counts_are_kept_per_participant(self):
+        send_message(self.buyer, self.seller, 'Is it still available?', self.offer)
+        send_message(self.buyer, self.seller, 'I can pick it up today', self.offer)
+        send_message(self.seller, self.buyer, 'Yes', self.offer)
+        self.assertEqual(self.unread(), {'seller': 2, 'buyer': 1})
+
+        mark_messages_read(self.seller, Message.objects.all())
+        self.assertEqual(self.unread(), {'seller': 0, 'buyer': 1})
+        # Recounted, so reading again changes nothing
+        mark_messages_read(self.seller, Message.objects.all())
+        self.assertEqual(self.unread(), {'seller': 0, 'buyer': 1})
+
+    def test_conversations_are_kept_apart(self):
+        send_message(self.buyer, self.seller, 'About the phone', self.offer)
+        send_message(self.buyer, self.seller, 'Hi again')
+        self.assertEqual(Conversation.objects.count(), 2)
+        mark_messages_read(self.seller, Message.objects.filter(offer=self.offer))
+        counts = dict(
+            ConversationParticipant.objects.filter(user=self.seller)
+            .values_list('conversation__offer', 'unread_count')
+        )
+        self.assertEqual(counts, {self.offer.id: 0, None: 1})
+
+    def test_inbox_shows_the_last_message(self):
+        send_message(self.buyer, self.seller, 'Is it still available?', self.offer)
+        send_message(self.seller, self.buyer, 'Yes! ' + 'x' * PREVIEW_LENGTH, self.offer)
+        api = APIClient()
+        api.force_authenticate(self.buyer)
+        [row] = api.get('/api/chat/conversations/').data['results']
+        self.assertEqual(row['other_user'], self.seller.id)
+        self.assertEqual(row['offer'], self.offer.id)
+        self.assertEqual(row['unread_count'], 1)
+        self.assertEqual(len(row['last_message_preview']), PREVIEW_LENGTH)
+        self.assertTrue(row['last_message_preview'].startswith('Yes! '))
 
-# Create your tests here.
+    def test_opening_the_chat_clears_its_unread_count(self):
+        send_message(self.buyer, self.seller, 'Is it still available?', self.offer)
+        self.client.login(username='seller', password='pass')
+        self.client.get(reverse('chat_with_user', args=[self.buyer.id, self.offer.id]))
+        self.assertEqual(self.unread(), {'seller': 0, 'buyer': 0})
+        response = self.client.get(reverse('chat_inbox'))
+        self.assertEqual([row.unread_count for row in response.context['conversations']], [0])
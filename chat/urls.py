@@ -1,11 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MessageViewSet, chat_with_user
+from .views import ConversationViewSet, MessageViewSet, chat_with_user, inbox
 
 router = DefaultRouter()
+# Before the messages, whose prefix is empty
+router.register(r'conversations', ConversationViewSet, basename='conversation')
 router.register(r'', MessageViewSet, basename='message')
 
 urlpatterns = [
+    path('inbox/', inbox, name='chat_inbox'),
     path('<int:user_id>/', chat_with_user, name='chat_with_user'),
     path('<int:user_id>/offer/<int:offer_id>/', chat_with_user, name='chat_with_user'),
     path('', include(router.urls)),
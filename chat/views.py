@@ -1,24 +1,96 @@
-from rest_framework import viewsets, permissions
+from rest_framework import exceptions, viewsets, permissions, serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 from django.db.models import Q
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.contrib.auth.models import User
+from django.core.exceptions import PermissionDenied, ValidationError
 from .models import Message
-from .serializers import MessageSerializer
+from .serializers import ConversationSerializer, MessageSerializer
 from offers.models import Offer
+from services.chat_service import (
+    CHAT_PAGE_SIZE, send_message, chat_messages, latest_messages, messages_after, mark_read,
+    mark_messages_read, inbox as inbox_rows,
+)
+from utils.pagination import paginate_keyset, InvalidCursor
+
+MAX_CHAT_PAGE_SIZE = 100
+INBOX_PAGE_SIZE = 20
+
+class ConversationViewSet(viewsets.ReadOnlyModelViewSet):
+    """The user's inbox: one row per conversation with its last message and unread count"""
+    serializer_class = ConversationSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('-last_message_at', '-id')
+
+    def get_queryset(self):
+        return inbox_rows(self.request.user)
 
 class MessageViewSet(viewsets.ModelViewSet):
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    keyset_ordering = ('timestamp', 'id')
 
     def get_queryset(self):
         user = self.request.user
         # Users can only see messages where they are sender or receiver
         return Message.objects.filter(Q(sender=user) | Q(receiver=user)).order_by('timestamp')
 
+    def list(self, request, *args, **kwargs):
+        """
+        All of the user's messages, or one chat with ?offer=<id> or ?user=<id>:
+        the newest `limit` messages, older pages with ?before=<message id>
+        and messages that arrived since with ?after=<message id>.
+        """
+        params = request.query_params
+        if 'offer' not in params and 'user' not in params:
+            return super().list(request, *args, **kwargs)
+        try:
+            offer_id = int(params['offer']) if 'offer' in params else None
+            other_user_id = int(params['user']) if 'user' in params else None
+            before = int(params['before']) if 'before' in params else None
+            after = int(params['after']) if 'after' in params else None
+            limit = max(1, min(int(params.get('limit', CHAT_PAGE_SIZE)), MAX_CHAT_PAGE_SIZE))
+        except ValueError:
+            return Response({'error': 'offer, user, before, after and limit must be numbers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        messages_qs = chat_messages(request.user, other_user_id, offer_id)
+        has_older = False
+        if after is not None:
+            page = messages_after(messages_qs, after, limit)
+        else:
+            page, has_older = latest_messages(messages_qs, limit, before)
+
+        url = remove_query_param(request.build_absolute_uri(), 'before')
+        url = remove_query_param(url, 'after')
+        newest = page[-1].id if page else (after if after is not None else 0)
+        return Response({
+            'older': replace_query_param(url, 'before', page[0].id) if has_older else None,
+            'newer': replace_query_param(url, 'after', newest),
+            'results': self.get_serializer(page, many=True).data,
+        })
+
+    @action(detail=False, methods=['post'])
+    def read(self, request):
+        """Mark received messages as read: {"ids": [...]}, at most MAX_CHAT_PAGE_SIZE at a time"""
+        ids = request.data.get('ids')
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return Response({'error': '"ids" must be a list of message ids'}, status=status.HTTP_400_BAD_REQUEST)
+        updated = mark_messages_read(request.user, Message.objects.filter(id__in=ids[:MAX_CHAT_PAGE_SIZE]))
+        return Response({'read': updated})
+
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
+        # Through the service, so open chat connections receive it too
+        data = serializer.validated_data
+        try:
+            serializer.instance = send_message(self.request.user, data['receiver'], data['content'], data.get('offer'))
+        except PermissionDenied as e:
+            raise exceptions.PermissionDenied(str(e))
+        except ValidationError as e:
+            raise serializers.ValidationError({'content': e.messages})
 
 @login_required
 def chat_with_user(request, user_id, offer_id=None):
@@ -28,8 +100,8 @@ def chat_with_user(request, user_id, offer_id=None):
     # Users can only chat if they have a transaction (offer) together
     if offer_id:
         offer = get_object_or_404(Offer, id=offer_id)
-        # Verify user is involved in this offer
-        if request.user != offer.buyer and request.user != offer.listing.seller:
+        # Verify both users are the ones involved in this offer
+        if {request.user.id, other_user.id} != {offer.buyer_id, offer.listing.seller_id}:
             messages.error(request, "You don't have permission to view this chat.")
             return redirect('home')
     else:
@@ -44,54 +116,41 @@ def chat_with_user(request, user_id, offer_id=None):
             return redirect('home')
         offer = None
     
-    # Get messages between these users related to this offer
-    # Users can only see messages they sent or received (privacy restriction)
-    if offer:
-        chat_messages = Message.objects.filter(
-            offer=offer
-        ).filter(
-            Q(sender=request.user) | Q(receiver=request.user)
-        ).select_related('sender', 'receiver').order_by('timestamp')
-    else:
-        chat_messages = Message.objects.filter(
-            Q(sender=request.user, receiver=other_user) |
-            Q(sender=other_user, receiver=request.user)
-        ).select_related('sender', 'receiver').order_by('timestamp')
-    
-    # Mark messages as read
-    chat_messages.filter(receiver=request.user, is_read=False).update(is_read=True)
-    
     if request.method == 'POST':
-        content = request.POST.get('content', '').strip()
-        if content:
-            message = Message.objects.create(
-                sender=request.user,
-                receiver=other_user,
-                offer=offer,
-                content=content
-            )
+        try:
+            send_message(request.user, other_user, request.POST.get('content', ''), offer)
+        except ValidationError as e:
+            messages.error(request, ' '.join(e.messages))
+        else:
             messages.success(request, "Message sent!")
-            
-            # Create notification for receiver
-            from notifications.utils import create_notification
-            notification_title = f"New message from {request.user.username}"
-            notification_message = content[:100] + "..." if len(content) > 100 else content
-            create_notification(
-                user=other_user,
-                notification_type='message_received',
-                title=notification_title,
-                message=notification_message,
-                related_user=request.user,
-                related_offer=offer,
-                related_listing=offer.listing if offer else None
-            )
-            
             return redirect('chat_with_user', user_id=user_id, offer_id=offer_id if offer else None)
-        else:
-            messages.error(request, "Message cannot be empty.")
+    
+    # Latest page only; ?before=<message id> pages back through older history
+    try:
+        before = int(request.GET['before']) if 'before' in request.GET else None
+    except ValueError:
+        before = None
+    visible = chat_messages(request.user, other_user, offer)
+    chat_page, has_older = latest_messages(visible, CHAT_PAGE_SIZE, before)
+    
+    # Mark messages as read, only those on screen
+    mark_read(request.user, visible, chat_page)
     
     return render(request, 'chat/chat.html', {
         'other_user': other_user,
-        'chat_messages': chat_messages,
+        'chat_messages': chat_page,
+        'older_before': chat_page[0].id if has_older else None,
         'offer': offer
     })
+
+@login_required
+def inbox(request):
+    """The user's conversations, most recent first"""
+    try:
+        page = paginate_keyset(inbox_rows(request.user), ConversationViewSet.keyset_ordering, request.GET.get('cursor'), INBOX_PAGE_SIZE)
+    except InvalidCursor:
+        page = paginate_keyset(inbox_rows(request.user), ConversationViewSet.keyset_ordering, None, INBOX_PAGE_SIZE)
+    return render(request, 'chat/inbox.html', {
+        'conversations': page.items,
+        'next_cursor': page.next_cursor,
+    })
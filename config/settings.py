@@ -111,6 +111,8 @@ INSTALLED_APPS = [
     'cart',
     'notifications',
     'payments',
+    'jobs',
+    'utils',
 ]
 
 MIDDLEWARE = [
@@ -182,6 +184,133 @@ else:
     }
 
 
+# Django REST Framework
+# List endpoints use keyset pagination on (created_at, id); see utils/pagination.py
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'utils.pagination.KeysetCursorPagination',
+    'PAGE_SIZE': 20,
+}
+
+
+# Listing search
+# 'auto' picks SQLite FTS5 or PostgreSQL full-text search from the database engine;
+# set a dotted path (e.g. 'search.backends.BasicSearchBackend') to force a backend
+SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'auto')
+# Recency boost: a listing this many days newer gains one point of relevance
+SEARCH_RECENCY_DAYS = float(os.environ.get('SEARCH_RECENCY_DAYS', '30'))
+
+
+# Background jobs
+# Side effects (notifications, saved-search alerts, moderation bookkeeping) are
+# queued in the database and run by `python manage.py runworker`.
+# Set JOBS_RUN_INLINE=True to run them in-process after commit when no worker is deployed.
+JOBS_RUN_INLINE = os.environ.get('JOBS_RUN_INLINE', 'False') == 'True'
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', '5'))
+JOBS_RETRY_BACKOFF = 10  # Seconds before the first retry, doubled on each attempt
+JOBS_RETRY_BACKOFF_MAX = 3600
+JOBS_LEASE_TIMEOUT = 300  # Running jobs whose lease went unrenewed this long are assumed lost and re-queued
+
+
+# Caches
+# 'default' is a two-level cache (utils/tiered_cache.py): a small per-process LRU
+# in front of the shared cache below, which every worker process can see.
+# CACHE_BACKEND picks the shared cache:
+#   locmem - per process only (development, the default with DEBUG)
+#   file   - files under CACHE_LOCATION, shared by the workers of one host
+#   db     - the 'cache_table' database table (run `python manage.py createcachetable`),
+#            the default without DEBUG
+#   redis  - any Redis-protocol server at CACHE_LOCATION (needs the redis package)
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'locmem' if DEBUG else 'db')
+SHARED_CACHE_BACKENDS = {
+    'locmem': ('django.core.cache.backends.locmem.LocMemCache', 'baazar-hub'),
+    'file': ('django.core.cache.backends.filebased.FileBasedCache', str(BASE_DIR / '.cache')),
+    'db': ('django.core.cache.backends.db.DatabaseCache', 'cache_table'),
+    'redis': ('django.core.cache.backends.redis.RedisCache', 'redis://127.0.0.1:6379/1'),
+}
+_shared_backend, _shared_location = SHARED_CACHE_BACKENDS[CACHE_BACKEND]
+CACHES = {
+    'default': {
+        'BACKEND': 'utils.tiered_cache.TieredCache',
+        'LOCATION': 'default',
+        'OPTIONS': {
+            'SHARED_ALIAS': 'shared',
+            'LOCAL_MAX_ENTRIES': int(os.environ.get('CACHE_LOCAL_MAX_ENTRIES', '1000')),
+            # Upper bound on how stale one process's copy can be
+            'LOCAL_TIMEOUT': int(os.environ.get('CACHE_LOCAL_TIMEOUT', '5')),
+        },
+    },
+    'shared': {
+        'BACKEND': _shared_backend,
+        'LOCATION': os.environ.get('CACHE_LOCATION', _shared_location),
+        'TIMEOUT': 300,
+    },
+}
+
+
+# Home page cache
+# Anonymous home pages are cached per (query, category, cursor) and invalidated
+# whenever the approved listings or categories change (listings/signals.py)
+HOME_CACHE_TIMEOUT = int(os.environ.get('HOME_CACHE_TIMEOUT', '300'))
+
+
+# Listing images
+# Uploaded images are verified and resized by a pool of worker processes after
+# the request commits (utils/image_pipeline.py); 0 processes them in-process
+IMAGE_PROCESSING_WORKERS = int(os.environ.get('IMAGE_PROCESSING_WORKERS', '2'))
+# Images whose perceptual hashes differ by at most this many bits are flagged
+# as duplicates for moderators (values above 3 may miss some matches)
+DUPLICATE_IMAGE_MAX_DISTANCE = 3
+
+
+# Near-duplicate listing text
+# Listings whose descriptions are at least this similar (estimated Jaccard
+# similarity of word shingles) add NEAR_DUPLICATE_SPAM_WEIGHT to the spam score
+NEAR_DUPLICATE_THRESHOLD = float(os.environ.get('NEAR_DUPLICATE_THRESHOLD', '0.8'))
+NEAR_DUPLICATE_SPAM_WEIGHT = 40
+
+
+# Moderation queue
+# Moderators claim batches of the riskiest pending entries; a claim expires
+# after MODERATION_CLAIM_LEASE_SECONDS so abandoned batches return to the queue
+MODERATION_CLAIM_BATCH_SIZE = int(os.environ.get('MODERATION_CLAIM_BATCH_SIZE', '20'))
+MODERATION_CLAIM_LEASE_SECONDS = int(os.environ.get('MODERATION_CLAIM_LEASE_SECONDS', '900'))
+
+# Auto-moderation (moderation/auto_moderation.py)
+# New listings pass through AUTO_MODERATION_RULES in order: obvious spam is
+# rejected, anything risky goes to the queue and the rest is approved
+AUTO_MODERATION_ENABLED = os.environ.get('AUTO_MODERATION_ENABLED', 'True') == 'True'
+AUTO_MODERATION_RULES = [
+    'obvious_spam', 'spam_score', 'similar_text', 'account_age',
+    'recent_rejections', 'seller_rating', 'images', 'duplicate_images',
+]
+AUTO_REJECT_MIN_SPAM_SCORE = int(os.environ.get('AUTO_REJECT_MIN_SPAM_SCORE', '90'))
+AUTO_APPROVE_MAX_SPAM_SCORE = int(os.environ.get('AUTO_APPROVE_MAX_SPAM_SCORE', '20'))
+AUTO_APPROVE_MIN_ACCOUNT_AGE_DAYS = int(os.environ.get('AUTO_APPROVE_MIN_ACCOUNT_AGE_DAYS', '7'))
+# Sellers with at least AUTO_APPROVE_MIN_RATINGS ratings averaging below this go to review
+AUTO_APPROVE_MIN_RATINGS = 3
+AUTO_APPROVE_MIN_AVERAGE_RATING = 3.5
+# Sellers with a listing rejected within this many days go to review
+AUTO_MODERATION_REJECTION_WINDOW_DAYS = 30
+
+
+# Real-time chat (chat/consumers.py, served by config/asgi.py)
+# 'memory' delivers within one ASGI process; use 'redis' with several worker
+# processes or hosts (needs the redis package)
+CHANNEL_LAYER = os.environ.get('CHANNEL_LAYER', 'memory')
+CHANNEL_LAYER_URL = os.environ.get('CHANNEL_LAYER_URL', 'redis://127.0.0.1:6379/2')
+
+
+# Notifications
+NOTIFICATIONS_BULK_BATCH_SIZE = int(os.environ.get('NOTIFICATIONS_BULK_BATCH_SIZE', '500'))
+# Chat messages from the same sender within this many seconds update one unread notification (0 disables)
+NOTIFICATION_COALESCE_SECONDS = int(os.environ.get('NOTIFICATION_COALESCE_SECONDS', '600'))
+# prune_notifications: read notifications older than this are deleted, archived first to
+# 'table' (NotificationArchive), 'jsonl' (gzipped files in NOTIFICATION_ARCHIVE_DIR) or 'none'
+NOTIFICATION_RETENTION_DAYS = int(os.environ.get('NOTIFICATION_RETENTION_DAYS', '90'))
+NOTIFICATION_ARCHIVE = os.environ.get('NOTIFICATION_ARCHIVE', 'table')
+NOTIFICATION_ARCHIVE_DIR = os.environ.get('NOTIFICATION_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'notifications'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
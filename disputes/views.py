@@ -93,7 +93,7 @@ def create_dispute(request, offer_id=None):
             other_user = transaction.buyer if request.user == transaction.listing.seller else transaction.listing.seller
             create_notification(
                 user=other_user,
-                notification_type='message_received',  # Reusing type
+                notification_type='dispute_reported',
                 title='Dispute Reported',
                 message=f"{request.user.username} has reported a dispute for transaction '{transaction.listing.title}'",
                 related_user=request.user,
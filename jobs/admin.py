@@ -0,0 +1,24 @@
+from django.contrib import admin
+from django.contrib import messages
+from django.utils import timezone
+from .models import Job
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'task', 'status', 'attempts', 'max_attempts', 'run_after', 'created_at']
+    list_filter = ['status', 'task']
+    search_fields = ['task', 'last_error']
+    readonly_fields = ['created_at', 'locked_by', 'locked_at', 'last_error']
+    actions = ['retry_jobs']
+
+    def retry_jobs(self, request, queryset):
+        """Admin action to put failed jobs back on the queue"""
+        updated = queryset.filter(status='failed').update(
+            status='queued',
+            attempts=0,
+            run_after=timezone.now(),
+            locked_by='',
+            locked_at=None,
+        )
+        self.message_user(request, f'{updated} job(s) re-queued.', messages.SUCCESS)
+    retry_jobs.short_description = "Retry selected failed jobs"
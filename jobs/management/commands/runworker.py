@@ -0,0 +1,93 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections, connection
+
+from jobs.queue import claim_jobs, make_worker_id, requeue_stale_jobs, run_job
+from utils.image_pipeline import process_stale_images
+
+# Seconds between looks for listing images a restarted web process dropped
+IMAGE_RECOVERY_INTERVAL = 300
+
+
+class Command(BaseCommand):
+    help = 'Runs background jobs from the database queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of worker threads')
+        parser.add_argument('--batch-size', type=int, default=10, help='Jobs claimed per round trip')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--burst', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        self.stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *_: self.stop.set())
+        signal.signal(signal.SIGINT, lambda *_: self.stop.set())
+
+        requeued = requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f'Re-queued {requeued} stale job(s)')
+        self.recover_images()
+
+        concurrency = max(options['concurrency'], 1)
+        self.stdout.write(self.style.SUCCESS(f'Worker started with {concurrency} thread(s)'))
+
+        threads = [
+            threading.Thread(target=self.work, args=(options,), name=f'jobs-worker-{i}', daemon=True)
+            for i in range(concurrency)
+        ]
+        for thread in threads:
+            thread.start()
+        last_image_check = time.monotonic()
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(0.5)
+                if time.monotonic() - last_image_check > IMAGE_RECOVERY_INTERVAL:
+                    close_old_connections()
+                    self.recover_images()
+                    last_image_check = time.monotonic()
+        except KeyboardInterrupt:
+            self.stop.set()
+        for thread in threads:
+            thread.join()
+        self.stdout.write('Worker stopped')
+
+    def recover_images(self):
+        """Process listing images left unprocessed by a restarted web process"""
+        try:
+            processed = process_stale_images()
+        except DatabaseError as e:
+            self.stderr.write(f'Could not look for stale images: {e}')
+            return
+        if processed:
+            self.stdout.write(f'Processed {processed} stale image(s)')
+
+    def work(self, options):
+        worker_id = make_worker_id()
+        last_stale_check = time.monotonic()
+        try:
+            while not self.stop.is_set():
+                close_old_connections()
+                try:
+                    jobs = claim_jobs(worker_id, limit=options['batch_size'])
+                except DatabaseError as e:
+                    # e.g. "database is locked" on SQLite; back off and retry
+                    self.stderr.write(f'Could not claim jobs: {e}')
+                    self.stop.wait(options['poll_interval'])
+                    continue
+                for job in jobs:
+                    ok = run_job(job)
+                    self.stdout.write(f"{'done' if ok else 'error'}: {job.task} #{job.pk}")
+
+                if time.monotonic() - last_stale_check > 60:
+                    requeue_stale_jobs()
+                    last_stale_check = time.monotonic()
+
+                if not jobs:
+                    if options['burst']:
+                        break
+                    self.stop.wait(options['poll_interval'])
+        finally:
+            connection.close()
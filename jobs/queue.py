@@ -0,0 +1,193 @@
+"""
+Database-backed background job queue.
+
+Tasks are plain functions registered with @task in an app's tasks.py and
+queued with enqueue(). The Job row is written inside the caller's
+transaction, so it only becomes visible to workers once that transaction
+commits, and disappears with it on rollback.
+
+Workers (`manage.py runworker`) claim batches of due jobs. On PostgreSQL the
+claim uses SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never wait
+on each other; on other databases a conditional UPDATE does the same job.
+Failed jobs are retried with exponential backoff until max_attempts.
+
+A claimed job holds a lease: locked_at, renewed when it starts and then
+every third of JOBS_LEASE_TIMEOUT while it runs. Jobs whose lease ran out
+are assumed lost with their worker and queued again (requeue_stale_jobs).
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+_registry = {}
+
+
+def task(name):
+    """Register a function as a background task under `name`"""
+    def decorator(func):
+        _registry[name] = func
+        func.task_name = name
+        return func
+    return decorator
+
+
+def get_task(name):
+    return _registry.get(name)
+
+
+def enqueue(task_name, max_attempts=None, delay=None, **payload):
+    """
+    Queue a task to run after the current transaction commits.
+    Payload values must be JSON serialisable (pass ids, not model instances).
+
+    With JOBS_RUN_INLINE the task runs in-process right after commit instead,
+    for development setups without a worker.
+    """
+    if getattr(settings, 'JOBS_RUN_INLINE', False):
+        transaction.on_commit(lambda: _run_inline(task_name, payload))
+        return None
+
+    return Job.objects.create(
+        task=task_name,
+        payload=payload,
+        max_attempts=max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+        run_after=timezone.now() + (delay or timedelta(0)),
+    )
+
+
+def _run_inline(task_name, payload):
+    func = get_task(task_name)
+    if func is None:
+        logger.error(f"Unknown task {task_name}")
+        return
+    try:
+        func(**payload)
+    except Exception:
+        # Side effects must never break the request that triggered them
+        logger.exception(f"Inline task {task_name} failed")
+
+
+def make_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+def claim_jobs(worker_id, limit=10):
+    """Claim up to `limit` due jobs for this worker and return them"""
+    now = timezone.now()
+    # A fresh token per claim lets us read back exactly the rows we won
+    token = f"{worker_id}:{uuid.uuid4().hex[:8]}"[:100]
+    due = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+
+    claim = {
+        'status': 'running',
+        'locked_by': token,
+        'locked_at': now,
+        'attempts': F('attempts') + 1,
+    }
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(due.select_for_update(skip_locked=True).values_list('id', flat=True)[:limit])
+            if not ids:
+                return []
+            Job.objects.filter(id__in=ids).update(**claim)
+    else:
+        # Single UPDATE ... WHERE id IN (SELECT ... LIMIT n): atomic on its own,
+        # and status='queued' stops two workers from taking the same row
+        if connection.features.allow_sliced_subqueries_with_in:
+            due_ids = due.values('id')[:limit]
+        else:
+            due_ids = list(due.values_list('id', flat=True)[:limit])
+        if not Job.objects.filter(id__in=due_ids, status='queued').update(**claim):
+            return []
+    return list(Job.objects.filter(locked_by=token, status='running').order_by('run_after', 'id'))
+
+
+def retry_delay(attempts):
+    """Exponential backoff with jitter for the given attempt number"""
+    base = getattr(settings, 'JOBS_RETRY_BACKOFF', 10)
+    cap = getattr(settings, 'JOBS_RETRY_BACKOFF_MAX', 3600)
+    delay = min(base * 2 ** max(attempts - 1, 0), cap)
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def _claimed(job):
+    """The job's row while this worker still holds it; empty once it was re-queued or taken over"""
+    return Job.objects.filter(pk=job.pk, status='running', locked_by=job.locked_by)
+
+
+def renew_lease(job):
+    """Push back the lease of a claimed job. False if it was re-queued meanwhile and is no longer ours."""
+    return _claimed(job).update(locked_at=timezone.now()) > 0
+
+
+def _keep_lease(job, done):
+    """Heartbeat thread: renew the lease of `job` until `done` is set"""
+    interval = getattr(settings, 'JOBS_LEASE_TIMEOUT', 300) / 3
+    try:
+        while not done.wait(interval):
+            try:
+                renew_lease(job)
+            except Exception:
+                logger.exception(f"Could not renew the lease of job {job.pk}")
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """Run a claimed job; delete it on success, reschedule or fail it on error"""
+    # The job may have waited in its batch long enough to be re-queued
+    if not renew_lease(job):
+        logger.warning(f"Job {job.pk} ({job.task}) lost its lease before it started; skipped")
+        return False
+    func = get_task(job.task)
+    done = threading.Event()
+    heartbeat = threading.Thread(target=_keep_lease, args=(job, done), name=f'jobs-lease-{job.pk}', daemon=True)
+    heartbeat.start()
+    try:
+        if func is None:
+            raise LookupError(f"Unknown task {job.task}")
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.error(f"Job {job.pk} ({job.task}) failed on attempt {job.attempts}: {error}")
+        updates = {'last_error': error, 'locked_by': '', 'locked_at': None}
+        if job.attempts >= job.max_attempts:
+            updates['status'] = 'failed'
+        else:
+            updates['status'] = 'queued'
+            updates['run_after'] = timezone.now() + retry_delay(job.attempts)
+        # Left alone if another worker took the job over after our lease expired
+        _claimed(job).update(**updates)
+        return False
+    finally:
+        done.set()
+        heartbeat.join()
+
+    _claimed(job).delete()
+    return True
+
+
+def requeue_stale_jobs():
+    """Put back jobs whose worker died while running them"""
+    timeout = getattr(settings, 'JOBS_LEASE_TIMEOUT', 300)
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued',
+        locked_by='',
+        locked_at=None,
+    )
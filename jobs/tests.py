@@ -0,0 +1,76 @@
+from contextlib import nullcontext
+from datetime import timedelta
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim_jobs, enqueue, renew_lease, requeue_stale_jobs, run_job, task
+
+calls = []
+
+
+@task('jobs.tests.record')
+def record(value):
+    calls.append(value)
+
+
+@task('jobs.tests.lose_lease')
+def lose_lease(fail):
+    """Stall past the lease, during which another worker re-claims the job"""
+    Job.objects.update(locked_at=timezone.now() - timedelta(seconds=301))
+    requeue_stale_jobs()
+    calls.extend(claim_jobs('worker-b'))
+    if fail:
+        raise ValueError('failed')
+
+
+@override_settings(JOBS_RUN_INLINE=False, JOBS_LEASE_TIMEOUT=300)
+class JobLeaseTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def expire_lease(self, job):
+        Job.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=301))
+
+    def test_claimed_job_runs_and_is_deleted(self):
+        enqueue('jobs.tests.record', value=1)
+        [job] = claim_jobs('worker-a')
+        self.assertTrue(run_job(job))
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+
+    def test_renewed_lease_is_not_requeued(self):
+        enqueue('jobs.tests.record', value=1)
+        [job] = claim_jobs('worker-a')
+        self.expire_lease(job)
+        self.assertTrue(renew_lease(job))
+        self.assertEqual(requeue_stale_jobs(), 0)
+
+    def test_job_requeued_while_waiting_in_batch_is_skipped(self):
+        enqueue('jobs.tests.record', value=1)
+        [job] = claim_jobs('worker-a')
+        self.expire_lease(job)
+        self.assertEqual(requeue_stale_jobs(), 1)
+        [retaken] = claim_jobs('worker-b')
+
+        # worker-a reaches the job in its batch after losing it
+        with self.assertLogs('jobs.queue', 'WARNING'):
+            self.assertFalse(run_job(job))
+        self.assertEqual(calls, [])
+        self.assertTrue(run_job(retaken))
+        self.assertEqual(calls, [1])
+
+    def test_lost_lease_leaves_the_new_claim_alone(self):
+        for fail in (False, True):
+            with self.subTest(fail=fail):
+                calls.clear()
+                Job.objects.all().delete()
+                enqueue('jobs.tests.lose_lease', fail=fail)
+                [job] = claim_jobs('worker-a')
+                with self.assertLogs('jobs.queue', 'ERROR') if fail else nullcontext():
+                    run_job(job)
+                [retaken] = calls
+                row = Job.objects.get()
+                self.assertEqual((row.status, row.locked_by, row.locked_at), ('running', retaken.locked_by, retaken.locked_at))
+                self.assertEqual(row.last_error, '')
@@ -1,8 +1,7 @@
 from django.contrib import admin
 from django.contrib import messages
-from django.utils import timezone
 from .models import Listing, ListingImage, Category
-from moderation.models import ModerationQueue
+from services.moderation_service import approve_listings, reject_listings
 
 @admin.register(Category)
 class CategoryAdmin(admin.ModelAdmin):
@@ -33,42 +32,16 @@ class ListingAdmin(admin.ModelAdmin):
     
     def approve_listings(self, request, queryset):
         """Admin action to approve selected listings"""
-        # Update each listing individually to trigger signals
-        for listing in queryset:
-            listing.status = 'approved'
-            listing.save()
-            # Update moderation queue
-            ModerationQueue.objects.filter(listing=listing, status='pending').update(
-                status='reviewed',
-                reviewed_at=timezone.now(),
-                reason='Approved by admin'
-            )
-        updated = queryset.count()
-        self.message_user(request, f'{updated} listing(s) approved successfully.', messages.SUCCESS)
+        # One UPDATE; saved search alerts are queued by the listings_approved event
+        approved = approve_listings(queryset.values_list('id', flat=True), reason='Approved by admin')
+        self.message_user(request, f'{len(approved)} listing(s) approved successfully.', messages.SUCCESS)
     approve_listings.short_description = "Approve selected listings"
     
     def reject_listings(self, request, queryset):
         """Admin action to reject selected listings"""
-        from notifications.utils import create_notification
-        # Update each listing individually to trigger signals (ensures cleanup in signals)
-        for listing in queryset:
-            listing.status = 'rejected'
-            listing.save()  # This triggers pre_save and post_save signals (ensures cleanup)
-            # Update moderation queue
-            ModerationQueue.objects.filter(listing=listing, status='pending').update(
-                status='reviewed',
-                reason='Rejected by admin'
-            )
-            # Create notification for seller
-            create_notification(
-                user=listing.seller,
-                notification_type='offer_rejected',  # Reusing type
-                title='Listing Rejected',
-                message=f"Your listing '{listing.title}' has been rejected. Please review the guidelines and create a new listing.",
-                related_listing=listing
-            )
-        updated = queryset.count()
-        self.message_user(request, f'{updated} listing(s) rejected.', messages.WARNING)
+        # One UPDATE; sellers are notified from a single background job
+        rejected = reject_listings(queryset.values_list('id', flat=True), reason='Rejected by admin')
+        self.message_user(request, f'{len(rejected)} listing(s) rejected.', messages.WARNING)
     reject_listings.short_description = "Reject selected listings"
 
 @admin.register(ListingImage)
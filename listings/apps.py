@@ -3,4 +3,8 @@ from django.apps import AppConfig
 
 class ListingsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
-    name = 'listings'
\ No newline at end of file
+    name = 'listings'
+
+    def ready(self):
+        """Import signals when app is ready"""
+        import listings.signals
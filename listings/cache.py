@@ -0,0 +1,40 @@
+"""
+Caches for the home page: rendered anonymous pages and the category list.
+
+Rendered pages are stored under a versioned key, so invalidation is a single
+version bump (see listings/signals.py) rather than a search for stale keys.
+"""
+import hashlib
+
+from django.conf import settings
+
+from utils.cache import bump_version, cached, versioned_key
+
+HOME_CACHE_NAMESPACE = 'home'
+CATEGORIES_CACHE_NAMESPACE = 'categories'
+
+
+def home_cache_key(search_query, category_id, cursor):
+    raw = '\n'.join([search_query, category_id, cursor or ''])
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return versioned_key(HOME_CACHE_NAMESPACE, digest)
+
+
+def home_cache_timeout():
+    return getattr(settings, 'HOME_CACHE_TIMEOUT', 300)
+
+
+def invalidate_home_cache():
+    """Drop every cached home page"""
+    bump_version(HOME_CACHE_NAMESPACE)
+
+
+@cached(CATEGORIES_CACHE_NAMESPACE, timeout=3600)
+def get_categories():
+    """All categories, cached until a category changes"""
+    from .models import Category
+    return list(Category.objects.all())
+
+
+def invalidate_categories():
+    bump_version(CATEGORIES_CACHE_NAMESPACE)
@@ -0,0 +1,223 @@
+import csv
+import json
+import os
+import time
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from listings.models import Category, Listing, ListingImage
+from moderation.minhash import band_buckets, pack, signature
+from moderation.models import ListingTextBucket, ListingTextSignature, ModerationQueue
+from search.backends import get_search_backend
+from services.listings_service import moderation_reason, similar_listings_field, validate_listing_fields
+from services.moderation_service import check_spam, find_similar_listings_bulk, moderation_priority
+from utils.image_validation import MAX_IMAGES_PER_LISTING
+
+
+class Command(BaseCommand):
+    help = (
+        'Imports listings for one seller from a CSV or JSON Lines file. '
+        'Columns: title, description, price, category (slug, name or id), '
+        'images (paths in media storage, "|"-separated in CSV). '
+        'Listings are created pending moderation, exactly as create_listing would.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--seller', required=True, help='Username that will own the listings')
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the first row')
+        parser.add_argument('--errors', help='Where to write rejected rows (default: <path>.errors.jsonl)')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'{path} does not exist')
+        try:
+            self.seller = User.objects.get(username=options['seller'])
+        except User.DoesNotExist:
+            raise CommandError(f"Unknown seller {options['seller']}")
+        file_format = options['format'] or ('jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv')
+        checkpoint_path = options['checkpoint'] or f'{path}.checkpoint'
+        errors_path = options['errors'] or f'{path}.errors.jsonl'
+        batch_size = max(options['batch_size'], 1)
+
+        self.categories = {}
+        for category in Category.objects.all():
+            for key in (str(category.id), category.slug.lower(), category.name.lower()):
+                self.categories[key] = category.id
+
+        start_row = 0
+        if not options['restart']:
+            checkpoint = self.read_checkpoint(checkpoint_path)
+            if checkpoint.get('complete'):
+                raise CommandError(f'{path} was already imported; use --restart to import it again')
+            start_row = checkpoint.get('rows', 0)
+            if start_row:
+                self.stdout.write(f'Resuming after row {start_row}')
+
+        self.search_backend = get_search_backend()
+        started = time.monotonic()
+        imported = rejected = 0
+        batch = []
+        last_row = start_row
+
+        with open(errors_path, 'a', encoding='utf-8') as errors:
+            for row_number, row in self.read_rows(path, file_format):
+                if row_number <= start_row:
+                    continue
+                last_row = row_number
+                try:
+                    batch.append(self.clean_row(row))
+                except ValidationError as e:
+                    rejected += 1
+                    errors.write(json.dumps({'row': row_number, 'errors': e.messages, 'data': row}) + '\n')
+
+                if len(batch) >= batch_size:
+                    imported += self.write_batch(batch)
+                    batch = []
+                    self.write_checkpoint(checkpoint_path, last_row)
+                    self.report(imported, rejected, started)
+
+            if batch:
+                imported += self.write_batch(batch)
+            self.write_checkpoint(checkpoint_path, last_row, complete=True)
+
+        self.report(imported, rejected, started)
+        if rejected:
+            self.stdout.write(self.style.WARNING(f'{rejected} row(s) rejected, see {errors_path}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} listing(s). Run generate_image_derivatives to process their images '
+            f'and auto_moderate to decide listings without images.'
+        ))
+
+    def read_rows(self, path, file_format):
+        """Yield (row number, dict) without loading the file into memory"""
+        with open(path, newline='', encoding='utf-8') as f:
+            if file_format == 'csv':
+                for row_number, row in enumerate(csv.DictReader(f), 1):
+                    yield row_number, row
+            else:
+                for row_number, line in enumerate(f, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        yield row_number, json.loads(line)
+                    except ValueError:
+                        yield row_number, {'_invalid': line.strip()}
+
+    def clean_row(self, row):
+        """Validate a row with create_listing's rules and return the values to store"""
+        if '_invalid' in row:
+            raise ValidationError('Invalid JSON')
+        title = (row.get('title') or '').strip()
+        description = (row.get('description') or '').strip()
+        try:
+            price = Decimal(str(row.get('price') or '0').strip())
+        except InvalidOperation:
+            raise ValidationError('Price must be a number')
+        # Before comparing it: NaN raises InvalidOperation in comparisons
+        if not price.is_finite():
+            raise ValidationError('Price must be a number')
+        if price >= Decimal('1e8'):
+            raise ValidationError('Price is too large')
+        validate_listing_fields(title, description, price)
+
+        category_id = None
+        category = str(row.get('category') or '').strip().lower()
+        if category:
+            category_id = self.categories.get(category)
+            if category_id is None:
+                raise ValidationError(f'Unknown category {category}')
+
+        images = row.get('images') or []
+        if isinstance(images, str):
+            images = [image.strip() for image in images.split('|') if image.strip()]
+        if len(images) > MAX_IMAGES_PER_LISTING:
+            raise ValidationError(f'Maximum {MAX_IMAGES_PER_LISTING} images allowed per listing')
+
+        return {
+            'title': title,
+            'description': description,
+            'price': price.quantize(Decimal('0.01')),
+            'category_id': category_id,
+            'images': images,
+        }
+
+    @transaction.atomic
+    def write_batch(self, rows):
+        """Create a batch of listings with their moderation entries, images and indexes"""
+        spam = [check_spam(row['title'], row['description']) for row in rows]
+        signatures = [signature(row['description']) for row in rows]
+        similar = find_similar_listings_bulk(signatures)
+
+        listings = []
+        for row, (spam_score, _), matches in zip(rows, spam, similar):
+            if matches:
+                spam_score = min(spam_score + getattr(settings, 'NEAR_DUPLICATE_SPAM_WEIGHT', 40), 100)
+            listings.append(Listing(
+                seller=self.seller,
+                title=row['title'],
+                description=row['description'],
+                price=row['price'],
+                category_id=row['category_id'],
+                status='pending',
+                flags=spam_score,
+            ))
+        listings = Listing.objects.bulk_create(listings)
+
+        ModerationQueue.objects.bulk_create([
+            ModerationQueue(
+                listing=listing,
+                reason=moderation_reason(listing.flags, hits, matches),
+                similar_listings=similar_listings_field(matches),
+                priority=moderation_priority(listing.flags),
+                status='pending',
+                auto_moderation=True,
+            )
+            for listing, (_, hits), matches in zip(listings, spam, similar)
+        ])
+        ListingImage.objects.bulk_create([
+            ListingImage(listing=listing, image=image)
+            for listing, row in zip(listings, rows)
+            for image in row['images']
+        ])
+
+        # Text index for near-duplicate detection and the full-text search index
+        ListingTextSignature.objects.bulk_create([
+            ListingTextSignature(listing=listing, signature=pack(sig))
+            for listing, sig in zip(listings, signatures) if sig is not None
+        ])
+        ListingTextBucket.objects.bulk_create([
+            ListingTextBucket(listing=listing, bucket=bucket)
+            for listing, sig in zip(listings, signatures) if sig is not None
+            for bucket in band_buckets(sig)
+        ], batch_size=5000)
+        self.search_backend.index_listings(listings)
+        return len(listings)
+
+    def read_checkpoint(self, checkpoint_path):
+        try:
+            with open(checkpoint_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_checkpoint(self, checkpoint_path, rows, complete=False):
+        # Written after each batch commits; a crash in between repeats at most that batch.
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        tmp_path = f'{checkpoint_path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'rows': rows, 'complete': complete}, f)
+        os.replace(tmp_path, checkpoint_path)
+
+    def report(self, imported, rejected, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{imported} imported, {rejected} rejected ({(imported + rejected) / elapsed:.0f} rows/s)')
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='listings_li_status_62c8f0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['status', 'category', '-created_at', '-id'], name='listings_li_status_fcf6ab_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='listing',
+            index=models.Index(fields=['seller', '-created_at', '-id'], name='listings_li_seller__158567_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0004_listing_image_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='listingimage',
+            name='dhash',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='dhash_band_0',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='dhash_band_1',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='dhash_band_2',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='listingimage',
+            name='dhash_band_3',
+            field=models.IntegerField(blank=True, db_index=True, null=True),
+        ),
+    ]
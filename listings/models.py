@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from utils.field_tracker import FieldTrackerMixin
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -11,7 +12,7 @@ class Category(models.Model):
     def __str__(self):
         return self.name
 
-class Listing(models.Model):
+class Listing(FieldTrackerMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('approved', 'Approved'),
@@ -28,13 +29,99 @@ class Listing(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     flags = models.IntegerField(default=0)
 
+    # Original values available through previous_value()/has_changed()
+    tracked_fields = ('status', 'price', 'description')
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the home feed and listing API
+            models.Index(fields=['status', '-created_at', '-id']),
+            models.Index(fields=['status', 'category', '-created_at', '-id']),
+            models.Index(fields=['seller', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return self.title
 
+    @property
+    def image_processing_status(self):
+        """'processing' while any image is unprocessed, then 'failed' or 'ready'"""
+        statuses = {image.processing_status for image in self.images.all()}
+        if statuses & {'pending', 'processing'}:
+            return 'processing'
+        if 'failed' in statuses:
+            return 'failed'
+        return 'ready'
+
 class ListingImage(models.Model):
+    PROCESSING_STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='listings/')
+    # Resized WebP/JPEG copies by format and width, see utils/image_derivatives.py
+    derivatives = models.JSONField(default=dict, blank=True)
+    # Verification and resizing run off-request, see utils/image_pipeline.py
+    processing_status = models.CharField(max_length=20, choices=PROCESSING_STATUS_CHOICES, default='pending')
+    processing_error = models.TextField(blank=True)
+    # Perceptual hash (signed 64-bit) and its 16-bit bands for duplicate lookup, see utils/image_hashing.py
+    dhash = models.BigIntegerField(null=True, blank=True)
+    dhash_band_0 = models.IntegerField(null=True, blank=True, db_index=True)
+    dhash_band_1 = models.IntegerField(null=True, blank=True, db_index=True)
+    dhash_band_2 = models.IntegerField(null=True, blank=True, db_index=True)
+    dhash_band_3 = models.IntegerField(null=True, blank=True, db_index=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"Image for {self.listing.title}"
+
+    def derivative_urls(self, fmt):
+        """[(width, url)] of the resized copies in `fmt`, smallest first"""
+        from django.core.files.storage import default_storage
+        by_width = (self.derivatives or {}).get(fmt, {})
+        return [(int(width), default_storage.url(path))
+                for width, path in sorted(by_width.items(), key=lambda item: int(item[0]))]
+
+    def srcset(self, fmt):
+        return ', '.join(f'{url} {width}w' for width, url in self.derivative_urls(fmt))
+
+    def set_dhash(self, value):
+        """Store an unsigned 64-bit perceptual hash and its bands"""
+        from utils.image_hashing import hash_bands, to_signed
+        self.dhash = to_signed(value)
+        for i, band in enumerate(hash_bands(value)):
+            setattr(self, f'dhash_band_{i}', band)
+
+    @property
+    def webp_srcset(self):
+        return self.srcset('webp')
+
+    @property
+    def jpeg_srcset(self):
+        return self.srcset('jpeg')
+
+    @property
+    def is_verified(self):
+        """Whether the upload passed verification, so its file may be served"""
+        return self.processing_status == 'ready'
+
+    @property
+    def original_url(self):
+        """The uploaded file, once verified; '' before"""
+        return self.image.url if self.is_verified else ''
+
+    @property
+    def thumbnail_url(self):
+        """Smallest JPEG copy, or the verified original when there are none"""
+        urls = self.derivative_urls('jpeg')
+        return urls[0][1] if urls else self.original_url
+
+    @property
+    def display_url(self):
+        """JPEG copy for browsers without srcset support"""
+        urls = self.derivative_urls('jpeg')
+        return urls[-1][1] if urls else self.original_url
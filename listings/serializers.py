@@ -7,9 +7,37 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 class ListingImageSerializer(serializers.ModelSerializer):
+    # The upload is only served once verified; null until then
+    image = serializers.SerializerMethodField()
+    derivatives = serializers.SerializerMethodField()
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ListingImage
-        fields = ['id', 'image', 'uploaded_at']
+        fields = ['id', 'image', 'derivatives', 'srcset', 'processing_status', 'processing_error', 'uploaded_at']
+        read_only_fields = ['processing_status', 'processing_error']
+
+    def _absolute(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_image(self, obj):
+        url = obj.original_url
+        return self._absolute(url) if url else None
+
+    def get_derivatives(self, obj):
+        """{format: {width: url}} of the resized copies"""
+        return {
+            fmt: {str(width): self._absolute(url) for width, url in obj.derivative_urls(fmt)}
+            for fmt in (obj.derivatives or {})
+        }
+
+    def get_srcset(self, obj):
+        """Ready-made srcset attribute values per format"""
+        return {
+            fmt: ', '.join(f'{self._absolute(url)} {width}w' for width, url in obj.derivative_urls(fmt))
+            for fmt in (obj.derivatives or {})
+        }
 
 class MultipleImageField(serializers.Field):
     """Custom field to handle multiple image uploads"""
@@ -41,10 +69,11 @@ class ListingSerializer(serializers.ModelSerializer):
         allow_null=True
     )
     seller_name = serializers.ReadOnlyField(source='seller.username')
+    image_processing_status = serializers.ReadOnlyField()
 
     class Meta:
         model = Listing
-        fields = ['id', 'title', 'description', 'price', 'category', 'seller', 'seller_name', 'status', 'created_at', 'images', 'uploaded_images']
+        fields = ['id', 'title', 'description', 'price', 'category', 'seller', 'seller_name', 'status', 'created_at', 'images', 'image_processing_status', 'uploaded_images']
         read_only_fields = ['seller', 'status', 'created_at', 'flags']
 
     def validate_title(self, value):
@@ -0,0 +1,58 @@
+"""
+Listing moderation events, and signals that keep the home page caches in
+step with the approved listings and maintain resized copies of listing images
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import Signal, receiver
+from .models import Listing, Category, ListingImage
+from .cache import invalidate_home_cache, invalidate_categories
+from utils.field_tracker import UNKNOWN
+from utils.image_derivatives import delete_derivatives
+from utils.image_pipeline import process_listing_images
+
+# Sent once per bulk moderation decision (services.moderation_service),
+# with listing_ids: the listings whose status changed. Sent inside the
+# transaction, so receivers can enqueue jobs atomically with the update.
+listings_approved = Signal()
+listings_rejected = Signal()
+
+@receiver(post_save, sender=Listing)
+def invalidate_home_on_listing_save(sender, instance, created, **kwargs):
+    """
+    Invalidate when a listing enters, leaves or changes inside the approved set.
+    If the previous status is unknown, assume it was approved.
+    """
+    previous_status = None if created else instance.previous_value('status')
+    if instance.status == 'approved' or previous_status in ('approved', UNKNOWN):
+        invalidate_home_cache()
+
+@receiver([listings_approved, listings_rejected])
+def invalidate_home_on_moderation(sender, listing_ids, **kwargs):
+    if listing_ids:
+        invalidate_home_cache()
+
+@receiver(post_delete, sender=Listing)
+def invalidate_home_on_listing_delete(sender, instance, **kwargs):
+    if instance.status == 'approved':
+        invalidate_home_cache()
+
+@receiver(post_save, sender=ListingImage)
+def process_new_image(sender, instance, created, **kwargs):
+    """Verify new uploads and generate their resized copies in the image worker pool"""
+    if created and instance.processing_status == 'pending':
+        process_listing_images([instance.pk])
+
+@receiver(post_delete, sender=ListingImage)
+def remove_image_derivatives(sender, instance, **kwargs):
+    delete_derivatives(instance)
+
+@receiver([post_save, post_delete], sender=ListingImage)
+def invalidate_home_on_image_change(sender, instance, **kwargs):
+    """Listing cards show the first image"""
+    if Listing.objects.filter(pk=instance.listing_id, status='approved').exists():
+        invalidate_home_cache()
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_home_on_category_change(sender, instance, **kwargs):
+    invalidate_categories()
+    invalidate_home_cache()
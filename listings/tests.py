@@ -1,3 +1,320 @@
-from django.test import TestCase
+import csv
+import json
+import os
+import tempfile
+from datetime import timedelta
+from importlib import import_module
+from io import BytesIO, StringIO
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db.models import Q
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from listings.models import Listing, ListingImage
+from listings.serializers import ListingImageSerializer
+from utils.field_tracker import UNKNOWN
+from utils.image_derivatives import DERIVATIVE_WIDTHS, build_derivatives
+from utils.image_pipeline import STALE_IMAGE_SECONDS, process_stale_images
+
+DESCRIPTION = 'A sturdy oak desk with two drawers, barely used, pickup only.'
+
+
+class ImportListingsTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('seller', password='pass')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def import_rows(self, rows):
+        """Import `rows` as a CSV file; returns {row number: errors} of the rejected rows"""
+        path = os.path.join(self.tmp.name, 'listings.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=['title', 'description', 'price'])
+            writer.writeheader()
+            writer.writerows(rows)
+        call_command('import_listings', path, seller='seller', stdout=StringIO())
+        with open(f'{path}.errors.jsonl', encoding='utf-8') as f:
+            return {entry['row']: entry['errors'] for entry in map(json.loads, f)}
+
+    def test_valid_rows_are_imported(self):
+        rejected = self.import_rows([{'title': 'Oak desk for sale', 'description': DESCRIPTION, 'price': '120.5'}])
+        self.assertEqual(rejected, {})
+        listing = Listing.objects.get()
+        self.assertEqual(str(listing.price), '120.50')
+        self.assertEqual(listing.status, 'pending')
+
+    def test_invalid_prices_are_rejected(self):
+        prices = ['NaN', 'sNaN', 'Infinity', '-Infinity', 'abc', '1e9', '0', '-5']
+        rejected = self.import_rows([
+            {'title': 'Oak desk for sale', 'description': DESCRIPTION, 'price': price} for price in prices
+        ])
+        self.assertEqual(rejected, {
+            1: ['Price must be a number'],
+            2: ['Price must be a number'],
+            3: ['Price must be a number'],
+            4: ['Price must be a number'],
+            5: ['Price must be a number'],
+            6: ['Price is too large'],
+            7: ['Price must be greater than zero'],
+            8: ['Price must be greater than zero'],
+        })
+        self.assertFalse(Listing.objects.exists())
+
+    def test_listing_rules_apply(self):
+        rejected = self.import_rows([
+            {'title': 'Desk', 'description': DESCRIPTION, 'price': '10'},
+            {'title': 'Oak desk for sale', 'description': 'Too short', 'price': '10'},
+            {'title': 'Oak desk ' * 30, 'description': DESCRIPTION, 'price': '10'},
+            {'title': 'Oak desk for sale', 'description': DESCRIPTION, 'price': '10'},
+        ])
+        self.assertEqual(rejected, {
+            1: ['Title must be at least 10 characters long'],
+            2: ['Description must be at least 50 characters long'],
+            3: ['Title must be at most 255 characters long'],
+        })
+        self.assertEqual(Listing.objects.get().title, 'Oak desk for sale')
+
+
+def jpeg_upload(name='photo.jpg'):
+    data = BytesIO()
+    Image.new('RGB', (800, 600), (200, 10, 10)).save(data, 'JPEG')
+    return SimpleUploadedFile(name, data.getvalue(), 'image/jpeg')
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_PROCESSING_WORKERS=0)
+class UnverifiedImageTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create_user('seller', password='pass')
+        self.listing = Listing.objects.create(
+            title='Oak desk for sale', description=DESCRIPTION, price=120, seller=seller, status='approved',
+        )
+        self.image = ListingImage.objects.create(listing=self.listing, image=jpeg_upload())
+
+    def test_upload_not_served_before_verification(self):
+        for status in ('pending', 'processing', 'failed'):
+            ListingImage.objects.filter(pk=self.image.pk).update(processing_status=status)
+            image = ListingImage.objects.get(pk=self.image.pk)
+            response = self.client.get(reverse('listing_detail', args=[self.listing.pk]))
+            self.assertNotContains(response, image.image.url)
+            self.assertEqual(image.thumbnail_url, '')
+            self.assertIsNone(ListingImageSerializer(image).data['image'])
+
+    def test_verified_image_is_served(self):
+        process_stale_images()  # Too recent to be stale
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.processing_status, 'pending')
+
+        ListingImage.objects.filter(pk=self.image.pk).update(
+            processing_status='processing',
+            uploaded_at=self.image.uploaded_at - timedelta(seconds=STALE_IMAGE_SECONDS + 1),
+        )
+        self.assertEqual(process_stale_images(), 1)
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.processing_status, 'ready')
+        response = self.client.get(reverse('listing_detail', args=[self.listing.pk]))
+        self.assertContains(response, self.image.display_url)
+        self.assertNotContains(response, 'Processing image')
+
+    def test_existing_images_stay_visible_after_migrating(self):
+        migration = import_module('listings.migrations.0004_listing_image_processing_status')
+        migration.mark_existing_images_ready(apps, None)
+        self.image.refresh_from_db()
+        self.assertEqual((self.image.processing_status, self.image.derivatives), ('ready', {}))
+        response = self.client.get(reverse('listing_detail', args=[self.listing.pk]))
+        self.assertContains(response, self.image.image.url)
+
+        # Its resized copies are generated later
+        call_command('generate_image_derivatives', stdout=StringIO())
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.processing_status, 'ready')
+        self.assertEqual(set(self.image.derivatives), {'webp', 'jpeg'})
+
+
+class ImageDerivativeTests(TestCase):
+    def upload(self, size, mode='RGB', color=(200, 10, 10), fmt='JPEG', exif=None):
+        data = BytesIO()
+        kwargs = {'exif': exif} if exif is not None else {}
+        Image.new(mode, size, color).save(data, fmt, **kwargs)
+        data.seek(0)
+        return data
+
+    def opened(self, built):
+        """{format: {width: (Pillow format, size)}} of built derivatives"""
+        result = {}
+        for name, by_width in built.items():
+            result[name] = {}
+            for width, data in by_width.items():
+                with Image.open(BytesIO(data)) as img:
+                    result[name][width] = (img.format, img.size)
+        return result
+
+    def test_every_width_in_webp_and_jpeg(self):
+        built = build_derivatives(self.upload((2000, 1000)))
+        self.assertEqual(self.opened(built), {
+            'webp': {width: ('WEBP', (width, width // 2)) for width in DERIVATIVE_WIDTHS},
+            'jpeg': {width: ('JPEG', (width, width // 2)) for width in DERIVATIVE_WIDTHS},
+        })
+
+    def test_images_are_never_upscaled(self):
+        built = self.opened(build_derivatives(self.upload((800, 600))))
+        self.assertEqual(built['jpeg'], {320: ('JPEG', (320, 240)), 640: ('JPEG', (640, 480))})
+
+        built = self.opened(build_derivatives(self.upload((200, 100))))
+        self.assertEqual(built['webp'], {200: ('WEBP', (200, 100))})
+
+    def test_exif_is_applied_and_dropped(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90° clockwise
+        exif[0x010F] = 'Phone maker'
+        exif[0x0131] = 'Phone software'
+        built = build_derivatives(self.upload((1200, 400), exif=exif))
+        for name, by_width in built.items():
+            self.assertEqual(set(by_width), {320})
+            with Image.open(BytesIO(by_width[320])) as img:
+                # Portrait, as the phone showed it
+                self.assertEqual(img.size, (320, 960))
+                self.assertEqual(dict(img.getexif()), {})
+                self.assertNotIn('exif', img.info)
+
+    def test_transparency_is_flattened_onto_white(self):
+        built = build_derivatives(self.upload((400, 400), mode='RGBA', color=(0, 0, 0, 0), fmt='PNG'))
+        with Image.open(BytesIO(built['jpeg'][320])) as img:
+            self.assertEqual(img.mode, 'RGB')
+            self.assertGreater(min(img.getpixel((160, 160))), 250)
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_PROCESSING_WORKERS=0)
+    def test_paths_are_recorded_and_served(self):
+        seller = User.objects.create_user('seller', password='pass')
+        listing = Listing.objects.create(
+            title='Oak desk for sale', description=DESCRIPTION, price=120, seller=seller, status='approved',
+        )
+        image = ListingImage.objects.create(listing=listing, image=jpeg_upload())
+        call_command('generate_image_derivatives', stdout=StringIO())
+        image.refresh_from_db()
+        self.assertEqual(set(image.derivatives['webp']), {'320', '640'})
+        self.assertTrue(image.derivatives['jpeg']['640'].endswith('_640w.jpg'))
+        data = ListingImageSerializer(image).data
+        self.assertEqual(data['srcset']['webp'], image.webp_srcset)
+        self.assertIn('320w', image.webp_srcset)
+        self.assertIn('640w', image.webp_srcset)
+
+
+class FieldTrackerTests(TestCase):
+    def setUp(self):
+        seller = User.objects.create_user('seller', password='pass')
+        self.listing = Listing.objects.create(
+            title='Oak desk for sale', description=DESCRIPTION, price=120, seller=seller,
+        )
+
+    def test_changes_are_known_without_a_query(self):
+        listing = Listing.objects.get(pk=self.listing.pk)
+        with self.assertNumQueries(0):
+            self.assertFalse(listing.has_changed('status'))
+            listing.status = 'approved'
+            self.assertTrue(listing.has_changed('status'))
+            self.assertEqual(listing.previous_value('status'), 'pending')
+            listing.status = 'pending'
+            self.assertFalse(listing.has_changed('status'))
+
+    def test_unsaved_listings_have_no_previous_value(self):
+        listing = Listing(title='Oak desk for sale', description=DESCRIPTION, price=120)
+        self.assertIsNone(listing.previous_value('status'))
+        self.assertTrue(listing.has_changed('status'))
+
+    def test_saving_records_the_saved_values(self):
+        listing = Listing.objects.get(pk=self.listing.pk)
+        listing.status = 'approved'
+        listing.price = 100
+        listing.save(update_fields=['status'])
+        self.assertFalse(listing.has_changed('status'))
+        self.assertEqual(listing.previous_value('status'), 'approved')
+        # Not written by that save
+        self.assertTrue(listing.has_changed('price'))
+        listing.save()
+        self.assertFalse(listing.has_changed('price'))
+
+    def test_deferred_fields_are_recorded_when_loaded(self):
+        listing = Listing.objects.only('title').get(pk=self.listing.pk)
+        self.assertEqual(listing.status, 'pending')  # Loaded here
+        listing.status = 'approved'
+        self.assertEqual(listing.previous_value('status'), 'pending')
+
+        listing = Listing.objects.defer('price').get(pk=self.listing.pk)
+        self.assertEqual(listing.price, 120)
+        self.assertFalse(listing.has_changed('price'))
+
+    def test_deferred_fields_assigned_before_loading_are_unknown(self):
+        listing = Listing.objects.only('title').get(pk=self.listing.pk)
+        listing.status = 'pending'
+        self.assertIs(listing.previous_value('status'), UNKNOWN)
+        self.assertTrue(listing.has_changed('status'))
+
+    def test_refresh_from_db_records_the_stored_values(self):
+        listing = Listing.objects.get(pk=self.listing.pk)
+        Listing.objects.filter(pk=listing.pk).update(status='approved', price=90)
+        listing.refresh_from_db(fields=['status'])
+        self.assertEqual(listing.previous_value('status'), 'approved')
+        self.assertFalse(listing.has_changed('status'))
+        self.assertEqual(listing.previous_value('price'), 120)
+        listing.refresh_from_db()
+        self.assertEqual(listing.previous_value('price'), 90)
+        self.assertFalse(listing.has_changed('price'))
+
+
+class ListingAPITests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        other = User.objects.create_user('other', password='pass')
+        for status, seller in [('approved', self.seller), ('pending', self.seller), ('approved', other), ('pending', other)]:
+            Listing.objects.create(
+                title=f'Oak desk for sale ({status})', description=DESCRIPTION, price=120, seller=seller, status=status,
+            )
+
+    def listed(self):
+        response = self.client.get('/api/listings/', {'page_size': 2})
+        self.assertEqual(set(response.data), {'next', 'results'})
+        ids = [listing['id'] for listing in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            ids += [listing['id'] for listing in response.data['results']]
+        return ids
+
+    def test_anonymous_users_see_approved_listings(self):
+        ids = self.listed()
+        self.assertCountEqual(ids, Listing.objects.filter(status='approved').values_list('id', flat=True))
+
+    def test_sellers_also_see_their_own_listings_once(self):
+        self.client.login(username='seller', password='pass')
+        ids = self.listed()
+        expected = Listing.objects.filter(Q(status='approved') | Q(seller=self.seller)).values_list('id', flat=True)
+        self.assertEqual(len(ids), len(set(ids)))
+        self.assertCountEqual(ids, expected)
+
+
+class HomeCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        seller = User.objects.create_user('seller', password='pass')
+        Listing.objects.create(
+            title='Oak desk for sale', description=DESCRIPTION, price=120, seller=seller, status='approved',
+        )
+
+    def test_cached_page_keeps_its_headers(self):
+        first = self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            second = self.client.get(reverse('home'))
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second.headers, first.headers)
+        self.assertEqual(second['Content-Type'], 'text/html; charset=utf-8')
+        self.assertIn('Cookie', second['Vary'])
+
+    def test_signed_in_users_are_not_served_the_cached_page(self):
+        self.client.get(reverse('home'))
+        self.client.login(username='seller', password='pass')
+        self.assertContains(self.client.get(reverse('home')), 'id="logoutForm"')
@@ -4,25 +4,42 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
+from django.contrib.messages import get_messages
+from django.views.decorators.vary import vary_on_cookie
 from .models import Listing, Category, ListingImage
 from .serializers import ListingSerializer, CategorySerializer
 from .forms import ListingForm
 from services.listings_service import create_listing as create_listing_service
+from search.backends import get_search_backend
+from utils.pagination import paginate_keyset, InvalidCursor
+from utils.cache import get_or_set_single_flight
+from .cache import home_cache_key, home_cache_timeout, get_categories
 
+HOME_PAGE_SIZE = 20
+
+@vary_on_cookie
 def home(request):
     # Get search parameters
     search_query = request.GET.get('q', '').strip()
     category_id = request.GET.get('category', '').strip()
+    cursor = request.GET.get('cursor')
+    
+    # Anonymous pages with no flash messages are the same for everyone, so
+    # serve them from the cache; a single request rebuilds an expired page.
+    # The whole response is cached, as cache_page does, to keep its headers
+    if not request.user.is_authenticated and not len(get_messages(request)):
+        return get_or_set_single_flight(
+            home_cache_key(search_query, category_id, cursor),
+            lambda: render(request, 'home.html', _home_context(search_query, category_id, cursor)),
+            home_cache_timeout(),
+        )
     
+    return render(request, 'home.html', _home_context(search_query, category_id, cursor))
+
+def _home_context(search_query, category_id, cursor):
     # Start with approved listings only
     listings = Listing.objects.filter(status='approved').select_related('category', 'seller').prefetch_related('images')
     
-    # Filter by search query (product name/title)
-    if search_query:
-        listings = listings.filter(
-            Q(title__icontains=search_query) | Q(description__icontains=search_query)
-        )
-    
     # Filter by category if selected
     if category_id:
         try:
@@ -30,23 +47,33 @@ def home(request):
         except (ValueError, TypeError):
             pass  # Invalid category ID, ignore it
     
-    # Order by creation date (newest first) and limit to 20 results
-    listings = listings.order_by('-created_at')[:20]
+    # Full-text search ranked by relevance and recency, otherwise newest first
+    if search_query:
+        backend = get_search_backend()
+        listings = backend.search(listings, search_query)
+        ordering = ('-search_rank', '-id') if backend.ranked else ('-created_at', '-id')
+    else:
+        ordering = ('-created_at', '-id')
+    
+    # Keyset pagination: 20 results per page, continued with ?cursor=
+    try:
+        page = paginate_keyset(listings, ordering, cursor, HOME_PAGE_SIZE)
+    except InvalidCursor:
+        page = paginate_keyset(listings, ordering, None, HOME_PAGE_SIZE)
     
-    categories = Category.objects.all()
+    categories = get_categories()
     
     # Determine if this is a search result
     is_search = bool(search_query or category_id)
     
-    context = {
-        'listings': listings,
+    return {
+        'listings': page.items,
+        'next_cursor': page.next_cursor,
         'categories': categories,
         'search_query': search_query,
         'selected_category': category_id,
         'is_search': is_search,
     }
-    
-    return render(request, 'home.html', context)
 
 @login_required
 def create_listing_view(request):
@@ -64,6 +91,8 @@ def create_listing_view(request):
                 from django.contrib import messages
                 if listing.status == 'pending':
                     messages.success(request, 'Your listing has been submitted and is pending moderation review.')
+                elif listing.status == 'rejected':
+                    messages.error(request, 'Your listing was rejected by our spam checks. Please review the guidelines and try again.')
                 else:
                     messages.success(request, 'Your listing has been created successfully!')
                 return redirect('home')
@@ -114,7 +143,7 @@ def edit_listing(request, pk):
                 new_images = request.FILES.getlist('images')
                 if new_images:
                     from utils.image_validation import validate_images
-                    is_valid, error_msg, valid_images = validate_images(new_images, max_count=5 - listing.images.count())
+                    is_valid, error_msg, valid_images = validate_images(new_images, max_count=5 - listing.images.count(), verify=False)
                     if not is_valid:
                         from django.contrib import messages
                         messages.error(request, error_msg)
@@ -220,9 +249,10 @@ class CategoryViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     permission_classes = [permissions.AllowAny]
+    pagination_class = None  # Small, fixed list
 
 class ListingViewSet(viewsets.ModelViewSet):
-    queryset = Listing.objects.filter(status='approved').order_by('-created_at')
+    queryset = Listing.objects.order_by('-created_at')
     serializer_class = ListingSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
     parser_classes = [MultiPartParser, FormParser]
@@ -292,8 +322,7 @@ class ListingViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Allow sellers to see their own pending/rejected listings
-        queryset = super().get_queryset()
+        visible = Q(status='approved')
         if self.request.user.is_authenticated:
-            my_listings = Listing.objects.filter(seller=self.request.user)
-            queryset = queryset | my_listings
-        return queryset.distinct()
+            visible |= Q(seller=self.request.user)
+        return super().get_queryset().filter(visible)
@@ -1,21 +1,36 @@
 from django.contrib import admin
-from .models import ModerationQueue
+from .models import ModerationQueue, SpamRule, ModerationDecision
 
 @admin.register(ModerationQueue)
 class ModerationQueueAdmin(admin.ModelAdmin):
-    list_display = ['listing', 'status', 'reason', 'created_at', 'reviewed_at']
+    list_display = ['listing', 'status', 'priority', 'claimed_by', 'reason', 'decision_reason', 'created_at', 'reviewed_at']
     list_filter = ['status', 'created_at']
-    search_fields = ['listing__title', 'listing__seller__username', 'reason']
-    readonly_fields = ['created_at', 'reviewed_at']
+    search_fields = ['listing__title', 'listing__seller__username', 'reason', 'decision_reason']
+    readonly_fields = ['created_at', 'reviewed_at', 'duplicates', 'similar_listings', 'priority', 'claimed_by', 'lease_expires_at']
     fieldsets = (
         ('Listing Information', {
             'fields': ('listing',)
         }),
         ('Moderation Details', {
-            'fields': ('status', 'reason', 'created_at', 'reviewed_at')
+            'fields': ('status', 'reason', 'decision_reason', 'priority', 'duplicates', 'similar_listings', 'claimed_by', 'lease_expires_at', 'created_at', 'reviewed_at')
         }),
     )
     
     def get_queryset(self, request):
         qs = super().get_queryset(request)
-        return qs.select_related('listing', 'listing__seller', 'listing__category')
+        return qs.select_related('listing', 'listing__seller', 'listing__category', 'claimed_by')
+
+@admin.register(SpamRule)
+class SpamRuleAdmin(admin.ModelAdmin):
+    list_display = ['pattern', 'kind', 'weight', 'is_active', 'updated_at']
+    list_filter = ['kind', 'is_active']
+    list_editable = ['weight', 'is_active']
+    search_fields = ['pattern']
+
+@admin.register(ModerationDecision)
+class ModerationDecisionAdmin(admin.ModelAdmin):
+    list_display = ['listing', 'decision', 'rule', 'reason', 'spam_score', 'latency_ms', 'created_at']
+    list_filter = ['decision', 'rule', 'created_at']
+    search_fields = ['listing__title', 'reason']
+    readonly_fields = ['listing', 'decision', 'rule', 'reason', 'spam_score', 'latency_ms', 'rule_timings', 'created_at']
+    list_select_related = ['listing']
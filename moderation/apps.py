@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ModerationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'moderation'
+
+    def ready(self):
+        """Import signals when app is ready"""
+        import moderation.signals
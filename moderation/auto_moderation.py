@@ -0,0 +1,216 @@
+"""
+Rules-based auto-moderation of new listings.
+
+Each rule looks at one signal about a listing (spam score, near-duplicate
+text or images, the seller's account age, ratings and recent rejections) and
+either decides or passes. Rules run in the order of AUTO_MODERATION_RULES and
+the first decision wins:
+
+- 'reject': obvious spam, rejected without a moderator
+- 'review': left in the moderation queue for a human
+- 'wait': not decided yet (images still being processed); evaluated again
+  once they are (utils/image_pipeline.py)
+
+A listing that passes every rule is approved. Facts are loaded lazily, so a
+listing rejected by the first rule costs no further queries. Rules are plain
+functions registered with @rule, like background tasks.
+"""
+import logging
+import time
+from datetime import timedelta
+from functools import cached_property
+
+from django.conf import settings
+from django.db.models import Avg, Count
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+APPROVE = 'approve'
+REJECT = 'reject'
+REVIEW = 'review'
+WAIT = 'wait'
+
+_rules = {}
+
+
+def rule(name):
+    """Register a function(facts) -> (decision, reason) or None as an auto-moderation rule"""
+    def decorator(func):
+        _rules[name] = func
+        return func
+    return decorator
+
+
+class ListingFacts:
+    """What the rules know about a listing, each fact queried on first use"""
+
+    def __init__(self, listing):
+        self.listing = listing
+        self.now = timezone.now()
+
+    @property
+    def spam_score(self):
+        # Includes NEAR_DUPLICATE_SPAM_WEIGHT when similar descriptions were found
+        return self.listing.flags
+
+    @cached_property
+    def queue_entry(self):
+        return self.listing.moderation_entries.filter(status='pending').order_by('-id').first()
+
+    @property
+    def similar_listings(self):
+        return self.queue_entry.similar_listings if self.queue_entry else []
+
+    @property
+    def duplicate_images(self):
+        return self.queue_entry.duplicates if self.queue_entry else []
+
+    @property
+    def account_age(self):
+        return self.now - self.listing.seller.date_joined
+
+    @cached_property
+    def seller_rating(self):
+        """(number of ratings, average score or None)"""
+        from ratings.models import Rating
+        stats = Rating.objects.filter(rated_user_id=self.listing.seller_id).aggregate(count=Count('id'), average=Avg('score'))
+        return stats['count'], stats['average']
+
+    @cached_property
+    def recent_rejections(self):
+        from listings.models import Listing
+        since = self.now - timedelta(days=getattr(settings, 'AUTO_MODERATION_REJECTION_WINDOW_DAYS', 30))
+        return Listing.objects.filter(seller_id=self.listing.seller_id, status='rejected', updated_at__gte=since).count()
+
+    @cached_property
+    def image_statuses(self):
+        return set(self.listing.images.values_list('processing_status', flat=True))
+
+
+@rule('obvious_spam')
+def obvious_spam(facts):
+    threshold = getattr(settings, 'AUTO_REJECT_MIN_SPAM_SCORE', 90)
+    if facts.spam_score >= threshold:
+        return REJECT, f"Spam score {facts.spam_score} (auto-reject at {threshold})"
+
+
+@rule('spam_score')
+def spam_score(facts):
+    from services.moderation_service import should_moderate
+    if should_moderate(facts.spam_score) or facts.spam_score > getattr(settings, 'AUTO_APPROVE_MAX_SPAM_SCORE', 20):
+        return REVIEW, f"Spam score {facts.spam_score}"
+
+
+@rule('similar_text')
+def similar_text(facts):
+    if facts.similar_listings:
+        return REVIEW, f"Description similar to {len(facts.similar_listings)} other listing(s)"
+
+
+@rule('account_age')
+def account_age(facts):
+    min_days = getattr(settings, 'AUTO_APPROVE_MIN_ACCOUNT_AGE_DAYS', 7)
+    if facts.account_age < timedelta(days=min_days):
+        return REVIEW, f"Seller account is less than {min_days} day(s) old"
+
+
+@rule('recent_rejections')
+def recent_rejections(facts):
+    if facts.recent_rejections:
+        return REVIEW, f"Seller had {facts.recent_rejections} listing(s) rejected recently"
+
+
+@rule('seller_rating')
+def seller_rating(facts):
+    count, average = facts.seller_rating
+    min_average = getattr(settings, 'AUTO_APPROVE_MIN_AVERAGE_RATING', 3.5)
+    # A few ratings say little; judge the average once there are enough
+    if count >= getattr(settings, 'AUTO_APPROVE_MIN_RATINGS', 3) and average < min_average:
+        return REVIEW, f"Seller rated {average:.1f} on average (below {min_average})"
+
+
+@rule('images')
+def images(facts):
+    if facts.image_statuses & {'pending', 'processing'}:
+        return WAIT, "Images are still being processed"
+    if 'failed' in facts.image_statuses:
+        return REVIEW, "An image could not be processed"
+
+
+@rule('duplicate_images')
+def duplicate_images(facts):
+    # After 'images', so every image has been hashed and compared
+    if facts.duplicate_images:
+        listings = {d['duplicate_listing'] for d in facts.duplicate_images}
+        return REVIEW, f"Images also used on {len(listings)} other listing(s)"
+
+
+class Verdict:
+    def __init__(self, decision, rule, reason, timings):
+        self.decision = decision
+        self.rule = rule
+        self.reason = reason
+        # {rule: milliseconds} for every rule that ran
+        self.timings = timings
+
+    @property
+    def latency_ms(self):
+        return sum(self.timings.values())
+
+
+def evaluate(listing):
+    """Run the configured rules on a listing and return its Verdict"""
+    facts = ListingFacts(listing)
+    timings = {}
+    for name in settings.AUTO_MODERATION_RULES:
+        func = _rules.get(name)
+        if func is None:
+            logger.error(f"Unknown auto-moderation rule {name}")
+            continue
+        started = time.perf_counter()
+        outcome = func(facts)
+        timings[name] = round((time.perf_counter() - started) * 1000, 3)
+        if outcome is not None:
+            decision, reason = outcome
+            return Verdict(decision, name, reason, timings)
+    return Verdict(APPROVE, '', "Passed all auto-moderation rules", timings)
+
+
+def decision_metrics(since):
+    """
+    Auto-moderation figures for decisions made after `since`: counts per
+    decision, the auto-approve rate and latency per rule in milliseconds.
+    """
+    from .models import ModerationDecision
+
+    decisions = ModerationDecision.objects.filter(created_at__gte=since)
+    counts = dict(decisions.values_list('decision').annotate(count=Count('id')).order_by())
+    total = sum(counts.values())
+
+    samples = {}
+    latencies = []
+    for latency, timings in decisions.values_list('latency_ms', 'rule_timings').iterator(chunk_size=2000):
+        latencies.append(latency)
+        for name, ms in timings.items():
+            samples.setdefault(name, []).append(ms)
+
+    return {
+        'total': total,
+        'decisions': {choice: counts.get(choice, 0) for choice in (APPROVE, REJECT, REVIEW)},
+        'auto_approve_rate': counts.get(APPROVE, 0) / total if total else None,
+        'latency_ms': _summary(latencies),
+        'rule_latency_ms': {name: _summary(values) for name, values in samples.items()},
+    }
+
+
+def _summary(values):
+    if not values:
+        return {'count': 0, 'avg': None, 'p95': None, 'max': None}
+    values = sorted(values)
+    return {
+        'count': len(values),
+        'avg': sum(values) / len(values),
+        'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+        'max': values[-1],
+    }
@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from listings.models import Listing
+from moderation.auto_moderation import WAIT, decision_metrics, evaluate
+from services.moderation_service import auto_moderate
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the auto-moderation rules over pending listings (e.g. after an import '
+        'or a threshold change), or prints auto-moderation metrics with --stats'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Show what the rules would decide without applying it')
+        parser.add_argument('--limit', type=int, help='Stop after this many listings')
+        parser.add_argument('--reevaluate', action='store_true', help='Also re-run listings the rules already sent to review')
+        parser.add_argument('--stats', action='store_true', help='Print decision counts and rule latency instead')
+        parser.add_argument('--hours', type=int, default=24, help='Window for --stats (default 24)')
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats(options['hours'])
+
+        pending = Listing.objects.filter(status='pending').select_related('seller').order_by('id')
+        if not options['reevaluate']:
+            pending = pending.filter(moderation_decisions__isnull=True)
+        if options['limit']:
+            pending = pending[:options['limit']]
+
+        counts = {}
+        for listing in pending.iterator(chunk_size=500):
+            if options['dry_run']:
+                verdict = evaluate(listing)
+                decision, rule = verdict.decision, verdict.rule
+            else:
+                result = auto_moderate(listing.pk, reevaluate=options['reevaluate'])
+                decision, rule = (result.decision, result.rule) if result else (WAIT, '')
+            key = (decision, rule or 'all rules passed')
+            counts[key] = counts.get(key, 0) + 1
+
+        for (decision, rule), count in sorted(counts.items()):
+            self.stdout.write(f'{decision:8} {rule:20} {count}')
+        total = sum(counts.values())
+        prefix = 'Would decide' if options['dry_run'] else 'Evaluated'
+        self.stdout.write(self.style.SUCCESS(f'{prefix} {total} pending listing(s)'))
+
+    def print_stats(self, hours):
+        metrics = decision_metrics(timezone.now() - timedelta(hours=hours))
+        self.stdout.write(f"Last {hours}h: {metrics['total']} decision(s)")
+        for decision, count in metrics['decisions'].items():
+            self.stdout.write(f'  {decision:8} {count}')
+        if metrics['auto_approve_rate'] is not None:
+            self.stdout.write(f"Auto-approve rate: {metrics['auto_approve_rate']:.1%}")
+        self.stdout.write('Latency (ms)             avg      p95      max')
+        rows = [('total', metrics['latency_ms'])] + sorted(metrics['rule_latency_ms'].items())
+        for name, summary in rows:
+            if summary['count']:
+                self.stdout.write(f"  {name:20} {summary['avg']:7.2f}  {summary['p95']:7.2f}  {summary['max']:7.2f}")
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from listings.models import ListingImage
+from services.moderation_service import flag_duplicate_images
+from utils.image_hashing import dhash
+
+
+class Command(BaseCommand):
+    help = 'Hashes listing images that have no perceptual hash and flags duplicates on pending moderation entries'
+
+    def handle(self, *args, **options):
+        hashed = 0
+        for image in ListingImage.objects.filter(dhash__isnull=True).exclude(processing_status='failed').iterator():
+            try:
+                with image.image.open('rb') as source:
+                    value = dhash(source)
+            except Exception as e:
+                self.stderr.write(f'Image {image.pk}: {e}')
+                continue
+            if value is None:
+                break  # Pillow is not installed
+            image.set_dhash(value)
+            image.save(update_fields=['dhash', 'dhash_band_0', 'dhash_band_1', 'dhash_band_2', 'dhash_band_3'])
+            hashed += 1
+
+        flagged = 0
+        pending = ListingImage.objects.filter(
+            dhash__isnull=False, listing__moderation_entries__status='pending'
+        ).distinct()
+        for image in pending.iterator():
+            if flag_duplicate_images(image):
+                flagged += 1
+        self.stdout.write(self.style.SUCCESS(f'Hashed {hashed} image(s); {flagged} image(s) awaiting moderation have duplicates'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+from moderation.models import SpamRule
+from moderation.spam_rules import invalidate_rules
+
+
+class Command(BaseCommand):
+    help = 'Loads spam rules from a text file: one pattern per line, optionally followed by a tab and a weight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--regex', action='store_true', help='Treat the patterns as regular expressions')
+        parser.add_argument('--weight', type=int, default=30, help='Weight for lines without one')
+
+    def handle(self, *args, **options):
+        kind = 'regex' if options['regex'] else 'keyword'
+        existing = set(SpamRule.objects.filter(kind=kind).values_list('pattern', flat=True))
+        rules = []
+        with open(options['path'], encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip('\n')
+                if not line.strip() or line.startswith('#'):
+                    continue
+                pattern, _, weight = line.partition('\t')
+                rule = SpamRule(pattern=pattern.strip(), kind=kind, weight=int(weight) if weight else options['weight'])
+                if rule.pattern in existing:
+                    continue
+                try:
+                    rule.clean()
+                except Exception as e:
+                    raise CommandError(f'Line {line_number}: {e}')
+                existing.add(rule.pattern)
+                rules.append(rule)
+
+        SpamRule.objects.bulk_create(rules, batch_size=1000)
+        # bulk_create sends no signals
+        invalidate_rules()
+        self.stdout.write(self.style.SUCCESS(f'Added {len(rules)} {kind} rule(s)'))
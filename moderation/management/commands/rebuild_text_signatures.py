@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from listings.models import Listing
+from moderation.minhash import band_buckets, pack, signature
+from moderation.models import ListingTextBucket, ListingTextSignature
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the MinHash signatures and LSH buckets used to find near-duplicate listing descriptions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        started = time.monotonic()
+        with transaction.atomic():
+            ListingTextBucket.objects.all().delete()
+            ListingTextSignature.objects.all().delete()
+
+        done = 0
+        last_id = 0
+        while True:
+            rows = list(
+                Listing.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'description')[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            signatures = []
+            buckets = []
+            for listing_id, description in rows:
+                sig = signature(description)
+                if sig is None:
+                    continue
+                signatures.append(ListingTextSignature(listing_id=listing_id, signature=pack(sig)))
+                buckets.extend(ListingTextBucket(listing_id=listing_id, bucket=b) for b in band_buckets(sig))
+            with transaction.atomic():
+                ListingTextSignature.objects.bulk_create(signatures)
+                ListingTextBucket.objects.bulk_create(buckets, batch_size=5000)
+            done += len(rows)
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {done} listing(s) in {elapsed:.1f}s ({done / elapsed:.0f} rows/s)'))
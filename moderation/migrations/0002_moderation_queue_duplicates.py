@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationqueue',
+            name='duplicates',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
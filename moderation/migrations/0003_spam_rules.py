@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:59
+
+from django.db import migrations, models
+
+
+def create_default_rules(apps, schema_editor):
+    # The keywords check_spam_score() used to hardcode
+    SpamRule = apps.get_model('moderation', 'SpamRule')
+    SpamRule.objects.bulk_create([
+        SpamRule(pattern=keyword, kind='keyword', weight=30)
+        for keyword in ['cash only', 'urgent', 'wire transfer', 'western union']
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0002_moderation_queue_duplicates'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pattern', models.CharField(help_text='Keywords match anywhere in the text, case-insensitively', max_length=255)),
+                ('kind', models.CharField(choices=[('keyword', 'Keyword'), ('regex', 'Regular expression')], default='keyword', max_length=10)),
+                ('weight', models.IntegerField(default=30)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['kind', 'pattern'],
+            },
+        ),
+        migrations.RunPython(create_default_rules, migrations.RunPython.noop),
+    ]
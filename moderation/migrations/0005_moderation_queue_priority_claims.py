@@ -0,0 +1,56 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def set_pending_priorities(apps, schema_editor):
+    # Same formula as services.moderation_service.moderation_priority at the time of writing
+    ModerationQueue = apps.get_model('moderation', 'ModerationQueue')
+    entries = ModerationQueue.objects.filter(status='pending').select_related('listing')
+    batch = []
+    for entry in entries.iterator(chunk_size=1000):
+        duplicate_listings = {d.get('duplicate_listing') for d in entry.duplicates}
+        entry.priority = entry.listing.flags + 20 * min(len(duplicate_listings), 5)
+        batch.append(entry)
+        if len(batch) >= 1000:
+            ModerationQueue.objects.bulk_update(batch, ['priority'])
+            batch = []
+    ModerationQueue.objects.bulk_update(batch, ['priority'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_listing_image_dhash'),
+        ('moderation', '0004_listing_text_minhash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationqueue',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='claimed_moderation_entries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='moderationqueue',
+            name='lease_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='moderationqueue',
+            name='priority',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='moderationqueue',
+            index=models.Index(fields=['status', '-priority', 'created_at', 'id'], name='moderation__status_52da48_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='moderationqueue',
+            index=models.Index(fields=['claimed_by', 'lease_expires_at'], name='moderation__claimed_6ec9dc_idx'),
+        ),
+        migrations.RunPython(set_pending_priorities, migrations.RunPython.noop),
+    ]
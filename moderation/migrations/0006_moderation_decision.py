@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('listings', '0005_listing_image_dhash'),
+        ('moderation', '0005_moderation_queue_priority_claims'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationDecision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('decision', models.CharField(choices=[('approve', 'Approved'), ('reject', 'Rejected'), ('review', 'Sent to review')], max_length=10)),
+                ('rule', models.CharField(blank=True, max_length=50)),
+                ('reason', models.TextField(blank=True)),
+                ('spam_score', models.IntegerField(default=0)),
+                ('latency_ms', models.FloatField(default=0)),
+                ('rule_timings', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('listing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moderation_decisions', to='listings.listing')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-created_at'], name='moderation__created_0e84b7_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:56
+
+from django.db import migrations, models
+from django.db.models import Q
+
+
+def move_decisions(apps, schema_editor):
+    # Bulk decisions used to overwrite the intake reason; those entries keep
+    # only the decision, which now has its own column
+    ModerationQueue = apps.get_model('moderation', 'ModerationQueue')
+    decided = Q()
+    for prefix in ('Approved by', 'Rejected by', 'Auto-approved:', 'Auto-rejected:'):
+        decided |= Q(reason__startswith=prefix)
+    for entry in ModerationQueue.objects.filter(decided, status='reviewed').only('id', 'reason').iterator():
+        ModerationQueue.objects.filter(pk=entry.pk).update(decision_reason=entry.reason, reason='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0006_moderation_decision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationqueue',
+            name='decision_reason',
+            field=models.TextField(blank=True),
+        ),
+        migrations.RunPython(move_decisions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('moderation', '0007_moderation_queue_decision_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='moderationqueue',
+            name='auto_moderation',
+            field=models.BooleanField(default=False),
+        ),
+    ]
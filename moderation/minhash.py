@@ -0,0 +1,83 @@
+"""
+Near-duplicate listing text detection with MinHash and LSH.
+
+A description is cut into overlapping word shingles; its MinHash signature
+keeps, for each of NUM_PERMUTATIONS hash functions, the smallest hash of any
+shingle. The share of equal positions in two signatures estimates the Jaccard
+similarity of their shingle sets.
+
+Signatures are split into LSH_BANDS bands of LSH_ROWS values and each band is
+hashed to a bucket (ListingTextBucket). Listings sharing a bucket are
+candidates; only those are compared in full, so a lookup touches a few rows
+instead of the whole catalogue. With 16 bands of 4 rows, pairs above ~0.5
+similarity are likely to collide and pairs above 0.8 almost always do.
+
+All hashes are derived from blake2b and a fixed seed, so signatures stay
+comparable across processes and deploys.
+"""
+import hashlib
+import random
+import re
+import struct
+
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+LSH_ROWS = NUM_PERMUTATIONS // LSH_BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+_random = random.Random(20240601)
+_PERMUTATIONS = [
+    (_random.randrange(1, _MERSENNE_PRIME), _random.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERMUTATIONS)
+]
+_SIGNATURE_FORMAT = f'<{NUM_PERMUTATIONS}I'
+
+WORD_RE = re.compile(r'\w+')
+
+
+def shingles(text):
+    """Set of SHINGLE_SIZE-word shingles of normalised text"""
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def _stable_hash(value, size=4):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=size).digest(), 'little')
+
+
+def signature(text):
+    """MinHash signature of `text` as a tuple of NUM_PERMUTATIONS ints, or None if it has no words"""
+    hashes = [_stable_hash(shingle) for shingle in shingles(text)]
+    if not hashes:
+        return None
+    return tuple(
+        min(((a * h + b) % _MERSENNE_PRIME) & _MAX_HASH for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def pack(sig):
+    return struct.pack(_SIGNATURE_FORMAT, *sig)
+
+
+def unpack(data):
+    return struct.unpack(_SIGNATURE_FORMAT, bytes(data))
+
+
+def band_buckets(sig):
+    """One signed 64-bit bucket id per band; the band number is part of the hash"""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = sig[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        digest = hashlib.blake2b(struct.pack(f'<I{LSH_ROWS}I', band, *rows), digest_size=8).digest()
+        buckets.append(int.from_bytes(digest, 'little', signed=True))
+    return buckets
+
+
+def similarity(sig_a, sig_b):
+    """Estimated Jaccard similarity of two signatures"""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / NUM_PERMUTATIONS
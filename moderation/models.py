@@ -1,5 +1,9 @@
+import re
+from django.core.exceptions import ValidationError
+from django.conf import settings
 from django.db import models
 from listings.models import Listing
+from .spam_rules import rule_group
 
 class ModerationQueue(models.Model):
     STATUS_CHOICES = [
@@ -8,10 +12,121 @@ class ModerationQueue(models.Model):
     ]
 
     listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='moderation_entries')
+    # Why the listing was queued (spam score, matched rules, similar listings)
     reason = models.TextField(blank=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     reviewed_at = models.DateTimeField(null=True, blank=True)
+    # Who or what closed the entry and why, e.g. "Approved by alice"
+    decision_reason = models.TextField(blank=True)
+    # Near-duplicate images found on other listings:
+    # [{'image': id, 'duplicate_image': id, 'duplicate_listing': id, 'distance': bits}]
+    duplicates = models.JSONField(default=list, blank=True)
+    # Listings with near-identical descriptions: [{'listing': id, 'similarity': 0.0-1.0}]
+    similar_listings = models.JSONField(default=list, blank=True)
+    # Riskiest first: spam score plus duplicate hits (services.moderation_service.moderation_priority)
+    priority = models.IntegerField(default=0)
+    # Moderator working on this entry until the lease expires (services.moderation_service.claim_entries)
+    claimed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_moderation_entries'
+    )
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    # Queued by create_listing or import_listings for auto-moderation to decide
+    # once the listing's images are processed; older entries wait for a moderator
+    auto_moderation = models.BooleanField(default=False)
+
+    # Work order of the queue; keyset paginated, so it ends in the primary key
+    QUEUE_ORDERING = ('-priority', 'created_at', 'id')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'created_at', 'id']),
+            models.Index(fields=['claimed_by', 'lease_expires_at']),
+        ]
 
     def __str__(self):
         return f"Moderation for {self.listing.title}"
+
+    def is_claimed_by_other(self, user, now=None):
+        """True while another moderator holds an unexpired lease on this entry"""
+        from django.utils import timezone
+        if self.claimed_by_id is None or self.claimed_by_id == user.pk or self.lease_expires_at is None:
+            return False
+        return self.lease_expires_at > (now or timezone.now())
+
+
+class SpamRule(models.Model):
+    """A keyword or regular expression that adds to a listing's spam score"""
+    KIND_CHOICES = [
+        ('keyword', 'Keyword'),
+        ('regex', 'Regular expression'),
+    ]
+
+    pattern = models.CharField(max_length=255, help_text="Keywords match anywhere in the text, case-insensitively")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default='keyword')
+    weight = models.IntegerField(default=30)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['kind', 'pattern']
+
+    def __str__(self):
+        return self.pattern
+
+    def clean(self):
+        if self.kind == 'regex':
+            try:
+                compiled = re.compile(self.pattern)
+            except re.error as e:
+                raise ValidationError({'pattern': f"Invalid regular expression: {e}"})
+            # Rules are combined into one regex; own groups would clash
+            if compiled.groups:
+                raise ValidationError({'pattern': "Use non-capturing groups (?:...) in spam rules"})
+            # and flags like (?i) only work at the very start of a pattern
+            try:
+                re.compile(rule_group(0, self.pattern))
+            except re.error:
+                raise ValidationError({'pattern': "Inline flags such as (?i) must be scoped, e.g. (?i:...); "
+                                                  "spam rules already ignore case"})
+
+
+class ListingTextSignature(models.Model):
+    """MinHash signature of a listing description, see moderation/minhash.py"""
+    listing = models.OneToOneField(Listing, on_delete=models.CASCADE, primary_key=True, related_name='text_signature')
+    signature = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+class ListingTextBucket(models.Model):
+    """LSH band bucket of a listing's signature; listings sharing a bucket are near-duplicate candidates"""
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='text_buckets')
+    bucket = models.BigIntegerField(db_index=True)
+
+
+class ModerationDecision(models.Model):
+    """Outcome of the auto-moderation rules for a listing (moderation/auto_moderation.py)"""
+    DECISION_CHOICES = [
+        ('approve', 'Approved'),
+        ('reject', 'Rejected'),
+        ('review', 'Sent to review'),
+    ]
+
+    listing = models.ForeignKey(Listing, on_delete=models.CASCADE, related_name='moderation_decisions')
+    decision = models.CharField(max_length=10, choices=DECISION_CHOICES)
+    # Rule that decided; empty when the listing passed every rule
+    rule = models.CharField(max_length=50, blank=True)
+    reason = models.TextField(blank=True)
+    spam_score = models.IntegerField(default=0)
+    latency_ms = models.FloatField(default=0)
+    # Time spent in each rule that ran: {rule: milliseconds}
+    rule_timings = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_decision_display()} listing {self.listing_id} ({self.rule or 'all rules passed'})"
@@ -7,5 +7,5 @@ class ModerationQueueSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ModerationQueue
-        fields = ['id', 'listing', 'listing_details', 'reason', 'status', 'created_at', 'reviewed_at']
-        read_only_fields = ['created_at', 'reviewed_at']
+        fields = ['id', 'listing', 'listing_details', 'reason', 'decision_reason', 'duplicates', 'similar_listings', 'priority', 'claimed_by', 'lease_expires_at', 'status', 'created_at', 'reviewed_at']
+        read_only_fields = ['decision_reason', 'duplicates', 'similar_listings', 'priority', 'claimed_by', 'lease_expires_at', 'created_at', 'reviewed_at']
@@ -0,0 +1,24 @@
+"""
+Signals that recompile the spam rules engine when rules change, and keep
+the near-duplicate text index in step with edited descriptions
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from listings.models import Listing
+from services.moderation_service import index_listing_text
+from .models import SpamRule
+from .spam_rules import invalidate_rules
+
+@receiver([post_save, post_delete], sender=SpamRule)
+def invalidate_spam_rules(sender, instance, **kwargs):
+    invalidate_rules()
+
+@receiver(post_save, sender=Listing)
+def reindex_edited_description(sender, instance, created, **kwargs):
+    """
+    Re-index the description whenever an edit changes it, from any view or
+    service. New listings are indexed by create_listing and import_listings,
+    which already have the signature at hand.
+    """
+    if not created and instance.has_changed('description'):
+        index_listing_text(instance)
@@ -0,0 +1,173 @@
+"""
+Spam rules engine.
+
+All active SpamRule rows are compiled into two matchers:
+- keywords into one Aho-Corasick automaton, so a listing is scanned once
+  whatever the number of keywords
+- regular expressions into a single pattern with one named lookahead group
+  per rule, so every rule matching at a position is seen in one scan
+
+The compiled engine is kept per process and rebuilt only when the rules
+version in the cache changes; saving or deleting a rule bumps it
+(moderation/signals.py).
+"""
+import logging
+import re
+import threading
+from collections import deque
+
+from utils.cache import bump_version, get_version
+
+logger = logging.getLogger(__name__)
+
+RULES_CACHE_NAMESPACE = 'spam_rules'
+
+
+class AhoCorasick:
+    """Finds every occurrence of many keywords in one pass over the text"""
+
+    def __init__(self, keywords):
+        # keywords: iterable of (keyword, value); matches report the values
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]
+        for keyword, value in keywords:
+            self._add(keyword, value)
+        self._link()
+
+    def _add(self, keyword, value):
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(value)
+
+    def _link(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                # Inherit the matches of the longest proper suffix
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def find(self, text):
+        """Yield the value of every keyword occurrence in `text`"""
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                yield from output[state]
+
+
+def rule_group(rule_id, pattern):
+    """
+    A regex rule as its part of the combined pattern: an optional zero-width
+    lookahead, so it records its match without consuming text and the other
+    rules are still tried at the same position
+    """
+    return f'(?:(?=(?P<r{rule_id}>{pattern})))?'
+
+
+class SpamRuleEngine:
+    def __init__(self, rules):
+        self.rules = {rule.id: rule for rule in rules}
+        self.keywords = AhoCorasick(
+            (rule.pattern.lower(), rule.id) for rule in rules if rule.kind == 'keyword' and rule.pattern
+        )
+        parts = []
+        patterns = []
+        for rule in rules:
+            if rule.kind != 'regex':
+                continue
+            # Each rule is checked as it will sit in the combined pattern: a
+            # pattern valid on its own, like "(?i)free money", can break it
+            part = rule_group(rule.id, rule.pattern)
+            try:
+                compiled = re.compile(part, re.IGNORECASE)
+            except re.error as e:
+                logger.error(f"Skipping invalid spam rule {rule.id}: {e}")
+                continue
+            if compiled.groups != 1:
+                logger.error(f"Skipping spam rule {rule.id}: it has its own capturing groups")
+                continue
+            parts.append(part)
+            patterns.append(f'(?:{rule.pattern})')
+        try:
+            # The leading lookahead skips positions where no rule matches;
+            # the optional groups then record every rule that does
+            self.regex = re.compile(f"(?={'|'.join(patterns)}){''.join(parts)}", re.IGNORECASE) if parts else None
+        except re.error as e:
+            # Checked part by part above; never let a rule break listing creation
+            logger.error(f"Regex spam rules disabled: {e}")
+            self.regex = None
+
+    def match(self, text):
+        """
+        Rules hit by `text` as [(rule, occurrences)], heaviest first. A regex
+        rule counts its matches as its own finditer would, whatever other
+        rules match the same text.
+        """
+        counts = {}
+        for rule_id in self.keywords.find(text.lower()):
+            counts[rule_id] = counts.get(rule_id, 0) + 1
+        if self.regex is not None:
+            ends = {}
+            for m in self.regex.finditer(text):
+                for group, matched in m.groupdict().items():
+                    if matched is None:
+                        continue
+                    start, end = m.span(group)
+                    rule_id = int(group[1:])
+                    # Non-overlapping per rule: later matches inside this one are skipped
+                    if start < ends.get(rule_id, 0):
+                        continue
+                    ends[rule_id] = max(end, start + 1)
+                    counts[rule_id] = counts.get(rule_id, 0) + 1
+        hits = [(self.rules[rule_id], count) for rule_id, count in counts.items()]
+        hits.sort(key=lambda hit: (-hit[0].weight, hit[0].pattern))
+        return hits
+
+
+_engine = None
+_engine_version = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The compiled engine for the current rules, rebuilt after any rule change"""
+    global _engine, _engine_version
+    from .models import SpamRule
+
+    version = get_version(RULES_CACHE_NAMESPACE)
+    if _engine is None or _engine_version != version:
+        with _engine_lock:
+            if _engine is None or _engine_version != version:
+                _engine = SpamRuleEngine(list(SpamRule.objects.filter(is_active=True)))
+                _engine_version = version
+    return _engine
+
+
+def invalidate_rules():
+    bump_version(RULES_CACHE_NAMESPACE)
+
+
+def format_hits(hits):
+    """Rule hits as text for ModerationQueue.reason"""
+    return ', '.join(
+        f"'{rule.pattern}' +{rule.weight}" + (f" (x{count})" if count > 1 else '')
+        for rule, count in hits
+    )
@@ -0,0 +1,17 @@
+"""
+Background tasks for moderation bookkeeping
+"""
+from django.utils import timezone
+from jobs.queue import task
+from .models import ModerationQueue
+
+@task('moderation.close_queue_entries')
+def close_queue_entries(listing_ids, reason):
+    """Mark the pending moderation entries of the given listings as reviewed"""
+    ModerationQueue.objects.filter(listing_id__in=listing_ids, status='pending').update(
+        status='reviewed',
+        reviewed_at=timezone.now(),
+        decision_reason=reason,
+        claimed_by=None,
+        lease_expires_at=None,
+    )
@@ -1,3 +1,271 @@
-from django.test import TestCase
+import tempfile
+from datetime import timedelta
+from io import BytesIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from listings.models import Listing, ListingImage
+from moderation.models import ListingTextSignature, ModerationDecision, ModerationQueue, SpamRule
+from moderation.spam_rules import SpamRuleEngine, get_engine
+from services.moderation_service import (
+    approve_listings, auto_moderate, claim_entries, find_duplicate_images, release_entries,
+)
+from utils.image_pipeline import STALE_IMAGE_SECONDS, process_stale_images
+
+DESCRIPTION = 'A sturdy oak desk with two drawers, barely used, pickup only.'
+
+
+class SpamRuleEngineTests(TestCase):
+    def test_keywords_and_regexes(self):
+        keyword = SpamRule.objects.create(pattern='free money', kind='keyword', weight=40)
+        regex = SpamRule.objects.create(pattern=r'whats?app \+?\d{6,}', kind='regex', weight=50)
+        engine = SpamRuleEngine([keyword, regex])
+        hits = engine.match('FREE MONEY! Free money, WhatsApp +123456789')
+        self.assertEqual(hits, [(regex, 1), (keyword, 2)])
+        self.assertEqual(engine.match('A used bicycle'), [])
+
+    def test_overlapping_regex_rules_all_count(self):
+        offer = SpamRule.objects.create(pattern=r'free\s+money', kind='regex', weight=40)
+        refund = SpamRule.objects.create(pattern=r'money\s+back', kind='regex', weight=30)
+        phone = SpamRule.objects.create(pattern=r'\d{6,}', kind='regex', weight=20)
+        contact = SpamRule.objects.create(pattern=r'call \d{6,}', kind='regex', weight=50)
+        engine = SpamRuleEngine([offer, refund, phone, contact])
+        hits = engine.match('Free money back guaranteed! Call 5551234 or 5559876, free  money BACK')
+        self.assertEqual(hits, [(contact, 1), (offer, 2), (refund, 2), (phone, 2)])
+
+    def test_invalid_rules_are_skipped(self):
+        good = SpamRule.objects.create(pattern=r'crypto\s+giveaway', kind='regex', weight=50)
+        rules = [
+            SpamRule.objects.create(pattern='(?i)free money', kind='regex'),
+            SpamRule.objects.create(pattern='(unclosed', kind='regex'),
+            SpamRule.objects.create(pattern='(own) group', kind='regex'),
+            good,
+        ]
+        with self.assertLogs('moderation.spam_rules', 'ERROR') as logs:
+            engine = SpamRuleEngine(rules)
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(engine.match('Crypto  giveaway, free money, own group'), [(good, 1)])
+
+    def test_engine_rebuilt_after_rule_change(self):
+        self.assertEqual(get_engine().match('cheap replica watches'), [])
+        rule = SpamRule.objects.create(pattern='replica', kind='keyword')
+        self.assertEqual(get_engine().match('cheap replica watches'), [(rule, 1)])
+
+
+class SpamRuleCleanTests(TestCase):
+    def assertPatternInvalid(self, pattern):
+        with self.assertRaises(ValidationError) as cm:
+            SpamRule(pattern=pattern, kind='regex').clean()
+        self.assertIn('pattern', cm.exception.message_dict)
+
+    def test_rejects_invalid_regexes(self):
+        self.assertPatternInvalid('(unclosed')
+        self.assertPatternInvalid('(own) group')
+        self.assertPatternInvalid('(?i)free money')
+
+    def test_accepts_scoped_flags_and_keywords(self):
+        SpamRule(pattern='(?i:free) money', kind='regex').clean()
+        SpamRule(pattern='(?i)free money', kind='keyword').clean()
+
+
+class TextIndexTests(TestCase):
+    def test_edited_description_is_reindexed(self):
+        seller = User.objects.create_user('seller', password='pass')
+        listing = Listing.objects.create(
+            title='Oak desk for sale', price=120, seller=seller,
+            description='A sturdy oak desk with two drawers, barely used, pickup only.',
+        )
+        # New listings are indexed by create_listing, not by the signal
+        self.assertFalse(ListingTextSignature.objects.exists())
+
+        listing = Listing.objects.get(pk=listing.pk)
+        listing.price = 100
+        listing.save()
+        self.assertFalse(ListingTextSignature.objects.exists())
+
+        listing.description = 'A walnut bookcase with five shelves, some scratches on the side panels.'
+        listing.save()
+        first = ListingTextSignature.objects.get(listing=listing).signature
+        self.assertTrue(listing.text_buckets.exists())
+
+        listing.description = 'Kids bicycle, 16 inch wheels, with stabilisers and a bell, blue frame.'
+        listing.save()
+        self.assertNotEqual(bytes(ListingTextSignature.objects.get(listing=listing).signature), bytes(first))
+
+
+class ModerationDecisionReasonTests(TestCase):
+    def test_decision_keeps_intake_reason(self):
+        seller = User.objects.create_user('seller', password='pass')
+        listing = Listing.objects.create(
+            title='Oak desk for sale', price=120, seller=seller,
+            description='A sturdy oak desk with two drawers, barely used, pickup only.',
+        )
+        entry = ModerationQueue.objects.create(listing=listing, reason='New listing - Spam score: 40')
+        self.assertEqual(approve_listings([listing.pk], reason='Approved by alice'), [listing.pk])
+        entry.refresh_from_db()
+        self.assertEqual(entry.status, 'reviewed')
+        self.assertEqual(entry.reason, 'New listing - Spam score: 40')
+        self.assertEqual(entry.decision_reason, 'Approved by alice')
+
+
+class DuplicateImageTests(TestCase):
+    HASH = 0x0123_4567_89AB_CDEF
+
+    def setUp(self):
+        seller = User.objects.create_user('seller', password='pass')
+        self.listing, self.other = [
+            Listing.objects.create(title=f'Oak desk for sale {i}', description='A sturdy oak desk.', price=120, seller=seller)
+            for i in range(2)
+        ]
+
+    def add_image(self, listing, value):
+        # bulk_create skips the post_save processing of new uploads
+        image = ListingImage(listing=listing, image='listings/photo.jpg', processing_status='ready')
+        image.set_dhash(value)
+        [image] = ListingImage.objects.bulk_create([image])
+        return image
+
+    @override_settings(DUPLICATE_IMAGE_MAX_DISTANCE=3)
+    def test_crowded_band_does_not_hide_duplicates(self):
+        image = self.add_image(self.listing, self.HASH)
+        # One bit off in each of the last three bands: only the first is shared
+        duplicate = self.add_image(self.other, self.HASH ^ 0x0000_0001_0001_0001)
+        # Newer images sharing that band, more than the results returned
+        for i in range(25):
+            self.add_image(self.other, self.HASH ^ (0xFFFF_FFFF_FF00 + i))
+
+        with self.assertNumQueries(1):
+            matches = find_duplicate_images(image, limit=20)
+        self.assertEqual(matches, [(duplicate, 3)])
+
+    def test_closest_duplicates_first(self):
+        image = self.add_image(self.listing, self.HASH)
+        far = self.add_image(self.other, self.HASH ^ 0b1011)
+        near = self.add_image(self.other, self.HASH ^ 0b1)
+        self.add_image(self.other, self.HASH ^ 0b11111)
+        self.assertEqual(find_duplicate_images(image), [(near, 1), (far, 3)])
+        self.assertEqual(find_duplicate_images(image, limit=1), [(near, 1)])
+
+
+class ClaimEntriesTests(TestCase):
+    def setUp(self):
+        self.alice = User.objects.create_user('alice', password='pass')
+        self.bob = User.objects.create_user('bob', password='pass')
+        seller = User.objects.create_user('seller', password='pass')
+        self.entries = [
+            ModerationQueue.objects.create(
+                listing=Listing.objects.create(
+                    title=f'Oak desk for sale {i}', description=DESCRIPTION, price=120, seller=seller,
+                ),
+                priority=priority,
+            )
+            for i, priority in enumerate([10, 50, 30, 0])
+        ]
+
+    def ids(self, entries):
+        return [entry.id for entry in entries]
+
+    def test_moderators_claim_different_entries_riskiest_first(self):
+        first, second, third, fourth = self.entries
+        self.assertEqual(self.ids(claim_entries(self.alice, limit=2)), [second.id, third.id])
+        self.assertEqual(self.ids(claim_entries(self.bob, limit=2)), [first.id, fourth.id])
+        self.assertEqual(claim_entries(User.objects.create_user('carol'), limit=2), [])
+
+    def test_held_entries_are_renewed_and_count_towards_the_limit(self):
+        claimed = self.ids(claim_entries(self.alice, limit=2))
+        ModerationQueue.objects.filter(id__in=claimed).update(lease_expires_at=timezone.now() + timedelta(seconds=5))
+        self.assertEqual(self.ids(claim_entries(self.alice, limit=2)), claimed)
+        self.assertEqual(self.ids(claim_entries(self.alice, limit=3)), claimed + [self.entries[0].id])
+        lease = ModerationQueue.objects.get(id=claimed[0]).lease_expires_at
+        self.assertGreater(lease, timezone.now() + timedelta(seconds=60))
+
+    def test_expired_and_released_entries_can_be_claimed(self):
+        claimed = self.ids(claim_entries(self.alice, limit=2))
+        ModerationQueue.objects.filter(id=claimed[0]).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.ids(claim_entries(self.bob, limit=1)), [claimed[0]])
+
+        self.assertEqual(release_entries(self.alice), 1)
+        self.assertEqual(self.ids(claim_entries(self.bob, limit=2)), [claimed[0], claimed[1]])
+        self.assertEqual(release_entries(self.bob, [claimed[1]]), 1)
+        self.assertEqual(ModerationQueue.objects.get(id=claimed[1]).claimed_by, None)
+
+
+@override_settings(
+    AUTO_MODERATION_ENABLED=True, AUTO_REJECT_MIN_SPAM_SCORE=90, AUTO_APPROVE_MAX_SPAM_SCORE=20,
+    AUTO_APPROVE_MIN_ACCOUNT_AGE_DAYS=7,
+)
+class AutoModerationTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        User.objects.filter(pk=self.seller.pk).update(date_joined=timezone.now() - timedelta(days=30))
+
+    def pending(self, spam_score=0):
+        listing = Listing.objects.create(
+            title='Oak desk for sale', description=DESCRIPTION, price=120, seller=self.seller, flags=spam_score,
+        )
+        ModerationQueue.objects.create(listing=listing, reason=f'New listing - Spam score: {spam_score}')
+        return listing
+
+    def assertDecision(self, listing, decision, rule, status):
+        result = auto_moderate(listing.pk)
+        self.assertEqual((result.decision, result.rule), (decision, rule))
+        listing.refresh_from_db()
+        self.assertEqual(listing.status, status)
+
+    def test_spam_score_thresholds(self):
+        self.assertDecision(self.pending(20), 'approve', '', 'approved')
+        self.assertDecision(self.pending(21), 'review', 'spam_score', 'pending')
+        self.assertDecision(self.pending(89), 'review', 'spam_score', 'pending')
+        self.assertDecision(self.pending(90), 'reject', 'obvious_spam', 'rejected')
+
+    def test_account_age_threshold(self):
+        User.objects.filter(pk=self.seller.pk).update(date_joined=timezone.now() - timedelta(days=6))
+        self.assertDecision(self.pending(), 'review', 'account_age', 'pending')
+        User.objects.filter(pk=self.seller.pk).update(date_joined=timezone.now() - timedelta(days=8))
+        self.assertDecision(self.pending(), 'approve', '', 'approved')
+
+    def test_first_matching_rule_decides(self):
+        User.objects.filter(pk=self.seller.pk).update(date_joined=timezone.now())
+        # Both spam rules and the account age match; the first in order wins
+        self.assertDecision(self.pending(95), 'reject', 'obvious_spam', 'rejected')
+
+    def test_listing_is_decided_once(self):
+        listing = self.pending(30)
+        self.assertDecision(listing, 'review', 'spam_score', 'pending')
+        Listing.objects.filter(pk=listing.pk).update(flags=0)
+        self.assertIsNone(auto_moderate(listing.pk))
+        self.assertEqual(ModerationDecision.objects.filter(listing=listing).count(), 1)
+        # Unless asked to look again
+        self.assertEqual(auto_moderate(listing.pk, reevaluate=True).decision, 'approve')
+
+    def test_moderator_decision_is_not_overridden(self):
+        listing = self.pending()
+        approve_listings([listing.pk], reason='Approved by alice')
+        self.assertIsNone(auto_moderate(listing.pk))
+        self.assertFalse(ModerationDecision.objects.exists())
+
+    @override_settings(MEDIA_ROOT=tempfile.mkdtemp(), IMAGE_PROCESSING_WORKERS=0)
+    def test_only_new_listings_are_decided_after_their_images(self):
+        legacy, new = self.pending(), self.pending()
+        ModerationQueue.objects.filter(listing=new).update(auto_moderation=True)
+        for listing in (legacy, new):
+            data = BytesIO()
+            Image.new('RGB', (800, 600), (200, 10, 10)).save(data, 'JPEG')
+            image = ListingImage(listing=listing)
+            image.image.save('photo.jpg', SimpleUploadedFile('photo.jpg', data.getvalue(), 'image/jpeg'), save=False)
+            ListingImage.objects.bulk_create([image])
+        # Left over from before a restart, as process_stale_images finds them
+        ListingImage.objects.update(uploaded_at=timezone.now() - timedelta(seconds=STALE_IMAGE_SECONDS + 1))
+
+        self.assertEqual(process_stale_images(), 2)
+        # The same photo twice, so the new listing goes to review as a duplicate
+        self.assertEqual(list(ModerationDecision.objects.values_list('listing', 'rule')), [(new.pk, 'duplicate_images')])
+
+    @override_settings(AUTO_MODERATION_ENABLED=False)
+    def test_disabled(self):
+        self.assertIsNone(auto_moderate(self.pending().pk))
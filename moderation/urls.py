@@ -1,12 +1,14 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ModerationQueueViewSet, moderation_dashboard, moderate_action
+from .views import ModerationQueueViewSet, moderation_dashboard, moderate_action, claim_batch, release_batch
 
 router = DefaultRouter()
 router.register(r'', ModerationQueueViewSet, basename='moderation')
 
 urlpatterns = [
     path('dashboard/', moderation_dashboard, name='moderation_dashboard'),
+    path('dashboard/claim/', claim_batch, name='moderation_claim'),
+    path('dashboard/release/', release_batch, name='moderation_release'),
     path('action/<int:pk>/<str:action>/', moderate_action, name='moderate_action'),
     path('', include(router.urls)),
 ]
@@ -1,66 +1,149 @@
 from rest_framework import viewsets, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
 from rest_framework.response import Response
-from django.utils import timezone
 from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib import messages
 from django.contrib.admin.views.decorators import staff_member_required
-from .models import ModerationQueue
+from datetime import timedelta
+from django.db.models import Count
+from django.utils import timezone
+from django.views.decorators.http import require_POST
+from .models import ModerationQueue, ModerationDecision
 from .serializers import ModerationQueueSerializer
+from services.moderation_service import (
+    approve_listings, reject_listings, claim_entries, release_entries, exclude_claimed_by_others,
+)
+from utils.pagination import paginate_keyset, InvalidCursor
+
+DASHBOARD_PAGE_SIZE = 25
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Claimed by another moderator.'
+    default_code = 'claimed'
 
 @staff_member_required
 def moderation_dashboard(request):
-    queue = ModerationQueue.objects.filter(status='pending').order_by('created_at')
-    return render(request, 'moderation/dashboard.html', {'queue': queue})
+    pending = ModerationQueue.objects.filter(status='pending')
+    entries = pending.select_related('listing', 'listing__seller', 'claimed_by').prefetch_related('listing__images')
+    my_batch = entries.filter(claimed_by=request.user, lease_expires_at__gt=timezone.now()).order_by(*ModerationQueue.QUEUE_ORDERING)
+
+    # Whole queue, riskiest first; keyset pagination keeps deep pages cheap
+    cursor = request.GET.get('cursor')
+    try:
+        page = paginate_keyset(entries, ModerationQueue.QUEUE_ORDERING, cursor, DASHBOARD_PAGE_SIZE)
+    except InvalidCursor:
+        page = paginate_keyset(entries, ModerationQueue.QUEUE_ORDERING, None, DASHBOARD_PAGE_SIZE)
+
+    return render(request, 'moderation/dashboard.html', {
+        'my_batch': list(my_batch),
+        'queue': page.items,
+        'next_cursor': page.next_cursor,
+        'pending_count': pending.count(),
+        'auto_decisions': _auto_decision_counts(timezone.now() - timedelta(hours=24)),
+        'now': timezone.now(),
+    })
+
+def _auto_decision_counts(since):
+    counts = dict(
+        ModerationDecision.objects.filter(created_at__gte=since)
+        .values_list('decision').annotate(count=Count('id')).order_by()
+    )
+    total = sum(counts.values())
+    return {
+        'total': total,
+        'approved': counts.get('approve', 0),
+        'rejected': counts.get('reject', 0),
+        'approve_rate': round(100 * counts.get('approve', 0) / total) if total else None,
+    }
+
+@staff_member_required
+@require_POST
+def claim_batch(request):
+    claimed = claim_entries(request.user)
+    if not claimed:
+        messages.info(request, "No unclaimed items left in the queue.")
+    return redirect('moderation_dashboard')
+
+@staff_member_required
+@require_POST
+def release_batch(request):
+    release_entries(request.user)
+    return redirect('moderation_dashboard')
 
 @staff_member_required
 def moderate_action(request, pk, action):
     entry = get_object_or_404(ModerationQueue, pk=pk)
+    if entry.is_claimed_by_other(request.user):
+        messages.error(request, f"{entry.listing.title} is being reviewed by {entry.claimed_by.username}.")
+        return redirect('moderation_dashboard')
     if action == 'approve':
-        entry.status = 'reviewed'
-        entry.reviewed_at = timezone.now()
-        entry.save()
-        entry.listing.status = 'approved'
-        entry.listing.save()
-        # Trigger saved search alerts (signal will handle this)
+        # Saved search alerts are queued by the listings_approved event
+        approve_listings([entry.listing_id], reason=f'Approved by {request.user.username}')
     elif action == 'reject':
-        entry.status = 'reviewed'
-        entry.reviewed_at = timezone.now()
-        entry.save()
-        entry.listing.status = 'rejected'
-        entry.listing.save()
+        reject_listings([entry.listing_id], reason=f'Rejected by {request.user.username}')
     return redirect('moderation_dashboard')
 
 class ModerationQueueViewSet(viewsets.ModelViewSet):
     queryset = ModerationQueue.objects.filter(status='pending')
     serializer_class = ModerationQueueSerializer
     permission_classes = [permissions.IsAdminUser]
+    keyset_ordering = ModerationQueue.QUEUE_ORDERING  # Riskiest first, like the dashboard
+
+    def get_queryset(self):
+        return super().get_queryset().select_related('listing', 'listing__seller', 'listing__category').prefetch_related('listing__images')
+
+    def get_object(self):
+        entry = super().get_object()
+        if self.action in ('approve', 'reject') and entry.is_claimed_by_other(self.request.user):
+            raise Conflict(f'Claimed by {entry.claimed_by.username} until {entry.lease_expires_at.isoformat()}')
+        return entry
 
     @action(detail=True, methods=['post'])
     def approve(self, request, pk=None):
         entry = self.get_object()
-        entry.status = 'reviewed'
-        entry.reviewed_at = timezone.now()
-        entry.save()
-        
-        # Update listing status
-        listing = entry.listing
-        listing.status = 'approved'
-        listing.save()
-        
-        # Trigger saved search alerts (signal will handle this)
-        
+        approve_listings([entry.listing_id], reason=f'Approved by {request.user.username}')
         return Response({'status': 'approved'})
 
     @action(detail=True, methods=['post'])
     def reject(self, request, pk=None):
         entry = self.get_object()
-        entry.status = 'reviewed'
-        entry.reviewed_at = timezone.now()
-        entry.save()
-        
-        # Update listing status
-        listing = entry.listing
-        listing.status = 'rejected'
-        listing.save()
-        
+        reject_listings([entry.listing_id], reason=f'Rejected by {request.user.username}')
         return Response({'status': 'rejected'})
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Approve or reject many entries at once: {"ids": [...], "action": "approve"|"reject"}"""
+        ids = request.data.get('ids') or []
+        decision = request.data.get('action')
+        if decision not in ('approve', 'reject') or not isinstance(ids, list):
+            return Response({'error': 'Expected "ids" (list) and "action" ("approve" or "reject")'}, status=status.HTTP_400_BAD_REQUEST)
+        # Entries other moderators have claimed are left to them
+        entries = exclude_claimed_by_others(self.get_queryset().filter(id__in=ids), request.user)
+        listing_ids = list(entries.values_list('listing_id', flat=True))
+        if decision == 'approve':
+            changed = approve_listings(listing_ids, reason=f'Approved by {request.user.username}')
+        else:
+            changed = reject_listings(listing_ids, reason=f'Rejected by {request.user.username}')
+        return Response({'status': 'approved' if decision == 'approve' else 'rejected', 'listings': changed})
+
+    @action(detail=False, methods=['post'])
+    def claim(self, request):
+        """Lease the next batch of entries to the caller: {"limit": n} (optional)"""
+        try:
+            limit = int(request.data.get('limit') or 0) or None
+        except (TypeError, ValueError):
+            return Response({'error': '"limit" must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit is not None:
+            limit = max(1, min(limit, 100))
+        entries = claim_entries(request.user, limit)
+        return Response({'results': self.get_serializer(entries, many=True).data})
+
+    @action(detail=False, methods=['post'])
+    def release(self, request):
+        """Give back claimed entries: {"ids": [...]} or all of the caller's claims"""
+        ids = request.data.get('ids')
+        if ids is not None and not isinstance(ids, list):
+            return Response({'error': '"ids" must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'released': release_entries(request.user, ids)})
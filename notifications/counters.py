@@ -0,0 +1,72 @@
+"""
+Per-user unread notification counters kept in the database.
+
+The badge count is read from the user's NotificationCounter row instead of
+counting Notification rows. Creating notifications adds to it and marking
+them read takes away from it, with an F() update in the same transaction as
+the notification rows, so concurrent writers cannot lose an update the way a
+read-then-write cache increment can.
+
+Counter rows are created with the user (notifications/signals.py) and for
+existing users by migration. A user without one, e.g. created by
+bulk_create, is counted from the database on every read and their writes
+skip the counter, so it cannot start out wrong.
+
+Counters can still drift when unread notifications are deleted without
+going through this module (a cascade, a manual edit); the
+reconcile_notification_counters command recounts them.
+"""
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import Notification, NotificationCounter
+
+
+def count_unread(user_ids):
+    """{user id: unread count} from the database, for users with any unread"""
+    return dict(
+        Notification.objects.filter(user_id__in=user_ids, is_read=False)
+        .values_list('user_id').annotate(count=Count('id')).order_by()
+    )
+
+
+def get_unread_counts(user_ids):
+    """{user id: unread count} for several users"""
+    counts = dict(NotificationCounter.objects.filter(user_id__in=user_ids).values_list('user_id', 'unread'))
+    missing = [user_id for user_id in user_ids if user_id not in counts]
+    if missing:
+        counted = count_unread(missing)
+        counts.update({user_id: counted.get(user_id, 0) for user_id in missing})
+    return counts
+
+
+def get_unread_count(user_id):
+    """A user's unread notification count"""
+    return get_unread_counts([user_id])[user_id]
+
+
+def adjust_unread_counts(deltas):
+    """
+    Add {user id: delta} to the users' counters (negative when notifications
+    are read). Call it in the transaction that created or read the rows.
+    """
+    by_delta = {}
+    for user_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(user_id)
+    for delta, user_ids in by_delta.items():
+        # Never below zero, even after a drift
+        unread = F('unread') + delta if delta > 0 else Greatest(F('unread') + delta, 0)
+        NotificationCounter.objects.filter(user_id__in=user_ids).update(unread=unread)
+
+
+def reconcile_unread_counts(user_ids):
+    """Reset the counters of `user_ids` to the database count. Returns the counts."""
+    user_ids = list(user_ids)
+    counted = count_unread(user_ids)
+    counts = {user_id: counted.get(user_id, 0) for user_id in user_ids}
+    NotificationCounter.objects.bulk_create(
+        [NotificationCounter(user_id=user_id, unread=count) for user_id, count in counts.items()],
+        update_conflicts=True, unique_fields=['user'], update_fields=['unread'],
+    )
+    return counts
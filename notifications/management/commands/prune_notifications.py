@@ -0,0 +1,110 @@
+import gzip
+import json
+import os
+import time
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+
+from notifications.models import Notification, NotificationArchive
+
+ARCHIVE_FIELDS = [
+    'id', 'user_id', 'notification_type', 'title', 'message', 'related_user_id', 'related_offer_id',
+    'related_listing_id', 'url', 'is_read', 'count', 'created_at', 'updated_at',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Deletes read notifications older than NOTIFICATION_RETENTION_DAYS, optionally archiving them '
+        'first to the notifications_notificationarchive table (compressed) or to gzipped JSON Lines files. '
+        'Works in short batches, each in its own transaction, so the live table is never locked for long; '
+        'meant to run from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep read notifications younger than this (default NOTIFICATION_RETENTION_DAYS)')
+        parser.add_argument('--archive', choices=['none', 'table', 'jsonl'], help='Default NOTIFICATION_ARCHIVE')
+        parser.add_argument('--archive-dir', help='Directory for --archive jsonl (default NOTIFICATION_ARCHIVE_DIR)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.05, help='Seconds to wait between batches, so other writers get through')
+        parser.add_argument('--limit', type=int, help='Stop after this many notifications')
+        parser.add_argument('--dry-run', action='store_true', help='Only count what would be pruned')
+
+    def handle(self, *args, **options):
+        days = options['days'] if options['days'] is not None else getattr(settings, 'NOTIFICATION_RETENTION_DAYS', 90)
+        if days < 1:
+            raise CommandError('--days must be at least 1')
+        archive = options['archive'] or getattr(settings, 'NOTIFICATION_ARCHIVE', 'table')
+        if archive not in ('none', 'table', 'jsonl'):
+            raise CommandError(f"Unknown NOTIFICATION_ARCHIVE {archive!r}; use 'none', 'table' or 'jsonl'")
+        batch_size = max(options['batch_size'], 1)
+        cutoff = timezone.now() - timedelta(days=days)
+        expired = Notification.objects.filter(is_read=True, created_at__lt=cutoff)
+
+        if options['dry_run']:
+            self.stdout.write(f'{expired.count()} read notification(s) older than {days} day(s) would be pruned')
+            return
+
+        archive_file = None
+        if archive == 'jsonl':
+            archive_dir = options['archive_dir'] or getattr(settings, 'NOTIFICATION_ARCHIVE_DIR', None)
+            if not archive_dir:
+                raise CommandError('--archive jsonl needs --archive-dir or NOTIFICATION_ARCHIVE_DIR')
+            os.makedirs(archive_dir, exist_ok=True)
+            path = os.path.join(archive_dir, f"notifications-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz")
+            archive_file = gzip.open(path, 'at', encoding='utf-8')
+
+        started = time.monotonic()
+        moved = 0
+        # Walks the (is_read, created_at) index forward, past rows already deleted
+        oldest = None
+        try:
+            while options['limit'] is None or moved < options['limit']:
+                size = batch_size if options['limit'] is None else min(batch_size, options['limit'] - moved)
+                batch = expired if oldest is None else expired.filter(created_at__gte=oldest)
+                rows = list(batch.order_by('created_at').values(*ARCHIVE_FIELDS)[:size])
+                if not rows:
+                    break
+                moved += self.move_batch(rows, archive, archive_file)
+                oldest = rows[-1]['created_at']
+                self.report(moved, started)
+                if options['pause']:
+                    time.sleep(options['pause'])
+        finally:
+            if archive_file is not None:
+                archive_file.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Pruned {moved} notification(s) older than {days} day(s)' + (f', archived to {archive}' if archive != 'none' else '')
+        ))
+
+    def move_batch(self, rows, archive, archive_file):
+        """Archive a batch and delete it, in one short transaction. Returns the rows deleted."""
+        ids = [row['id'] for row in rows]
+        lines = '\n'.join(json.dumps(row, cls=DjangoJSONEncoder) for row in rows)
+        if archive_file is not None:
+            # Written before the delete: a crash repeats rows in the archive rather than losing them
+            archive_file.write(lines + '\n')
+            archive_file.flush()
+        with transaction.atomic():
+            if archive == 'table':
+                NotificationArchive.objects.create(
+                    first_id=min(ids),
+                    last_id=max(ids),
+                    oldest_created_at=rows[0]['created_at'],
+                    newest_created_at=rows[-1]['created_at'],
+                    row_count=len(rows),
+                    data=zlib.compress(lines.encode(), 9),
+                )
+            deleted, _ = Notification.objects.filter(id__in=ids, is_read=True).delete()
+        return deleted
+
+    def report(self, moved, started):
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(f'{moved} pruned ({moved / elapsed:.0f} rows/s)')
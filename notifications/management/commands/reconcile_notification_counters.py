@@ -0,0 +1,29 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from notifications.counters import reconcile_unread_counts
+
+
+class Command(BaseCommand):
+    help = (
+        'Resets every unread notification counter to the count of unread notifications. '
+        'Run it after deleting notifications by hand; counters follow every other change.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = max(options['batch_size'], 1)
+        users = unread = 0
+        batch = []
+        for user_id in User.objects.order_by('id').values_list('id', flat=True).iterator(chunk_size=batch_size):
+            batch.append(user_id)
+            if len(batch) >= batch_size:
+                unread += sum(reconcile_unread_counts(batch).values())
+                users += len(batch)
+                batch = []
+        if batch:
+            unread += sum(reconcile_unread_counts(batch).values())
+            users += len(batch)
+        self.stdout.write(self.style.SUCCESS(f'Reconciled the counters of {users} user(s), {unread} unread notification(s)'))
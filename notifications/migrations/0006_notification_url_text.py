@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_archive'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='url',
+            field=models.TextField(blank=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:14
+
+from django.db import migrations, models
+
+
+def retype_disputes(apps, schema_editor):
+    # Dispute notices used to borrow the chat message type
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.filter(notification_type='message_received', title='Dispute Reported').update(
+        notification_type='dispute_reported',
+    )
+
+
+def untype_disputes(apps, schema_editor):
+    Notification = apps.get_model('notifications', 'Notification')
+    Notification.objects.filter(notification_type='dispute_reported').update(notification_type='message_received')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notification_url_text'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='notification',
+            name='notification_type',
+            field=models.CharField(choices=[('offer_received', 'Offer Received'), ('offer_accepted', 'Offer Accepted'), ('offer_rejected', 'Offer Rejected'), ('message_received', 'Message Received'), ('chat_started', 'Chat Started'), ('saved_search_match', 'Saved Search Match'), ('saved_search_digest', 'Saved Search Digest'), ('dispute_reported', 'Dispute Reported')], max_length=20),
+        ),
+        migrations.RunPython(retype_disputes, untype_disputes),
+    ]
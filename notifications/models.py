@@ -1,5 +1,9 @@
+import json
+import zlib
+
 from django.db import models
 from django.contrib.auth.models import User
+from django.urls import reverse
 from django.utils import timezone
 
 class Notification(models.Model):
@@ -11,6 +15,8 @@ class Notification(models.Model):
         ('message_received', 'Message Received'),
         ('chat_started', 'Chat Started'),
         ('saved_search_match', 'Saved Search Match'),
+        ('saved_search_digest', 'Saved Search Digest'),
+        ('dispute_reported', 'Dispute Reported'),
     ]
     
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
@@ -20,38 +26,51 @@ class Notification(models.Model):
     related_user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sent_notifications')
     related_offer = models.ForeignKey('offers.Offer', on_delete=models.CASCADE, null=True, blank=True)
     related_listing = models.ForeignKey('listings.Listing', on_delete=models.CASCADE, null=True, blank=True)
+    # Link target, resolved when the notification is created (see resolve_url);
+    # unbounded, as saved-search digests link to the search with its query
+    url = models.TextField(blank=True)
     is_read = models.BooleanField(default=False)
+    # Events folded into this row (notifications/utils.py coalesces bursts) and when the last one happened
+    count = models.PositiveIntegerField(default=1)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read', '-created_at']),
+            # Latest notifications and since_id polls (notifications/views.py)
+            models.Index(fields=['user', '-id']),
+            # Old read notifications for prune_notifications
+            models.Index(fields=['is_read', 'created_at']),
         ]
     
     def __str__(self):
         return f"{self.title} - {self.user.username}"
     
+    def save(self, *args, **kwargs):
+        if not self.url:
+            self.url = self.resolve_url()
+        super().save(*args, **kwargs)
+    
     def get_absolute_url(self):
         """Get URL related to this notification"""
-        if self.notification_type == 'offer_received' and self.related_offer:
-            from django.urls import reverse
-            return reverse('chat_with_user', args=[self.related_user.id, self.related_offer.id]) if self.related_user and self.related_offer else '#'
-        elif self.notification_type == 'message_received' and self.related_user:
-            from django.urls import reverse
-            return reverse('chat_with_user', args=[self.related_user.id])
-        elif self.notification_type == 'saved_search_match' and self.related_listing:
-            from django.urls import reverse
-            return reverse('listing_detail', args=[self.related_listing.id])
-        elif self.related_listing:
-            from django.urls import reverse
-            return reverse('listing_detail', args=[self.related_listing.id])
+        return self.url or self.resolve_url()
+    
+    def resolve_url(self):
+        """Work out the URL from the related ids, without loading the related rows"""
+        if self.notification_type == 'offer_received' and self.related_offer_id:
+            return reverse('chat_with_user', args=[self.related_user_id, self.related_offer_id]) if self.related_user_id else '#'
+        elif self.notification_type == 'message_received' and self.related_user_id:
+            return reverse('chat_with_user', args=[self.related_user_id])
+        elif self.related_listing_id:
+            return reverse('listing_detail', args=[self.related_listing_id])
         return '#'
     
     @property
     def time_ago(self):
-        """Return human-readable time ago"""
-        delta = timezone.now() - self.created_at
+        """Return human-readable time since the latest event"""
+        delta = timezone.now() - self.updated_at
         if delta.days > 0:
             return f"{delta.days} day{'s' if delta.days > 1 else ''} ago"
         elif delta.seconds >= 3600:
@@ -62,3 +81,34 @@ class Notification(models.Model):
             return f"{minutes} minute{'s' if minutes > 1 else ''} ago"
         else:
             return "Just now"
+
+
+class NotificationCounter(models.Model):
+    """A user's unread notification count, kept by notifications/counters.py"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='notification_counter')
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
+
+
+class NotificationArchive(models.Model):
+    """
+    Cold storage for pruned notifications: one row per batch, holding the
+    batch as zlib-compressed JSON Lines (prune_notifications --archive table).
+    No foreign keys, so deleting users or listings never touches it.
+    """
+    first_id = models.BigIntegerField()
+    last_id = models.BigIntegerField()
+    oldest_created_at = models.DateTimeField()
+    newest_created_at = models.DateTimeField()
+    row_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Notifications {self.first_id}-{self.last_id} ({self.row_count})"
+
+    def rows(self):
+        """The archived notifications as dicts"""
+        return [json.loads(line) for line in zlib.decompress(self.data).decode().splitlines()]
@@ -0,0 +1,13 @@
+"""
+Signals that give every new user an unread notification counter
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+from .models import NotificationCounter
+
+@receiver(post_save, sender=User)
+def create_notification_counter(sender, instance, created, raw=False, **kwargs):
+    """A new user has no notifications yet, so their counter starts exact"""
+    if created and not raw:
+        NotificationCounter.objects.get_or_create(user=instance)
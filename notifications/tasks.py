@@ -0,0 +1,22 @@
+"""
+Background tasks for notifications
+"""
+from jobs.queue import task
+
+@task('notifications.create_notification')
+def create_notification_task(user_id, notification_type, title, message, related_user_id=None, related_offer_id=None, related_listing_id=None):
+    from .utils import save_notification
+    save_notification({
+        'user_id': user_id,
+        'notification_type': notification_type,
+        'title': title,
+        'message': message,
+        'related_user_id': related_user_id,
+        'related_offer_id': related_offer_id,
+        'related_listing_id': related_listing_id,
+    })
+
+@task('notifications.create_notifications_bulk')
+def create_notifications_bulk_task(notifications, deduplicate=False):
+    from .utils import create_notifications_bulk
+    create_notifications_bulk(notifications, deduplicate=deduplicate)
@@ -1,3 +1,311 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from listings.models import Listing
+from notifications.counters import adjust_unread_counts, get_unread_count, reconcile_unread_counts
+from notifications.management.commands.prune_notifications import ARCHIVE_FIELDS
+from notifications.models import Notification, NotificationArchive, NotificationCounter
+from notifications.utils import create_notification, create_notifications_bulk
+from offers.models import Offer
+from payments.models import Payment
+from services.chat_service import send_message
+
+
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pass')
+        self.other = User.objects.create_user('bob', password='pass')
+
+    def notify(self, user, title='Offer accepted'):
+        return create_notification(user, 'offer_accepted', title, 'Your offer was accepted')
+
+    def test_counter_follows_created_and_read_notifications(self):
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        self.notify(self.user)
+        second = self.notify(self.user, 'Another offer accepted')
+        create_notifications_bulk([
+            {'user': user, 'notification_type': 'offer_accepted', 'title': 't', 'message': 'm'}
+            for user in (self.user, self.other)
+        ])
+        # Read from the counter row, without counting notifications
+        with self.assertNumQueries(1):
+            self.assertEqual(get_unread_count(self.user.id), 3)
+
+        self.client.login(username='alice', password='pass')
+        self.client.post(reverse('mark_notification_read', args=[second.id]))
+        # Read twice, counted once
+        self.client.post(reverse('mark_notification_read', args=[second.id]))
+        self.assertEqual(get_unread_count(self.user.id), 2)
+
+        self.client.post(reverse('mark_all_notifications_read'))
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        self.assertEqual(get_unread_count(self.other.id), 1)
+
+    def test_counter_is_updated_with_the_notifications(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.notify(self.user)
+            self.assertEqual(get_unread_count(self.user.id), 1)
+            raise RuntimeError
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_concurrent_updates_are_not_lost(self):
+        # Two writers holding the same stale count: each adds to the stored value
+        NotificationCounter.objects.filter(user=self.user).update(unread=5)
+        first = NotificationCounter.objects.get(user=self.user)
+        adjust_unread_counts({self.user.id: 1})
+        adjust_unread_counts({self.user.id: 1})
+        first.refresh_from_db()
+        self.assertEqual(first.unread, 7)
+
+    def test_users_without_a_counter_are_counted(self):
+        [carol] = User.objects.bulk_create([User(username='carol')])
+        self.notify(carol)
+        self.assertFalse(NotificationCounter.objects.filter(user=carol).exists())
+        self.assertEqual(get_unread_count(carol.id), 1)
+        self.assertEqual(reconcile_unread_counts([carol.id]), {carol.id: 1})
+        self.assertEqual(NotificationCounter.objects.get(user=carol).unread, 1)
+
+    def test_reconcile_fixes_drift(self):
+        self.notify(self.user)
+        # Bypasses the counters, as a cascade or a manual edit would
+        Notification.objects.filter(user=self.user).delete()
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(reconcile_unread_counts([self.user.id]), {self.user.id: 0})
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        # Reading never takes a counter below zero
+        adjust_unread_counts({self.user.id: -3})
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+
+class BulkNotificationTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller')
+        self.users = [User.objects.create_user(f'watcher{i}') for i in range(5)]
+        self.listing = Listing.objects.create(
+            title='Used phone', description='A used phone in good condition.', price=100, seller=self.seller,
+        )
+
+    def spec(self, user, listing=None):
+        return {
+            'user': user, 'notification_type': 'saved_search_match', 'title': 'New match',
+            'message': 'A new listing matches your search', 'related_listing': listing,
+        }
+
+    def test_rows_are_created_in_batches(self):
+        batches = []
+        bulk_create = Notification.objects.bulk_create
+
+        def record(rows, *args, **kwargs):
+            batches.append(len(rows))
+            return bulk_create(rows, *args, **kwargs)
+
+        with mock.patch.object(Notification.objects, 'bulk_create', side_effect=record):
+            created = create_notifications_bulk([self.spec(user) for user in self.users], batch_size=2)
+        self.assertEqual(batches, [2, 2, 1])
+        self.assertEqual(len(created), 5)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(get_unread_count(self.users[0].id), 1)
+
+    def test_deduplicate_skips_stored_and_repeated_rows(self):
+        first, second, third = self.users[:3]
+        create_notification(first, 'saved_search_match', 'New match', 'Match', related_listing=self.listing)
+        create_notification(second, 'saved_search_match', 'New match', 'Match')
+        created = create_notifications_bulk([
+            self.spec(first, self.listing),   # already stored
+            self.spec(first),                 # another listing: kept
+            self.spec(second),                # already stored, without a listing
+            self.spec(second, self.listing),
+            self.spec(third, self.listing),
+            self.spec(third, self.listing),   # repeated in a later batch
+        ], batch_size=2, deduplicate=True)
+        self.assertEqual(
+            [(n.user, n.related_listing) for n in created],
+            [(first, None), (second, self.listing), (third, self.listing)],
+        )
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_without_deduplicate_every_row_is_created(self):
+        specs = [self.spec(self.users[0], self.listing)] * 2
+        self.assertEqual(len(create_notifications_bulk(specs)), 2)
+
+
+@override_settings(NOTIFICATION_COALESCE_SECONDS=600)
+class NotificationListTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pass')
+        self.sender = User.objects.create_user('bob', password='pass')
+        self.client.login(username='alice', password='pass')
+
+    def notify(self, title='New message from bob'):
+        return create_notification(self.user, 'message_received', title, 'Hello', related_user=self.sender)
+
+    def get(self, etag=None, **params):
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse('get_notifications'), params, headers=headers)
+
+    def test_unchanged_list_is_not_modified(self):
+        self.notify()
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('private', response['Cache-Control'])
+        etag = response['ETag']
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_etag_changes_when_notifications_change(self):
+        first = self.notify()
+        etags = [self.get()['ETag']]
+        # Coalesced into the same row
+        self.assertEqual(self.notify('Another message from bob').id, first.id)
+        etags.append(self.get()['ETag'])
+        create_notification(self.user, 'offer_accepted', 'Offer accepted', 'Your offer was accepted')
+        etags.append(self.get()['ETag'])
+        self.client.post(reverse('mark_all_notifications_read'))
+        etags.append(self.get()['ETag'])
+        self.assertEqual(len(set(etags)), 4)
+        self.assertEqual(self.get(etags[-1]).status_code, 304)
+        self.assertEqual(self.get(etags[0]).status_code, 200)
+
+    def test_since_id_returns_newer_notifications(self):
+        first = create_notification(self.user, 'offer_received', 'Offer received', 'New offer')
+        second = create_notification(self.user, 'offer_accepted', 'Offer accepted', 'Accepted')
+        third = create_notification(self.user, 'offer_rejected', 'Offer rejected', 'Rejected')
+        data = self.get(since_id=first.id).json()
+        self.assertEqual([n['id'] for n in data['notifications']], [third.id, second.id])
+        self.assertEqual(data['unread_count'], 3)
+        self.assertEqual(self.get(since_id=third.id).json()['notifications'], [])
+        self.assertEqual(self.get(since_id='latest').status_code, 400)
+
+
+@override_settings(NOTIFICATION_RETENTION_DAYS=90)
+class PruneNotificationsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice')
+        now = timezone.now()
+        ages_and_reads = [(200, True), (150, True), (120, True), (100, True), (95, True), (150, False), (10, True)]
+        notifications = Notification.objects.bulk_create([
+            Notification(user=self.user, notification_type='offer_accepted', title=f'Offer {i}', message='Accepted', is_read=is_read)
+            for i, (_, is_read) in enumerate(ages_and_reads)
+        ])
+        for notification, (days, _) in zip(notifications, ages_and_reads):
+            Notification.objects.filter(pk=notification.pk).update(created_at=now - timedelta(days=days))
+        # Oldest first
+        self.expired = [n.id for n in notifications[:5]]
+        self.kept = [n.id for n in notifications[5:]]
+
+    def prune(self, **options):
+        call_command('prune_notifications', pause=0, stdout=StringIO(), **options)
+
+    def test_batches_are_archived_to_the_table(self):
+        self.prune(archive='table', batch_size=2)
+        self.assertCountEqual(Notification.objects.values_list('id', flat=True), self.kept)
+        archives = list(NotificationArchive.objects.order_by('id'))
+        self.assertEqual([archive.row_count for archive in archives], [2, 2, 1])
+        rows = [row for archive in archives for row in archive.rows()]
+        self.assertEqual([row['id'] for row in rows], self.expired)
+        self.assertEqual(set(rows[0]), set(ARCHIVE_FIELDS))
+        self.assertEqual((rows[0]['title'], rows[0]['user_id'], rows[0]['is_read']), ('Offer 0', self.user.id, True))
+        self.assertEqual((archives[0].first_id, archives[0].last_id), tuple(self.expired[:2]))
+
+    def test_batches_are_archived_to_jsonl(self):
+        with tempfile.TemporaryDirectory() as archive_dir:
+            self.prune(archive='jsonl', archive_dir=archive_dir, batch_size=3)
+            [name] = os.listdir(archive_dir)
+            with gzip.open(os.path.join(archive_dir, name), 'rt', encoding='utf-8') as f:
+                rows = [json.loads(line) for line in f]
+        self.assertEqual([row['id'] for row in rows], self.expired)
+        self.assertFalse(NotificationArchive.objects.exists())
+        self.assertCountEqual(Notification.objects.values_list('id', flat=True), self.kept)
+
+    def test_limit_and_dry_run(self):
+        self.prune(archive='none', dry_run=True)
+        self.assertEqual(Notification.objects.count(), 7)
+        self.prune(archive='none', batch_size=2, limit=3)
+        self.assertCountEqual(Notification.objects.values_list('id', flat=True), self.expired[3:] + self.kept)
+        self.assertFalse(NotificationArchive.objects.exists())
+
+    def test_retention_can_be_shortened(self):
+        self.prune(archive='none', days=5)
+        self.assertEqual(list(Notification.objects.values_list('id', flat=True)), [self.kept[0]])
+
+
+class NotificationStreamTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('alice', password='pass')
+
+    async def get_stream(self):
+        await self.async_client.alogin(username='alice', password='pass')
+        return await self.async_client.get(reverse('notification_stream'))
+
+    @override_settings(CHANNEL_LAYER='memory', JOBS_RUN_INLINE=False)
+    async def test_refused_when_worker_notifications_cannot_reach_it(self):
+        response = await self.get_stream()
+        self.assertEqual(response.status_code, 204)
+
+    @override_settings(CHANNEL_LAYER='memory', JOBS_RUN_INLINE=True)
+    async def test_offered_when_notifications_are_created_in_process(self):
+        response = await self.get_stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        response.close()
+
+    def test_refused_under_wsgi(self):
+        self.client.login(username='alice', password='pass')
+        self.assertEqual(self.client.get(reverse('notification_stream')).status_code, 204)
+
+
+@override_settings(JOBS_RUN_INLINE=True, NOTIFICATION_COALESCE_SECONDS=600)
+class NotificationCoalescingTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+        listing = Listing.objects.create(
+            title='Used phone', description='A used phone in good condition.',
+            price=100, seller=self.seller, status='sold',
+        )
+        self.offer = Offer.objects.create(listing=listing, buyer=self.buyer, amount=90, status='accepted')
+        Payment.objects.create(
+            offer=self.offer, buyer=self.buyer, amount=90, status='completed', completed_at=timezone.now(),
+        )
+
+    def message(self, content):
+        with self.captureOnCommitCallbacks(execute=True):
+            send_message(self.buyer, self.seller, content, self.offer)
+
+    def test_chat_bursts_are_folded_together(self):
+        self.message('Is it still available?')
+        self.message('I can pick it up today')
+        notification = Notification.objects.get(user=self.seller)
+        self.assertEqual(notification.count, 2)
+        self.assertEqual(notification.message, 'I can pick it up today')
+
+    def test_dispute_notice_is_kept_apart_from_chat_messages(self):
+        self.message('The screen is cracked')
+        self.client.login(username='buyer', password='pass')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('create_dispute_for_offer', args=[self.offer.id]), {
+                'transaction': self.offer.id,
+                'reason': 'The phone arrived with a cracked screen.',
+            })
+        self.message('Please get back to me about the refund')
+
+        notifications = Notification.objects.filter(user=self.seller).order_by('id')
+        self.assertEqual(
+            [(n.notification_type, n.title, n.count) for n in notifications],
+            [('message_received', 'New message from buyer', 2), ('dispute_reported', 'Dispute Reported', 1)],
+        )
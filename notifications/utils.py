@@ -1,18 +1,248 @@
 """
 Utility functions for creating notifications
 """
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .counters import adjust_unread_counts, get_unread_counts
 from .models import Notification
 
+logger = logging.getLogger(__name__)
+
+RELATED_FIELDS = ['user', 'related_user', 'related_offer', 'related_listing']
+
+# The dropdown lists this many; a burst beyond it is not pushed one by one
+STREAM_NOTIFICATIONS_PER_USER = 10
+
+# Types whose bursts are folded into one unread row (see coalesce_notification).
+# Only chat messages (services.chat_service.send_message) create these
+COALESCED_TYPES = {'message_received'}
+
 def create_notification(user, notification_type, title, message, related_user=None, related_offer=None, related_listing=None):
-    """Create a notification for a user"""
-    notification = Notification.objects.create(
-        user=user,
-        notification_type=notification_type,
-        title=title,
-        message=message,
-        related_user=related_user,
-        related_offer=related_offer,
-        related_listing=related_listing
-    )
+    """Create a notification for a user, or fold it into a recent unread one of the same kind"""
+    return save_notification(_with_ids({
+        'user': user,
+        'notification_type': notification_type,
+        'title': title,
+        'message': message,
+        'related_user': related_user,
+        'related_offer': related_offer,
+        'related_listing': related_listing,
+    }))
+
+def save_notification(spec):
+    """create_notification() for a spec of ids (user_id=...), as queued for the background task"""
+    notification = coalesce_notification(spec)
+    if notification is None:
+        with transaction.atomic():
+            notification = Notification.objects.create(**spec)
+            notifications_created([notification])
     return notification
 
+def coalesce_notification(spec):
+    """
+    Fold a notification into the user's unread one with the same type,
+    related user and related offer, if that was last updated within
+    NOTIFICATION_COALESCE_SECONDS: its count goes up and it takes the new
+    title and message. Returns the updated notification, or None when a new
+    row is needed.
+    """
+    window = getattr(settings, 'NOTIFICATION_COALESCE_SECONDS', 600)
+    if spec['notification_type'] not in COALESCED_TYPES or window <= 0:
+        return None
+    now = timezone.now()
+    existing = Notification.objects.filter(
+        user_id=spec['user_id'],
+        notification_type=spec['notification_type'],
+        related_user_id=spec.get('related_user_id'),
+        related_offer_id=spec.get('related_offer_id'),
+        is_read=False,
+        updated_at__gte=now - timedelta(seconds=window),
+    ).order_by('-id').first()
+    if existing is None:
+        return None
+    # Conditional, in case it was read since
+    updated = Notification.objects.filter(pk=existing.pk, is_read=False).update(
+        count=F('count') + 1, title=spec['title'], message=spec['message'], updated_at=now,
+    )
+    if not updated:
+        return None
+    existing.count += 1
+    existing.title, existing.message, existing.updated_at = spec['title'], spec['message'], now
+    # Still unread, so the unread counter does not change
+    transaction.on_commit(lambda: _publish([existing.id]))
+    return existing
+
+def notification_data(notification):
+    """JSON for the notification dropdown (select_related related_user)"""
+    return {
+        'id': notification.id,
+        'type': notification.notification_type,
+        'title': notification.title,
+        'message': notification.message,
+        'time_ago': notification.time_ago,
+        'created_at': notification.created_at.isoformat(),
+        'updated_at': notification.updated_at.isoformat(),
+        'count': notification.count,
+        'is_read': notification.is_read,
+        'related_user': notification.related_user.username if notification.related_user else None,
+        'url': notification.get_absolute_url(),
+    }
+
+def user_group(user_id):
+    """Channel layer group of a user's open notification streams"""
+    return f'notifications.user.{user_id}'
+
+def notifications_created(notifications):
+    """
+    Count new notifications in their users' unread counters, in the
+    transaction that created them, and push them to open streams once it commits
+    """
+    counts = {}
+    latest = {}
+    for notification in notifications:
+        counts[notification.user_id] = counts.get(notification.user_id, 0) + 1
+        if notification.id is not None:
+            latest.setdefault(notification.user_id, []).append(notification.id)
+    if counts:
+        # Notifications start unread
+        adjust_unread_counts(counts)
+        ids = [i for user_ids in latest.values() for i in sorted(user_ids)[-STREAM_NOTIFICATIONS_PER_USER:]]
+        transaction.on_commit(lambda: _publish(ids))
+
+def notifications_read(user_id, count):
+    """
+    Take `count` newly read notifications off the user's counter, in the
+    transaction that marked them read, and push it once it commits
+    """
+    if count:
+        adjust_unread_counts({user_id: -count})
+        transaction.on_commit(lambda: _publish_count(user_id))
+
+def _publish(notification_ids):
+    from utils.channel_layers import get_channel_layer
+    try:
+        per_user = {}
+        notifications = (
+            Notification.objects.filter(id__in=notification_ids)
+            .select_related('related_user')
+            .order_by('-id')
+        )
+        for notification in notifications:
+            latest = per_user.setdefault(notification.user_id, [])
+            if len(latest) < STREAM_NOTIFICATIONS_PER_USER:
+                latest.append(notification)
+        counts = get_unread_counts(list(per_user))
+        layer = get_channel_layer()
+        for user_id, latest in per_user.items():
+            for notification in reversed(latest):
+                layer.group_send(user_group(user_id), {
+                    'type': 'notification',
+                    'notification': notification_data(notification),
+                    'unread_count': counts.get(user_id, 0),
+                })
+    except Exception:
+        # Streams are a convenience; the notifications are saved either way
+        logger.exception("Could not publish notifications")
+
+def _publish_count(user_id):
+    from utils.channel_layers import get_channel_layer
+    try:
+        get_channel_layer().group_send(user_group(user_id), {
+            'type': 'unread_count',
+            'unread_count': get_unread_counts([user_id])[user_id],
+        })
+    except Exception:
+        logger.exception("Could not publish an unread count")
+
+def _with_ids(spec):
+    """Replace model instances in a notification spec with their ids (JSON-safe for the job queue)"""
+    spec = dict(spec)
+    for field in RELATED_FIELDS:
+        if field in spec:
+            obj = spec.pop(field)
+            spec[f'{field}_id'] = obj.id if obj is not None else None
+    return spec
+
+def _dedupe_key(notification):
+    return (notification.user_id, notification.notification_type, notification.related_listing_id)
+
+def _existing_keys(batch):
+    """(user, type, related_listing) keys of stored notifications that clash with a batch"""
+    listing_ids = {n.related_listing_id for n in batch}
+    listing_filter = Q(related_listing_id__in=[i for i in listing_ids if i is not None])
+    if None in listing_ids:
+        listing_filter |= Q(related_listing__isnull=True)
+    return set(
+        Notification.objects.filter(
+            listing_filter,
+            user_id__in={n.user_id for n in batch},
+            notification_type__in={n.notification_type for n in batch},
+        ).values_list('user_id', 'notification_type', 'related_listing_id')
+    )
+
+def create_notifications_bulk(notifications, batch_size=None, deduplicate=False):
+    """
+    Create many notifications with bulk_create.
+
+    `notifications` is an iterable of dicts taking the same keyword arguments as
+    create_notification(), either as model instances (user=...) or ids (user_id=...).
+    With deduplicate=True, a row is skipped when the user already has a notification
+    of the same type for the same related listing, in the database or earlier in
+    the same call. Returns the list of created notifications.
+    """
+    batch_size = batch_size or getattr(settings, 'NOTIFICATIONS_BULK_BATCH_SIZE', 500)
+    created = []
+    seen = set()
+    batch = []
+
+    def flush():
+        rows = batch
+        if deduplicate:
+            existing = _existing_keys(rows)
+            rows = [n for n in rows if _dedupe_key(n) not in existing]
+        with transaction.atomic():
+            rows = Notification.objects.bulk_create(rows)
+            notifications_created(rows)
+        created.extend(rows)
+        batch.clear()
+
+    for spec in notifications:
+        notification = Notification(**spec)
+        # bulk_create skips save(), which resolves it otherwise
+        notification.url = notification.url or notification.resolve_url()
+        if deduplicate:
+            key = _dedupe_key(notification)
+            if key in seen:
+                continue
+            seen.add(key)
+        batch.append(notification)
+        if len(batch) >= batch_size:
+            flush()
+    if batch:
+        flush()
+    return created
+
+def queue_notification(user, notification_type, title, message, related_user=None, related_offer=None, related_listing=None):
+    """Create a notification from the background job queue once the current transaction commits"""
+    from jobs.queue import enqueue
+    enqueue('notifications.create_notification', **_with_ids({
+        'user': user,
+        'notification_type': notification_type,
+        'title': title,
+        'message': message,
+        'related_user': related_user,
+        'related_offer': related_offer,
+        'related_listing': related_listing,
+    }))
+
+def queue_notifications_bulk(notifications, deduplicate=False):
+    """Queue a single background job that runs create_notifications_bulk()"""
+    from jobs.queue import enqueue
+    notifications = [_with_ids(spec) for spec in notifications]
+    if notifications:
+        enqueue('notifications.create_notifications_bulk', notifications=notifications, deduplicate=deduplicate)
@@ -1,58 +1,158 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Max
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_http_methods
 from .models import Notification
+from .counters import get_unread_count
+from .utils import STREAM_NOTIFICATIONS_PER_USER, notification_data, notifications_read, user_group
+from utils.channel_layers import get_channel_layer
+
+NOTIFICATIONS_PAGE_SIZE = 10
+
+# Comment lines keep idle streams from being closed by proxies
+STREAM_HEARTBEAT_SECONDS = 25
+STREAM_RETRY_MILLISECONDS = 5000
+
+def stream_available():
+    """
+    Whether the stream receives every notification. runworker creates most
+    of them in its own process, and the memory layer only reaches streams of
+    the process that publishes.
+    """
+    return settings.CHANNEL_LAYER == 'redis' or settings.JOBS_RUN_INLINE
+
+def _notifications_etag(request):
+    """
+    Changes whenever a notification is created, coalesced or read, so
+    unchanged polls get a 304. New and coalesced notifications are unread,
+    so the unread rows' latest update and the unread count cover all three.
+    """
+    if not request.user.is_authenticated:
+        return None
+    touched = Notification.objects.filter(user=request.user, is_read=False).aggregate(touched=Max('updated_at'))['touched']
+    return f'{get_unread_count(request.user.id)}-{touched.timestamp() if touched else 0}'
 
 @login_required
 @require_http_methods(["GET"])
+@condition(etag_func=_notifications_etag)
 def get_notifications(request):
-    """API endpoint to fetch user notifications"""
-    # Get both read and unread notifications (latest 10)
-    notifications = Notification.objects.filter(user=request.user).select_related('related_user', 'related_offer', 'related_listing').order_by('-created_at')[:10]
-    
-    notifications_data = []
-    for notification in notifications:
-            notifications_data.append({
-                'id': notification.id,
-                'type': notification.notification_type,
-                'title': notification.title,
-                'message': notification.message,
-                'time_ago': notification.time_ago,
-                'is_read': notification.is_read,
-                'related_user': notification.related_user.username if notification.related_user else None,
-                'url': notification.get_absolute_url(),
-            })
+    """
+    API endpoint to fetch user notifications: the latest 10, or with
+    ?since_id=<id> only those created after it (coalesced notifications
+    are updated in place and only show up in the full list). Send
+    If-None-Match with the previous ETag to get a 304 when nothing changed.
+    """
+    notifications = Notification.objects.filter(user=request.user).select_related('related_user').order_by('-id')
+    if 'since_id' in request.GET:
+        try:
+            notifications = notifications.filter(id__gt=int(request.GET['since_id']))
+        except ValueError:
+            return JsonResponse({'error': 'since_id must be a number'}, status=400)
+    notifications_data = [notification_data(notification) for notification in notifications[:NOTIFICATIONS_PAGE_SIZE]]
     
-    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
-    
-    return JsonResponse({
+    response = JsonResponse({
         'notifications': notifications_data,
-        'unread_count': unread_count
+        'unread_count': get_unread_count(request.user.id)
     })
+    # Revalidate on every poll; the ETag makes that cheap
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
 @login_required
 @require_http_methods(["POST"])
 def mark_notification_read(request, notification_id):
     """Mark a notification as read"""
-    try:
-        notification = Notification.objects.get(id=notification_id, user=request.user)
-        notification.is_read = True
-        notification.save()
-        return JsonResponse({'success': True})
-    except Notification.DoesNotExist:
+    notifications = Notification.objects.filter(id=notification_id, user=request.user)
+    with transaction.atomic():
+        # Conditional, so a double click only counts once
+        updated = notifications.filter(is_read=False).update(is_read=True)
+        notifications_read(request.user.id, updated)
+    if not updated and not notifications.exists():
         return JsonResponse({'success': False, 'error': 'Notification not found'}, status=404)
+    return JsonResponse({'success': True})
 
 @login_required
 @require_http_methods(["POST"])
 def mark_all_read(request):
     """Mark all notifications as read"""
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+    with transaction.atomic():
+        updated = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        notifications_read(request.user.id, updated)
     return JsonResponse({'success': True})
 
 @login_required
 @require_http_methods(["GET"])
 def unread_notifications_count(request):
     """Get count of unread notifications"""
-    count = Notification.objects.filter(user=request.user, is_read=False).count()
-    return JsonResponse({'unread_count': count})
+    return JsonResponse({'unread_count': get_unread_count(request.user.id)})
+
+@require_http_methods(["GET"])
+async def notification_stream(request):
+    """
+    Server-Sent Events: the unread count on connect, then every new
+    notification ("notification") and unread count change ("unread_count").
+    After a reconnect, notifications created since Last-Event-ID are sent first.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return HttpResponse(status=401)
+    if not isinstance(request, ASGIRequest) or not stream_available():
+        # Under WSGI the stream would hold a worker for as long as the page is
+        # open, and without a shared layer it would stay silent. 204 tells
+        # EventSource not to reconnect; the page polls instead.
+        return HttpResponse(status=204)
+    try:
+        last_event_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        last_event_id = None
+    response = StreamingHttpResponse(_event_stream(user.id, last_event_id), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # nginx would buffer the events otherwise
+    return response
+
+def _sse(event, data, event_id=None):
+    lines = [f'event: {event}']
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'data: {json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+def _notification_event(notification, unread_count):
+    return _sse('notification', {'notification': notification, 'unread_count': unread_count}, notification['id'])
+
+async def _event_stream(user_id, last_event_id):
+    layer = get_channel_layer()
+    channel = layer.new_channel()
+    # Subscribed before the first query, so nothing created meanwhile is missed
+    layer.group_add(user_group(user_id), channel)
+    try:
+        yield f'retry: {STREAM_RETRY_MILLISECONDS}\n\n'
+        unread_count = await sync_to_async(get_unread_count)(user_id)
+        if last_event_id is not None:
+            missed = Notification.objects.filter(user_id=user_id, id__gt=last_event_id).select_related(
+                'related_user'
+            ).order_by('-id')[:STREAM_NOTIFICATIONS_PER_USER]
+            for notification in reversed([n async for n in missed]):
+                yield _notification_event(notification_data(notification), unread_count)
+        yield _sse('unread_count', {'unread_count': unread_count})
+        while True:
+            try:
+                event = await asyncio.wait_for(layer.receive(channel), STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if event['type'] == 'notification':
+                yield _notification_event(event['notification'], event['unread_count'])
+            else:
+                yield _sse(event['type'], {'unread_count': event['unread_count']})
+    finally:
+        layer.close_channel(channel)
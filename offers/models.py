@@ -16,5 +16,11 @@ class Offer(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['buyer', '-created_at', '-id']),
+            models.Index(fields=['listing', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return f"Offer of {self.amount} for {self.listing.title} by {self.buyer.username}"
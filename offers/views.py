@@ -49,8 +49,8 @@ def create_offer(request):
             if created:
                 messages.success(request, f"Offer of ₹{amount} submitted! You can now chat with the seller.")
                 # Create notification for seller
-                from notifications.utils import create_notification
-                create_notification(
+                from notifications.utils import queue_notification
+                queue_notification(
                     user=listing.seller,
                     notification_type='offer_received',
                     title='New Offer Received',
@@ -97,8 +97,8 @@ def accept_offer(request, offer_id):
     offer.save()
     
     # Create notification for buyer
-    from notifications.utils import create_notification
-    create_notification(
+    from notifications.utils import queue_notification
+    queue_notification(
         user=offer.buyer,
         notification_type='offer_accepted',
         title='Offer Accepted!',
@@ -131,8 +131,8 @@ def reject_offer(request, offer_id):
     offer.save()
     
     # Create notification for buyer
-    from notifications.utils import create_notification
-    create_notification(
+    from notifications.utils import queue_notification
+    queue_notification(
         user=offer.buyer,
         notification_type='offer_rejected',
         title='Offer Rejected',
@@ -6,7 +6,7 @@ import uuid
 from .models import Payment
 from .forms import PaymentForm
 from offers.models import Offer
-from notifications.utils import create_notification
+from notifications.utils import queue_notification
 
 # Fixed UPI credentials for dummy payment
 DUMMY_UPI_ID = 'pay@paytm'
@@ -58,7 +58,7 @@ def payment_page(request, offer_id):
                 payment.save()
                 
                 # Create notification for seller
-                create_notification(
+                queue_notification(
                     user=offer.listing.seller,
                     notification_type='offer_accepted',  # Reusing type
                     title='Payment Received!',
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:50
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('offers', '0002_keyset_pagination_indexes'),
+        ('ratings', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['rater', '-created_at', '-id'], name='ratings_rat_rater_i_d283f7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rating',
+            index=models.Index(fields=['rated_user', '-created_at', '-id'], name='ratings_rat_rated_u_1a862c_idx'),
+        ),
+    ]
@@ -10,5 +10,11 @@ class Rating(models.Model):
     comment = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['rater', '-created_at', '-id']),
+            models.Index(fields=['rated_user', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return f"Rating {self.score} for {self.rated_user.username} by {self.rater.username}"
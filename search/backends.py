@@ -0,0 +1,213 @@
+"""
+Full-text search backends for listing search.
+
+The backend is chosen from the database vendor:
+- SQLite uses an FTS5 virtual table, kept in sync from Listing saves
+- PostgreSQL uses a GIN expression index over to_tsvector(title, description)
+- Anything else falls back to icontains filtering
+
+Ranked backends annotate results with ``search_rank``: relevance (BM25 or
+ts_rank) plus a recency boost derived from ``created_at``. The boost grows
+linearly with the creation date, so the ordering does not depend on the time
+the query runs and stays stable between requests.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from listings.models import Listing
+
+FTS_TABLE = 'search_listing_fts'
+
+# Must match the expression used by the GIN index in search/migrations/0002
+PG_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce({table}.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({table}.description, '')), 'B')"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Julian day number of 1970-01-01, used to turn SQLite dates into unix days
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+
+
+def tokenize(text):
+    """Split text into lowercase word tokens"""
+    return [token.lower() for token in TOKEN_RE.findall(text or '')]
+
+
+class BaseSearchBackend:
+    """Interface for listing search backends"""
+    ranked = False
+
+    def search(self, queryset, query):
+        """Filter a Listing queryset by a keyword query and order by relevance"""
+        raise NotImplementedError
+
+    def index_listing(self, listing):
+        """Add or refresh a single listing in the index"""
+
+    def index_listings(self, listings):
+        """Add or refresh many listings, e.g. after bulk_create()"""
+        for listing in listings:
+            self.index_listing(listing)
+
+    def remove_listing(self, listing_id):
+        """Drop a listing from the index"""
+
+    def rebuild(self):
+        """Rebuild the whole index from the listings table"""
+
+    def recency_days(self):
+        return float(getattr(settings, 'SEARCH_RECENCY_DAYS', 30))
+
+
+class BasicSearchBackend(BaseSearchBackend):
+    """Unindexed fallback: substring match, newest first"""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(title__icontains=query) | Q(description__icontains=query)
+        ).order_by('-created_at', '-id')
+
+
+class SQLiteFTSSearchBackend(BaseSearchBackend):
+    """SQLite FTS5 backend ranked with bm25()"""
+    ranked = True
+
+    # bm25() column weights: title matches count ten times a description match
+    TITLE_WEIGHT = 10.0
+    DESCRIPTION_WEIGHT = 1.0
+
+    def build_match(self, query):
+        # Quote every token and use prefix matching so partial words still hit,
+        # which also keeps FTS5 query syntax out of user input.
+        tokens = tokenize(query)
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, queryset, query):
+        match = self.build_match(query)
+        if not match:
+            return BasicSearchBackend().search(queryset, query)
+
+        table = Listing._meta.db_table
+        rank_sql = (
+            f"(SELECT -bm25({FTS_TABLE}, %s, %s) FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {FTS_TABLE}.rowid = {table}.id) "
+            f"+ (julianday({table}.created_at) - %s) / %s"
+        )
+        rank_params = [
+            self.TITLE_WEIGHT, self.DESCRIPTION_WEIGHT, match,
+            UNIX_EPOCH_JULIAN_DAY, self.recency_days(),
+        ]
+        return queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            search_rank=RawSQL(rank_sql, rank_params, output_field=FloatField())
+        ).order_by('-search_rank', '-id')
+
+    def index_listing(self, listing):
+        self.index_listings([listing])
+
+    def index_listings(self, listings):
+        rows = [(listing.pk, listing.title, listing.description) for listing in listings]
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [(row[0],) for row in rows])
+            cursor.executemany(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description) VALUES (%s, %s, %s)",
+                rows,
+            )
+
+    def remove_listing(self, listing_id):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [listing_id])
+
+    def rebuild(self):
+        table = Listing._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, title, description) "
+                f"SELECT id, title, description FROM {table}"
+            )
+            cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """PostgreSQL tsvector backend ranked with ts_rank()
+
+    The GIN index is built on an expression over the listings table, so
+    PostgreSQL maintains it on every write and no explicit sync is needed.
+    """
+    ranked = True
+
+    # ts_rank() is roughly 0..1; scale it so one unit of relevance is worth
+    # about as much as a bm25 point on SQLite.
+    RELEVANCE_SCALE = 10.0
+
+    def build_tsquery(self, query):
+        tokens = tokenize(query)
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    def search(self, queryset, query):
+        tsquery = self.build_tsquery(query)
+        if not tsquery:
+            return BasicSearchBackend().search(queryset, query)
+
+        table = Listing._meta.db_table
+        vector = PG_VECTOR_SQL.format(table=table)
+        rank_sql = (
+            f"ts_rank({vector}, to_tsquery('english', %s)) * %s "
+            f"+ EXTRACT(EPOCH FROM {table}.created_at) / 86400.0 / %s"
+        )
+        return queryset.filter(
+            RawSQL(f"{vector} @@ to_tsquery('english', %s)", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(
+                rank_sql,
+                [tsquery, self.RELEVANCE_SCALE, self.recency_days()],
+                output_field=FloatField(),
+            )
+        ).order_by('-search_rank', '-id')
+
+
+# Database aliases known to have the FTS table. Only found tables are
+# remembered, so one created by a later migrate is used without a restart.
+_fts_aliases = set()
+
+
+def _sqlite_fts_available(alias):
+    if alias in _fts_aliases:
+        return True
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE]
+        )
+        available = cursor.fetchone() is not None
+    if available:
+        _fts_aliases.add(alias)
+    return available
+
+
+def forget_search_tables():
+    """Look the FTS table up again, e.g. after migrations may have dropped it"""
+    _fts_aliases.clear()
+
+
+def get_search_backend():
+    """Return the search backend for the default database"""
+    backend_path = getattr(settings, 'SEARCH_BACKEND', 'auto')
+    if backend_path and backend_path != 'auto':
+        return import_string(backend_path)()
+
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    if connection.vendor == 'sqlite' and _sqlite_fts_available(connection.alias):
+        return SQLiteFTSSearchBackend()
+    return BasicSearchBackend()
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from search.backends import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the listing full-text search index'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt search index using {backend.__class__.__name__}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from search.tasks import send_saved_search_digests
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends one notification per user for the listings that matched their saved searches '
+        'in digest mode since the last run. Run it from cron at the digest interval (e.g. daily).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Users per transaction')
+
+    def handle(self, *args, **options):
+        sent = send_saved_search_digests(batch_size=max(options['batch_size'], 1))
+        self.stdout.write(self.style.SUCCESS(f'Sent {sent} saved search digest(s)'))
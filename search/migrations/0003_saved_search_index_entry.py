@@ -0,0 +1,42 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def index_existing_saved_searches(apps, schema_editor):
+    from search.percolator import build_index_entries
+
+    SavedSearch = apps.get_model('search', 'SavedSearch')
+    SavedSearchIndexEntry = apps.get_model('search', 'SavedSearchIndexEntry')
+    entries = []
+    for saved_search in SavedSearch.objects.all().iterator():
+        entries.extend(
+            SavedSearchIndexEntry(saved_search_id=saved_search.id, kind=kind, value=value)
+            for kind, value in build_index_entries(saved_search.query, saved_search.filters)
+        )
+    SavedSearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0002_listing_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearchIndexEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('token', 'Query token'), ('category', 'Category'), ('price', 'Price bucket'), ('any', 'Any listing')], max_length=10)),
+                ('value', models.CharField(blank=True, max_length=255)),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='index_entries', to='search.savedsearch')),
+            ],
+            options={
+                'verbose_name_plural': 'Saved search index entries',
+                'indexes': [models.Index(fields=['kind', 'value'], name='search_save_kind_2d6980_idx')],
+            },
+        ),
+        migrations.RunPython(index_existing_saved_searches, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def reindex_query_tokens(apps, schema_editor):
+    # Token entries held whole words, which missed matches inside longer
+    # words; they now hold the first characters of each word
+    from search.percolator import build_index_entries
+
+    SavedSearch = apps.get_model('search', 'SavedSearch')
+    SavedSearchIndexEntry = apps.get_model('search', 'SavedSearchIndexEntry')
+    SavedSearchIndexEntry.objects.filter(kind='token').delete()
+    entries = []
+    for saved_search in SavedSearch.objects.exclude(query='').iterator():
+        entries.extend(
+            SavedSearchIndexEntry(saved_search_id=saved_search.id, kind=kind, value=value)
+            for kind, value in build_index_entries(saved_search.query, saved_search.filters)
+            if kind == 'token'
+        )
+    SavedSearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('search', '0005_saved_search_digests'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex_query_tokens, migrations.RunPython.noop),
+    ]
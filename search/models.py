@@ -2,10 +2,59 @@ from django.db import models
 from django.contrib.auth.models import User
 
 class SavedSearch(models.Model):
+    ALERT_CHOICES = [
+        ('instant', 'A notification per matching listing'),
+        ('digest', 'Periodic digest'),
+    ]
+
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='saved_searches')
     query = models.CharField(max_length=255)
     filters = models.JSONField(default=dict)
+    alerts = models.CharField(max_length=10, choices=ALERT_CHOICES, default='instant')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-created_at', '-id']),
+        ]
+
     def __str__(self):
         return f"Search '{self.query}' by {self.user.username}"
+
+class SavedSearchIndexEntry(models.Model):
+    """Reverse index from listing attributes to the saved searches they can match"""
+    KIND_CHOICES = [
+        ('token', 'Query token'),
+        ('category', 'Category'),
+        ('price', 'Price bucket'),
+        ('any', 'Any listing'),
+    ]
+
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='index_entries')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    value = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        verbose_name_plural = "Saved search index entries"
+        indexes = [
+            models.Index(fields=['kind', 'value']),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}:{self.value} -> {self.saved_search_id}"
+
+class SavedSearchDigestEntry(models.Model):
+    """A match waiting for the next digest of a saved search in digest mode (search/tasks.py)"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='digest_entries')
+    listing = models.ForeignKey('listings.Listing', on_delete=models.CASCADE, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = "Saved search digest entries"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'listing'], name='unique_digest_listing_per_user'),
+        ]
+
+    def __str__(self):
+        return f"Listing {self.listing_id} for {self.user_id}'s digest"
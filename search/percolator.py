@@ -0,0 +1,123 @@
+"""
+Saved-search percolator.
+
+Every saved search is stored under the keys a listing must hit for the search
+to possibly match it:
+- one 'token' entry per query word: the word's first three characters.
+  Query words match anywhere in a listing's text, inside longer words too
+  ("phone" matches "iPhone"), and every piece of a word found there is also
+  a piece of one of the listing's words
+- otherwise its category, or the price buckets its range covers
+- otherwise a single 'any' entry
+
+Approving a listing then looks up only the searches indexed under the
+listing's tokens, category and price bucket, and confirms each candidate with
+search.signals.matches_saved_search().
+"""
+import math
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import SavedSearch, SavedSearchIndexEntry
+
+# Length of the word pieces query words are indexed under
+TOKEN_KEY_LENGTH = 3
+
+# Price buckets are powers of two: bucket 0 is [0, 1), bucket n is [2^(n-1), 2^n)
+MAX_PRICE_BUCKET = 40
+
+
+def price_bucket(price):
+    price = float(price)
+    if price < 1:
+        return 0
+    return min(int(math.log2(price)) + 1, MAX_PRICE_BUCKET)
+
+
+def _parse(value, cast):
+    try:
+        return cast(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def build_index_entries(query, filters):
+    """
+    Return the (kind, value) keys to index a saved search under.
+    Mirrors the rules in matches_saved_search(), including its handling of
+    short words and invalid filter values.
+    """
+    query = (query or '').lower().strip()
+    filters = filters or {}
+
+    if query:
+        # Words of 2 characters or less are ignored by the matcher; a query made
+        # only of those can never match, so it gets no entries at all.
+        keys = {word[:TOKEN_KEY_LENGTH] for word in query.split() if len(word) > 2}
+        return [('token', key) for key in sorted(keys)]
+
+    category_id = _parse(filters.get('category_id'), int) if filters.get('category_id') else None
+    if category_id is not None:
+        return [('category', str(category_id))]
+
+    min_price = _parse(filters.get('min_price'), float) if filters.get('min_price') is not None else None
+    max_price = _parse(filters.get('max_price'), float) if filters.get('max_price') is not None else None
+    if min_price is not None or max_price is not None:
+        low = price_bucket(max(min_price, 0)) if min_price is not None else 0
+        high = price_bucket(max(max_price, 0)) if max_price is not None else MAX_PRICE_BUCKET
+        return [('price', str(bucket)) for bucket in range(low, high + 1)]
+
+    return [('any', '')]
+
+
+def index_saved_search(saved_search):
+    """(Re)build the index entries for one saved search"""
+    entries = [
+        SavedSearchIndexEntry(saved_search=saved_search, kind=kind, value=value)
+        for kind, value in build_index_entries(saved_search.query, saved_search.filters)
+    ]
+    with transaction.atomic():
+        SavedSearchIndexEntry.objects.filter(saved_search=saved_search).delete()
+        SavedSearchIndexEntry.objects.bulk_create(entries)
+
+
+def rebuild_index():
+    """Rebuild the index for every saved search"""
+    with transaction.atomic():
+        SavedSearchIndexEntry.objects.all().delete()
+        entries = []
+        for saved_search in SavedSearch.objects.only('id', 'query', 'filters').iterator():
+            entries.extend(
+                SavedSearchIndexEntry(saved_search_id=saved_search.id, kind=kind, value=value)
+                for kind, value in build_index_entries(saved_search.query, saved_search.filters)
+            )
+        SavedSearchIndexEntry.objects.bulk_create(entries, batch_size=1000)
+    return len(entries)
+
+
+def listing_tokens(listing):
+    """
+    Every piece of TOKEN_KEY_LENGTH characters of the listing's words. Query
+    words have no whitespace, so one found anywhere in the text lies within
+    a word, and so does its key.
+    """
+    text = (listing.title + " " + listing.description).lower()
+    return {
+        word[i:i + TOKEN_KEY_LENGTH]
+        for word in set(text.split())
+        for i in range(len(word) - TOKEN_KEY_LENGTH + 1)
+    }
+
+
+def candidate_saved_searches(listing):
+    """Saved searches (of other users) that may match the listing"""
+    keys = Q(kind='token', value__in=listing_tokens(listing)) | Q(kind='any')
+    keys |= Q(kind='price', value=str(price_bucket(listing.price)))
+    if listing.category_id:
+        keys |= Q(kind='category', value=str(listing.category_id))
+
+    candidate_ids = SavedSearchIndexEntry.objects.filter(keys).values('saved_search_id')
+    return SavedSearch.objects.filter(id__in=candidate_ids).exclude(
+        user_id=listing.seller_id
+    ).select_related('user')
@@ -4,7 +4,7 @@ from .models import SavedSearch
 class SavedSearchSerializer(serializers.ModelSerializer):
     class Meta:
         model = SavedSearch
-        fields = ['id', 'user', 'query', 'filters', 'created_at']
+        fields = ['id', 'user', 'query', 'filters', 'alerts', 'created_at']
         read_only_fields = ['user', 'created_at']
 
     def create(self, validated_data):
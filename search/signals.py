@@ -1,85 +1,51 @@
 """
-Signals for saved search alerts
+Signals for saved search alerts and the listing search index
 """
-from django.db.models.signals import pre_save, post_save
+from django.db.models.signals import post_save, post_delete, post_migrate
 from django.dispatch import receiver
 from listings.models import Listing
+from listings.signals import listings_approved
 from .models import SavedSearch
-from notifications.utils import create_notification
+from .backends import forget_search_tables, get_search_backend
+from .percolator import index_saved_search
+from jobs.queue import enqueue
 from django.db.models import Q
-import threading
 
-# Thread-local storage for previous status (thread-safe)
-_thread_local = threading.local()
+@receiver(post_save, sender=Listing)
+def check_saved_searches_on_approval(sender, instance, created, **kwargs):
+    """
+    When a listing is approved, queue a job that checks saved searches and
+    creates alerts for matches (see search.tasks.match_saved_searches).
+    """
+    # Only trigger when the status changes to 'approved', not on every save of an approved listing
+    if instance.status == 'approved' and (created or instance.has_changed('status')):
+        enqueue('search.match_saved_searches', listing_id=instance.pk)
 
-def get_previous_status(instance_pk):
-    """Get previous status from thread-local storage"""
-    if not hasattr(_thread_local, 'previous_status'):
-        _thread_local.previous_status = {}
-    return _thread_local.previous_status.get(instance_pk, None)
+@receiver(listings_approved)
+def check_saved_searches_on_bulk_approval(sender, listing_ids, **kwargs):
+    """Match a whole moderation batch against saved searches in one job"""
+    if listing_ids:
+        enqueue('search.match_saved_searches_bulk', listing_ids=list(listing_ids))
 
-def set_previous_status(instance_pk, status):
-    """Set previous status in thread-local storage"""
-    if not hasattr(_thread_local, 'previous_status'):
-        _thread_local.previous_status = {}
-    _thread_local.previous_status[instance_pk] = status
+@receiver(post_save, sender=SavedSearch)
+def update_saved_search_index(sender, instance, **kwargs):
+    """Re-index a saved search whenever it is created or edited (deletes cascade)"""
+    index_saved_search(instance)
 
-def clear_previous_status(instance_pk):
-    """Clear previous status from thread-local storage"""
-    if hasattr(_thread_local, 'previous_status'):
-        _thread_local.previous_status.pop(instance_pk, None)
+@receiver(post_save, sender=Listing)
+def update_search_index(sender, instance, **kwargs):
+    """Keep the full-text index in sync with listing title/description"""
+    get_search_backend().index_listing(instance)
 
-@receiver(pre_save, sender=Listing)
-def store_previous_status(sender, instance, **kwargs):
-    """Store the previous status before save"""
-    if instance.pk:
-        try:
-            previous = Listing.objects.get(pk=instance.pk)
-            set_previous_status(instance.pk, previous.status)
-        except Listing.DoesNotExist:
-            set_previous_status(instance.pk, None)
-    else:
-        # New listing, no previous status
-        set_previous_status(instance.pk, None)
+@receiver(post_delete, sender=Listing)
+def remove_from_search_index(sender, instance, **kwargs):
+    """Drop deleted listings from the full-text index"""
+    get_search_backend().remove_listing(instance.pk)
 
-@receiver(post_save, sender=Listing)
-def check_saved_searches_on_approval(sender, instance, created, **kwargs):
-    """
-    When a listing is approved, check all saved searches and create alerts for matches.
-    """
-    try:
-        previous_status = get_previous_status(instance.pk)
-        
-        # Only trigger when listing status changes to 'approved' (not just when it's approved)
-        if instance.status == 'approved' and previous_status != 'approved':
-            # Get all saved searches
-            saved_searches = SavedSearch.objects.all()
-            
-            for saved_search in saved_searches:
-                # Skip if this is the user's own listing
-                if instance.seller == saved_search.user:
-                    continue
-                
-                # Check if listing matches saved search
-                try:
-                    if matches_saved_search(instance, saved_search):
-                        # Create notification for the user
-                        create_notification(
-                            user=saved_search.user,
-                            notification_type='saved_search_match',
-                            title='New Listing Matches Your Saved Search',
-                            message=f"A new listing '{instance.title}' matches your saved search '{saved_search.query}'",
-                            related_listing=instance
-                        )
-                except Exception as e:
-                    # Log error but don't prevent listing approval
-                    import logging
-                    logger = logging.getLogger(__name__)
-                    logger.error(f"Error checking saved search match: {e}")
-    finally:
-        # Always clean up, even if there's an error
-        if instance.pk:
-            clear_previous_status(instance.pk)
+@receiver(post_migrate)
+def forget_search_tables_after_migrate(sender, **kwargs):
+    """Migrations can create or drop the SQLite FTS table"""
+    forget_search_tables()
 
 def matches_saved_search(listing, saved_search):
     """
@@ -129,4 +95,3 @@ def matches_saved_search(listing, saved_search):
             pass
     
     return True
-
@@ -0,0 +1,112 @@
+"""
+Background tasks for saved search alerts
+"""
+import logging
+from urllib.parse import urlencode
+
+from django.db import transaction
+from django.urls import reverse
+from jobs.queue import task
+from listings.models import Listing
+from notifications.utils import create_notifications_bulk
+from .models import SavedSearchDigestEntry
+from .percolator import candidate_saved_searches
+
+logger = logging.getLogger(__name__)
+
+@task('search.match_saved_searches')
+def match_saved_searches(listing_id):
+    """Notify users whose saved searches match a newly approved listing"""
+    match_saved_searches_bulk([listing_id])
+
+@task('search.match_saved_searches_bulk')
+def match_saved_searches_bulk(listing_ids):
+    """
+    Notify users whose saved searches match newly approved listings, with a
+    single bulk insert for the whole batch
+    """
+    from .signals import matches_saved_search
+
+    # Skip listings deleted or un-approved before the job ran
+    listings = Listing.objects.filter(pk__in=listing_ids, status='approved')
+
+    matches = []
+    digest_entries = []
+    for listing in listings:
+        for saved_search in candidate_saved_searches(listing):
+            try:
+                if not matches_saved_search(listing, saved_search):
+                    continue
+                if saved_search.alerts == 'digest':
+                    digest_entries.append(SavedSearchDigestEntry(user_id=saved_search.user_id, saved_search=saved_search, listing=listing))
+                else:
+                    matches.append({
+                        'user_id': saved_search.user_id,
+                        'notification_type': 'saved_search_match',
+                        'title': 'New Listing Matches Your Saved Search',
+                        'message': f"A new listing '{listing.title}' matches your saved search '{saved_search.query}'",
+                        'related_listing': listing,
+                    })
+            except Exception as e:
+                # One bad saved search should not stop the others
+                logger.error(f"Error checking saved search match: {e}")
+
+    # One alert per user and listing, even if several of their searches match
+    create_notifications_bulk(matches, deduplicate=True)
+    # Kept for the next digest; the unique constraint does the same deduplication
+    SavedSearchDigestEntry.objects.bulk_create(digest_entries, ignore_conflicts=True)
+
+@task('search.send_saved_search_digests')
+def send_saved_search_digests(batch_size=500):
+    """
+    Replace the pending matches of saved searches in digest mode with one
+    notification per user. Returns the number of notifications created.
+    """
+    sent = 0
+    last_user_id = 0
+    while True:
+        user_ids = list(
+            SavedSearchDigestEntry.objects.filter(user_id__gt=last_user_id)
+            .order_by('user_id').values_list('user_id', flat=True).distinct()[:batch_size]
+        )
+        if not user_ids:
+            return sent
+        last_user_id = user_ids[-1]
+        with transaction.atomic():
+            entries = list(
+                SavedSearchDigestEntry.objects.filter(user_id__in=user_ids)
+                .select_related('saved_search', 'listing').order_by('user_id', '-listing_id')
+            )
+            digests = {}
+            for entry in entries:
+                # Listings taken down since they matched are left out
+                if entry.listing.status == 'approved':
+                    digests.setdefault(entry.user_id, []).append(entry)
+            create_notifications_bulk(_digest_notification(user_id, user_entries) for user_id, user_entries in digests.items())
+            # By id, so matches added while the digest was built wait for the next one
+            SavedSearchDigestEntry.objects.filter(id__in=[entry.id for entry in entries]).delete()
+        sent += len(digests)
+
+def _digest_notification(user_id, entries):
+    """One digest notification for a user's pending matches, newest first"""
+    queries = []
+    for entry in entries:
+        if entry.saved_search.query not in queries:
+            queries.append(entry.saved_search.query)
+    newest = entries[0].listing
+    if len(entries) == 1:
+        message = f"A new listing '{newest.title}' matches your saved search '{queries[0]}'"
+    else:
+        searches = ', '.join(f"'{query}'" for query in queries[:3]) + (' and more' if len(queries) > 3 else '')
+        message = f"{len(entries)} new listings match your saved searches {searches}, the latest '{newest.title}'"
+    spec = {
+        'user_id': user_id,
+        'notification_type': 'saved_search_digest',
+        'title': 'Your Saved Search Digest',
+        'message': message,
+        'related_listing_id': newest.id,
+    }
+    if len(queries) == 1 and len(entries) > 1:
+        # All from one search: show its results rather than only the newest listing
+        spec['url'] = f"{reverse('home')}?{urlencode({'q': queries[0]})}"
+    return spec
@@ -1,3 +1,85 @@
+from unittest import skipUnless
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.urls import reverse
+
+from listings.models import Listing
+from search.backends import FTS_TABLE, _sqlite_fts_available, forget_search_tables
+from notifications.models import Notification
+from search.models import SavedSearch, SavedSearchDigestEntry
+from search.percolator import candidate_saved_searches
+from search.signals import matches_saved_search
+from search.tasks import send_saved_search_digests
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite FTS5 backend')
+class SQLiteFTSDetectionTests(TestCase):
+    def rename_fts_table(self, old, new):
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {old} RENAME TO {new}')
+
+    def test_missing_table_is_looked_up_again(self):
+        forget_search_tables()
+        self.rename_fts_table(FTS_TABLE, 'search_listing_fts_hidden')
+        self.assertFalse(_sqlite_fts_available(connection.alias))
+        # Created later, e.g. by migrate: found without a restart
+        self.rename_fts_table('search_listing_fts_hidden', FTS_TABLE)
+        self.assertTrue(_sqlite_fts_available(connection.alias))
+        with self.assertNumQueries(0):
+            self.assertTrue(_sqlite_fts_available(connection.alias))
+
+
+class PercolatorTests(TestCase):
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', password='pass')
+        self.buyer = User.objects.create_user('buyer', password='pass')
+
+    def matching(self, title, description='Barely used, comes with the original box and charger.'):
+        listing = Listing.objects.create(
+            title=title, description=description, price=300, seller=self.seller, status='approved',
+        )
+        return {s.query for s in candidate_saved_searches(listing) if matches_saved_search(listing, s)}
+
+    def test_query_words_match_inside_longer_words(self):
+        for query in ('phone', 'iphone 13', 'laptop', 'ip'):
+            SavedSearch.objects.create(user=self.buyer, query=query)
+        self.assertEqual(self.matching('iPhone 13 Pro, 128GB'), {'phone', 'iphone 13'})
+        self.assertEqual(self.matching('Smartphone stand'), {'phone'})
+
+    def test_candidates_cover_every_match(self):
+        queries = ['phone', 'pro', '128gb', 'charger', 'box,', 'desk', 'ipad', 'used']
+        for query in queries:
+            SavedSearch.objects.create(user=self.buyer, query=query)
+        listing = Listing.objects.create(
+            title='iPhone 13 Pro, 128GB', price=300, seller=self.seller, status='approved',
+            description='Barely used, comes with the original box, charger and case.',
+        )
+        expected = {s.query for s in SavedSearch.objects.all() if matches_saved_search(listing, s)}
+        candidates = {s.query for s in candidate_saved_searches(listing)}
+        self.assertEqual(expected, {'phone', 'pro', '128gb', 'charger', 'box,', 'used'})
+        self.assertLessEqual(expected, candidates)
+        self.assertNotIn('desk', candidates)
+
+
+class SavedSearchDigestTests(TestCase):
+    def test_digest_links_to_a_long_query(self):
+        seller = User.objects.create_user('seller', password='pass')
+        buyer = User.objects.create_user('buyer', password='pass')
+        # Nine characters per kanji once URL-encoded
+        query = '机' * 255
+        self.assertEqual(len(query), SavedSearch._meta.get_field('query').max_length)
+        saved_search = SavedSearch.objects.create(user=buyer, query=query, alerts='digest')
+        for i in range(2):
+            listing = Listing.objects.create(
+                title=f'Oak desk for sale {i}', price=120, seller=seller, status='approved',
+                description='A sturdy oak desk with two drawers, barely used, pickup only.',
+            )
+            SavedSearchDigestEntry.objects.create(user=buyer, saved_search=saved_search, listing=listing)
 
-# Create your tests here.
+        self.assertEqual(send_saved_search_digests(), 1)
+        notification = Notification.objects.get(user=buyer)
+        self.assertEqual(notification.url, f"{reverse('home')}?{urlencode({'q': query})}")
+        self.assertGreater(len(notification.url), 2048)
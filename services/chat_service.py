@@ -0,0 +1,185 @@
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, OuterRef, Q, Subquery, When
+from django.db.models.functions import Coalesce
+from chat.models import Conversation, ConversationParticipant, Message
+from notifications.utils import queue_notification
+from offers.models import Offer
+from utils.channel_layers import get_channel_layer
+
+MAX_MESSAGE_LENGTH = 5000
+# Messages per chat page; older ones load with a before-id cursor
+CHAT_PAGE_SIZE = 50
+PREVIEW_LENGTH = 200
+
+def offer_group(offer_id):
+    """Channel layer group of the open chat connections about an offer"""
+    return f'chat.offer.{offer_id}'
+
+def message_event(message):
+    """A chat message as the event pushed to chat connections"""
+    return {
+        'type': 'chat.message',
+        'message': {
+            'id': message.id,
+            'sender': message.sender_id,
+            'sender_name': message.sender.username,
+            'receiver': message.receiver_id,
+            'offer': message.offer_id,
+            'content': message.content,
+            'timestamp': message.timestamp.isoformat(),
+            'is_read': message.is_read,
+        },
+    }
+
+def get_or_create_conversation(user, other_user, offer=None):
+    """The conversation of two users about an offer (or in general), created with both inbox rows"""
+    user_a, user_b = sorted((user, other_user), key=lambda u: u.id)
+    lookup = {'user_a': user_a, 'user_b': user_b, 'offer': offer}
+    conversation = Conversation.objects.filter(**lookup).first()
+    if conversation is not None:
+        return conversation
+    try:
+        with transaction.atomic():
+            conversation = Conversation.objects.create(**lookup)
+            ConversationParticipant.objects.bulk_create([
+                ConversationParticipant(conversation=conversation, user=member, other_user=other)
+                for member, other in {(user_a, user_b), (user_b, user_a)}
+            ])
+    except IntegrityError:
+        # Created by a concurrent first message
+        conversation = Conversation.objects.get(**lookup)
+    return conversation
+
+def _record_last_message(conversation, message):
+    """Update the inbox state of both participants for a new message, with single UPDATEs"""
+    Conversation.objects.filter(pk=conversation.pk, last_message_at__lte=message.timestamp).update(
+        last_message=message,
+        last_message_preview=message.content[:PREVIEW_LENGTH],
+        last_message_at=message.timestamp,
+    )
+    ConversationParticipant.objects.filter(conversation=conversation).update(
+        unread_count=Case(
+            When(user=message.receiver_id, then=F('unread_count') + 1),
+            default=F('unread_count'),
+            output_field=ConversationParticipant._meta.get_field('unread_count'),
+        ),
+        last_message_at=Case(
+            When(last_message_at__lt=message.timestamp, then=message.timestamp),
+            default=F('last_message_at'),
+        ),
+    )
+
+def check_participants(sender, receiver, offer=None):
+    """
+    Raise PermissionDenied unless the two users may chat: a chat about an
+    offer is between its buyer and its seller, and a direct chat needs an
+    offer between the two users.
+    """
+    if offer is not None:
+        if {sender.id, receiver.id} != {offer.buyer_id, offer.listing.seller_id}:
+            raise PermissionDenied("Only the buyer and the seller can chat about an offer.")
+    elif not Offer.objects.filter(
+        Q(buyer=sender, listing__seller=receiver) |
+        Q(buyer=receiver, listing__seller=sender)
+    ).exists():
+        raise PermissionDenied("You can only chat with users you have a transaction with.")
+
+def send_message(sender, receiver, content, offer=None):
+    """
+    Save a chat message in its conversation, update both participants'
+    inboxes, notify the receiver and, once the transaction commits, push it
+    to the open chat connections of the offer.
+    """
+    content = content.strip()
+    if not content:
+        raise ValidationError("Message cannot be empty.")
+    if len(content) > MAX_MESSAGE_LENGTH:
+        raise ValidationError(f"Messages are limited to {MAX_MESSAGE_LENGTH} characters.")
+    check_participants(sender, receiver, offer)
+
+    with transaction.atomic():
+        conversation = get_or_create_conversation(sender, receiver, offer)
+        message = Message.objects.create(
+            sender=sender,
+            receiver=receiver,
+            offer=offer,
+            conversation=conversation,
+            content=content
+        )
+        _record_last_message(conversation, message)
+
+    queue_notification(
+        user=receiver,
+        notification_type='message_received',
+        title=f"New message from {sender.username}",
+        message=content[:100] + "..." if len(content) > 100 else content,
+        related_user=sender,
+        related_offer=offer,
+        related_listing=offer.listing if offer else None
+    )
+
+    if offer is not None:
+        event = message_event(message)
+        transaction.on_commit(lambda: get_channel_layer().group_send(offer_group(offer.id), event))
+    return message
+
+def chat_messages(user, other_user=None, offer=None):
+    """
+    Messages of a chat that `user` may see: those of the offer, or else
+    those between the two users. Unordered; pages are cut by id.
+    """
+    if offer is not None:
+        return Message.objects.filter(offer=offer).filter(Q(sender=user) | Q(receiver=user))
+    return Message.objects.filter(
+        Q(sender=user, receiver=other_user) |
+        Q(sender=other_user, receiver=user)
+    )
+
+def latest_messages(messages, limit=CHAT_PAGE_SIZE, before_id=None):
+    """
+    The newest `limit` messages, or the newest before message `before_id`.
+    Returns (messages oldest first, whether older messages exist).
+    """
+    if before_id is not None:
+        messages = messages.filter(id__lt=before_id)
+    page = list(messages.select_related('sender', 'receiver').order_by('-id')[:limit + 1])
+    has_older = len(page) > limit
+    page = page[:limit]
+    page.reverse()
+    return page, has_older
+
+def messages_after(messages, after_id, limit=CHAT_PAGE_SIZE):
+    """Up to `limit` messages newer than message `after_id`, oldest first"""
+    return list(messages.filter(id__gt=after_id).select_related('sender', 'receiver').order_by('id')[:limit])
+
+def mark_read(user, messages, page):
+    """Mark what `user` received within a displayed page as read. Returns the number of messages updated."""
+    if not page:
+        return 0
+    return mark_messages_read(user, messages.filter(id__gte=page[0].id, id__lte=page[-1].id))
+
+def mark_messages_read(user, messages):
+    """
+    Mark the messages `user` received among `messages` as read and refresh
+    the unread counts of the conversations they belong to
+    """
+    unread = messages.filter(receiver=user, is_read=False)
+    conversation_ids = set(unread.exclude(conversation=None).values_list('conversation_id', flat=True).distinct())
+    updated = unread.update(is_read=True)
+    if conversation_ids:
+        # Recounted rather than decremented, so concurrent reads cannot drift the counter
+        remaining = Message.objects.filter(
+            conversation=OuterRef('conversation'), receiver=user, is_read=False
+        ).order_by().values('conversation').annotate(count=Count('id')).values('count')
+        ConversationParticipant.objects.filter(conversation_id__in=conversation_ids, user=user).update(
+            unread_count=Coalesce(Subquery(remaining), 0)
+        )
+    return updated
+
+def inbox(user):
+    """The user's conversations, most recent activity first"""
+    return (
+        ConversationParticipant.objects.filter(user=user)
+        .select_related('other_user', 'conversation', 'conversation__offer__listing')
+    )
@@ -1,32 +1,64 @@
 from listings.models import Listing, ListingImage
-from services.moderation_service import check_spam_score, should_moderate, validate_image
+from services.moderation_service import check_spam, should_moderate, validate_image, find_similar_listings, index_listing_text, moderation_priority, auto_moderate
+from moderation.spam_rules import format_hits
+from moderation.minhash import signature
+from django.conf import settings
 from moderation.models import ModerationQueue
 from utils.image_validation import validate_images
 from django.core.exceptions import ValidationError
+from django.db import transaction
 
-def create_listing(user, data, images=None):
+def validate_listing_fields(title, description, price):
     """
-    Create a new listing, run moderation checks, and save.
-    Validates images and applies moderation rules.
+    Field rules for a new listing, shared by create_listing() and the
+    import_listings command (ListingSerializer applies the same rules).
     """
-    title = data.get('title')
-    description = data.get('description')
-    
-    # Validate required fields
     if not title or len(title.strip()) < 10:
         raise ValidationError("Title must be at least 10 characters long")
     
+    max_title_length = Listing._meta.get_field('title').max_length
+    if len(title) > max_title_length:
+        raise ValidationError(f"Title must be at most {max_title_length} characters long")
+    
     if not description or len(description.strip()) < 50:
         raise ValidationError("Description must be at least 50 characters long")
     
-    price = data.get('price')
     if not price or price <= 0:
         raise ValidationError("Price must be greater than zero")
+
+def moderation_reason(spam_score, spam_hits, similar):
+    """ModerationQueue.reason for a new listing"""
+    reason = f"New listing - Spam score: {spam_score}" if spam_score > 0 else "New listing awaiting review"
+    if spam_hits:
+        reason += f" - Matched rules: {format_hits(spam_hits)}"
+    if similar:
+        reason += f" - Similar to {len(similar)} existing listing(s)"
+    return reason
+
+def similar_listings_field(similar):
+    """[(listing_id, similarity)] as stored in ModerationQueue.similar_listings"""
+    return [{'listing': listing_id, 'similarity': round(score, 2)} for listing_id, score in similar]
+
+@transaction.atomic
+def create_listing(user, data, images=None):
+    """
+    Create a new listing, run moderation checks, and save.
+    Validates images and applies moderation rules.
+    Runs in one transaction, so image processing (which starts on commit)
+    always finds the listing's moderation entry.
+    """
+    title = data.get('title')
+    description = data.get('description')
+    price = data.get('price')
+    
+    # Validate required fields
+    validate_listing_fields(title, description, price)
     
     # Validate images if provided
     valid_images = []
     if images:
-        is_valid, error_msg, valid_images = validate_images(images)
+        # Cheap checks only; the image pipeline verifies and resizes after commit
+        is_valid, error_msg, valid_images = validate_images(images, verify=False)
         if not is_valid:
             raise ValidationError(error_msg)
         
@@ -36,9 +68,15 @@ def create_listing(user, data, images=None):
                 raise ValidationError(f"Image {image.name} failed safety validation")
     
     # Calculate spam score
-    spam_score = check_spam_score(title, description)
+    spam_score, spam_hits = check_spam(title, description)
     
-    # ALL listings start as pending - admin must approve
+    # Near-duplicate descriptions (same text reposted with small edits)
+    text_signature = signature(description)
+    similar = find_similar_listings(text_signature)
+    if similar:
+        spam_score = min(spam_score + getattr(settings, 'NEAR_DUPLICATE_SPAM_WEIGHT', 40), 100)
+    
+    # Listings start as pending until auto-moderation or a moderator decides
     status = 'pending'
     
     # Create listing
@@ -52,6 +90,8 @@ def create_listing(user, data, images=None):
         flags=spam_score
     )
     
+    index_listing_text(listing, text_signature)
+    
     # Create listing images
     if valid_images:
         for image in valid_images:
@@ -60,8 +100,16 @@ def create_listing(user, data, images=None):
     # Always add to moderation queue for admin review
     ModerationQueue.objects.create(
         listing=listing,
-        reason=f"New listing - Spam score: {spam_score}" if spam_score > 0 else "New listing awaiting review",
-        status='pending'
+        reason=moderation_reason(spam_score, spam_hits, similar),
+        similar_listings=similar_listings_field(similar),
+        priority=moderation_priority(spam_score),
+        status='pending',
+        auto_moderation=True,
     )
     
+    # Low-risk listings are approved and obvious spam rejected right away;
+    # listings with images are decided once their images are processed
+    if auto_moderate(listing.pk):
+        listing.refresh_from_db(fields=['status'])
+    
     return listing
@@ -1,8 +1,10 @@
-def check_spam_score(title, description):
+def check_spam(title, description):
     """
-    Calculate spam score based on heuristics.
-    Returns an integer between 0 and 100.
+    Calculate spam score based on heuristics and the admin-editable spam rules.
+    Returns (score between 0 and 100, [(SpamRule, occurrences)]).
     """
+    from moderation.spam_rules import get_engine
+
     score = 0
     
     # Heuristic 1: Length check
@@ -11,14 +13,18 @@ def check_spam_score(title, description):
     if len(description) < 50:
         score += 20
         
-    # Heuristic 2: Keyword check (basic)
-    spam_keywords = ['cash only', 'urgent', 'wire transfer', 'western union']
-    text = (title + " " + description).lower()
-    for keyword in spam_keywords:
-        if keyword in text:
-            score += 30
+    # Heuristic 2: Spam rules (keywords and regular expressions), each counted once
+    hits = get_engine().match(title + " " + description)
+    score += sum(rule.weight for rule, _ in hits)
             
-    return min(score, 100)
+    return max(0, min(score, 100)), hits
+
+def check_spam_score(title, description):
+    """
+    Calculate spam score based on heuristics.
+    Returns an integer between 0 and 100.
+    """
+    return check_spam(title, description)[0]
 
 def validate_image(image):
     """
@@ -30,8 +36,299 @@ def validate_image(image):
         return False
     return True
 
+# Queue priority added per other listing sharing an image, counting at most
+# MAX_DUPLICATE_LISTINGS_COUNTED listings
+DUPLICATE_IMAGE_PRIORITY = 20
+MAX_DUPLICATE_LISTINGS_COUNTED = 5
+
+def moderation_priority(spam_score, duplicates=()):
+    """
+    Position of a moderation entry in the queue, highest first: the listing's
+    spam score (which already counts near-duplicate descriptions) plus the
+    near-duplicate images found on other listings.
+    """
+    duplicate_listings = {d['duplicate_listing'] for d in duplicates}
+    return spam_score + DUPLICATE_IMAGE_PRIORITY * min(len(duplicate_listings), MAX_DUPLICATE_LISTINGS_COUNTED)
+
 def should_moderate(spam_score):
     """
     Decide if listing needs manual moderation.
     """
     return spam_score >= 50
+
+def find_duplicate_images(listing_image, max_distance=None, limit=20):
+    """
+    Images on other listings whose perceptual hash is within `max_distance`
+    bits of this one. Returns [(image, distance)], closest first.
+    """
+    from django.conf import settings
+    from django.db.models import Q
+    from listings.models import ListingImage
+    from utils.image_hashing import HASH_BANDS, hamming_distance_expression, to_unsigned
+
+    if listing_image.dhash is None:
+        return []
+    if max_distance is None:
+        max_distance = getattr(settings, 'DUPLICATE_IMAGE_MAX_DISTANCE', 3)
+
+    # Any hash within HASH_BANDS - 1 bits shares at least one band with ours.
+    # The database measures every candidate, however crowded its band, and
+    # returns only the closest `limit`
+    bands = Q()
+    for i in range(HASH_BANDS):
+        bands |= Q(**{f'dhash_band_{i}': getattr(listing_image, f'dhash_band_{i}')})
+    matches = (
+        ListingImage.objects.filter(bands)
+        .exclude(listing_id=listing_image.listing_id)
+        .annotate(distance=hamming_distance_expression(to_unsigned(listing_image.dhash)))
+        .filter(distance__lte=max_distance)
+        .only('id', 'listing_id', 'dhash')
+        .order_by('distance', 'id')[:limit]
+    )
+    return [(image, image.distance) for image in matches]
+
+def flag_duplicate_images(listing_image):
+    """Record near-duplicates of an image on its listing's pending moderation entries"""
+    from django.db import transaction
+    from moderation.models import ModerationQueue
+
+    matches = find_duplicate_images(listing_image)
+    if not matches:
+        return []
+    found = [
+        {'image': listing_image.id, 'duplicate_image': image.id, 'duplicate_listing': image.listing_id, 'distance': distance}
+        for image, distance in matches
+    ]
+    with transaction.atomic():
+        entries = ModerationQueue.objects.select_for_update().filter(listing_id=listing_image.listing_id, status='pending')
+        for entry in entries:
+            known = {(d['image'], d['duplicate_image']) for d in entry.duplicates}
+            entry.duplicates = entry.duplicates + [d for d in found if (d['image'], d['duplicate_image']) not in known]
+            entry.priority = moderation_priority(listing_image.listing.flags, entry.duplicates)
+            entry.save(update_fields=['duplicates', 'priority'])
+    return found
+
+def find_similar_listings(text_signature, exclude_listing_id=None, threshold=None, limit=20):
+    """
+    Listings whose description signature is at least `threshold` similar.
+    Candidates come from the LSH buckets. Returns [(listing_id, similarity)], most similar first.
+    """
+    matches = find_similar_listings_bulk([text_signature], threshold, limit + 1)[0]
+    return [match for match in matches if match[0] != exclude_listing_id][:limit]
+
+def find_similar_listings_bulk(text_signatures, threshold=None, limit=20):
+    """find_similar_listings() for many signatures at once, with a few queries in total"""
+    from collections import defaultdict
+    from django.conf import settings
+    from moderation.minhash import band_buckets, similarity, unpack
+    from moderation.models import ListingTextBucket, ListingTextSignature
+
+    if threshold is None:
+        threshold = getattr(settings, 'NEAR_DUPLICATE_THRESHOLD', 0.8)
+
+    buckets_per_signature = [band_buckets(sig) if sig is not None else [] for sig in text_signatures]
+    all_buckets = sorted({bucket for buckets in buckets_per_signature for bucket in buckets})
+    listings_by_bucket = defaultdict(set)
+    # Chunked to stay under database parameter limits
+    for start in range(0, len(all_buckets), 500):
+        rows = ListingTextBucket.objects.filter(bucket__in=all_buckets[start:start + 500]).values_list('bucket', 'listing_id')
+        for bucket, listing_id in rows:
+            listings_by_bucket[bucket].add(listing_id)
+
+    candidate_ids = sorted(set().union(*listings_by_bucket.values())) if listings_by_bucket else []
+    stored = {}
+    for start in range(0, len(candidate_ids), 500):
+        rows = ListingTextSignature.objects.filter(listing_id__in=candidate_ids[start:start + 500]).values_list('listing_id', 'signature')
+        stored.update((listing_id, unpack(sig)) for listing_id, sig in rows)
+
+    results = []
+    for sig, buckets in zip(text_signatures, buckets_per_signature):
+        candidates = set().union(*(listings_by_bucket.get(bucket, ()) for bucket in buckets))
+        matches = []
+        for listing_id in candidates:
+            score = similarity(sig, stored[listing_id]) if listing_id in stored else 0
+            if score >= threshold:
+                matches.append((listing_id, score))
+        matches.sort(key=lambda match: (-match[1], match[0]))
+        results.append(matches[:limit])
+    return results
+
+def index_listing_text(listing, text_signature=None):
+    """Store (or replace) a listing's description signature and LSH buckets"""
+    from moderation.minhash import band_buckets, pack, signature
+    from moderation.models import ListingTextBucket, ListingTextSignature
+
+    if text_signature is None:
+        text_signature = signature(listing.description)
+    ListingTextBucket.objects.filter(listing=listing).delete()
+    if text_signature is None:
+        ListingTextSignature.objects.filter(listing=listing).delete()
+        return
+    ListingTextSignature.objects.update_or_create(listing=listing, defaults={'signature': pack(text_signature)})
+    ListingTextBucket.objects.bulk_create(
+        ListingTextBucket(listing=listing, bucket=bucket) for bucket in band_buckets(text_signature)
+    )
+
+def approve_listings(listing_ids, reason='Approved by moderator'):
+    """
+    Approve many listings with one UPDATE, close their moderation entries and
+    send a single listings_approved event. Returns the ids that changed status.
+    """
+    return _moderate_listings(listing_ids, 'approved', reason)
+
+def reject_listings(listing_ids, reason='Rejected by moderator', notify_sellers=True):
+    """
+    Reject many listings with one UPDATE, close their moderation entries,
+    notify the sellers and send a single listings_rejected event.
+    Returns the ids that changed status.
+    """
+    changed = _moderate_listings(listing_ids, 'rejected', reason)
+    if changed and notify_sellers:
+        from listings.models import Listing
+        from notifications.utils import queue_notifications_bulk
+        queue_notifications_bulk([
+            {
+                'user_id': seller_id,
+                'notification_type': 'offer_rejected',  # Reusing type
+                'title': 'Listing Rejected',
+                'message': f"Your listing '{title}' has been rejected. Please review the guidelines and create a new listing.",
+                'related_listing_id': listing_id,
+            }
+            for listing_id, seller_id, title in Listing.objects.filter(id__in=changed).values_list('id', 'seller_id', 'title')
+        ])
+    return changed
+
+def _moderate_listings(listing_ids, status, reason):
+    from django.db import transaction
+    from django.utils import timezone
+    from listings.models import Listing
+    from listings.signals import listings_approved, listings_rejected
+    from moderation.models import ModerationQueue
+
+    listing_ids = list(listing_ids)
+    now = timezone.now()
+    with transaction.atomic():
+        changed = list(
+            Listing.objects.select_for_update().filter(id__in=listing_ids).exclude(status=status).values_list('id', flat=True)
+        )
+        if changed:
+            # No save(): bulk transitions are announced by the batched event below
+            Listing.objects.filter(id__in=changed).update(status=status, updated_at=now)
+        ModerationQueue.objects.filter(listing_id__in=listing_ids, status='pending').update(
+            status='reviewed',
+            reviewed_at=now,
+            decision_reason=reason,
+            claimed_by=None,
+            lease_expires_at=None,
+        )
+        event = listings_approved if status == 'approved' else listings_rejected
+        event.send(sender=Listing, listing_ids=changed)
+    return changed
+
+def claim_entries(user, limit=None):
+    """
+    Lease up to `limit` pending moderation entries to a moderator, riskiest
+    first, so several moderators can work through the queue without reviewing
+    the same listings. Entries the moderator still holds are renewed and count
+    towards the limit; entries whose lease expired can be claimed by anyone.
+    Returns the moderator's claimed entries in queue order.
+    """
+    from datetime import timedelta
+    from django.conf import settings
+    from django.db import connection, transaction
+    from django.db.models import Q
+    from django.utils import timezone
+    from moderation.models import ModerationQueue
+
+    if limit is None:
+        limit = getattr(settings, 'MODERATION_CLAIM_BATCH_SIZE', 20)
+    now = timezone.now()
+    lease = now + timedelta(seconds=getattr(settings, 'MODERATION_CLAIM_LEASE_SECONDS', 900))
+    pending = ModerationQueue.objects.filter(status='pending')
+    free = pending.filter(Q(claimed_by__isnull=True) | Q(lease_expires_at__lte=now)).order_by(*ModerationQueue.QUEUE_ORDERING)
+
+    with transaction.atomic():
+        wanted = limit - pending.filter(claimed_by=user, lease_expires_at__gt=now).update(lease_expires_at=lease)
+        if wanted > 0 and connection.features.has_select_for_update_skip_locked:
+            # Rows another moderator is claiming at this moment are skipped instead of waited for
+            ids = list(free.select_for_update(skip_locked=True).values_list('id', flat=True)[:wanted])
+            ModerationQueue.objects.filter(id__in=ids).update(claimed_by=user, lease_expires_at=lease)
+        else:
+            # Without row locks the UPDATE re-checks that each candidate is still
+            # free; entries taken by a concurrent claim are replaced by the next ones
+            for _ in range(3):
+                if wanted <= 0:
+                    break
+                ids = list(free.values_list('id', flat=True)[:wanted])
+                if not ids:
+                    break
+                wanted -= free.filter(id__in=ids).update(claimed_by=user, lease_expires_at=lease)
+
+    return list(
+        pending.filter(claimed_by=user, lease_expires_at=lease)
+        .select_related('listing', 'listing__seller')
+        .prefetch_related('listing__images')
+        .order_by(*ModerationQueue.QUEUE_ORDERING)
+    )
+
+def release_entries(user, entry_ids=None):
+    """Give back a moderator's claimed entries (all of them by default). Returns how many were released."""
+    from moderation.models import ModerationQueue
+
+    entries = ModerationQueue.objects.filter(status='pending', claimed_by=user)
+    if entry_ids is not None:
+        entries = entries.filter(id__in=entry_ids)
+    return entries.update(claimed_by=None, lease_expires_at=None)
+
+def exclude_claimed_by_others(entries, user):
+    """Drop entries another moderator holds an unexpired lease on"""
+    from django.db.models import Q
+    from django.utils import timezone
+
+    return entries.filter(Q(claimed_by__isnull=True) | Q(claimed_by=user) | Q(lease_expires_at__lte=timezone.now()))
+
+def auto_moderate(listing_id, reevaluate=False):
+    """
+    Run the auto-moderation rules on a pending listing, record the decision
+    and approve or reject it when the rules allow. Listings the rules send to
+    review stay in the moderation queue and are not evaluated again unless
+    `reevaluate` is set. Returns the ModerationDecision, or None if nothing
+    was decided (disabled, no longer pending, already decided or waiting for
+    its images).
+    """
+    import logging
+    from django.conf import settings
+    from django.db import transaction
+    from listings.models import Listing
+    from moderation.auto_moderation import APPROVE, REJECT, WAIT, evaluate
+    from moderation.models import ModerationDecision
+
+    if not getattr(settings, 'AUTO_MODERATION_ENABLED', True):
+        return None
+
+    with transaction.atomic():
+        listing = Listing.objects.select_for_update().select_related('seller').filter(pk=listing_id, status='pending').first()
+        if listing is None or (not reevaluate and listing.moderation_decisions.exists()):
+            return None
+        verdict = evaluate(listing)
+        if verdict.decision == WAIT:
+            return None
+        decision = ModerationDecision.objects.create(
+            listing=listing,
+            decision=verdict.decision,
+            rule=verdict.rule,
+            reason=verdict.reason,
+            spam_score=listing.flags,
+            latency_ms=verdict.latency_ms,
+            rule_timings=verdict.timings,
+        )
+        if verdict.decision == APPROVE:
+            approve_listings([listing.pk], reason=f"Auto-approved: {verdict.reason}")
+        elif verdict.decision == REJECT:
+            reject_listings([listing.pk], reason=f"Auto-rejected: {verdict.reason}")
+
+    logging.getLogger(__name__).info(
+        f"Auto-moderation: listing {listing.pk} {verdict.decision} "
+        f"({verdict.rule or 'all rules passed'}) in {verdict.latency_ms:.1f} ms"
+    )
+    return decision
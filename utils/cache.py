@@ -0,0 +1,95 @@
+"""
+Cache helpers shared by views and services.
+
+- Versioned namespaces: keys embed a version number that is bumped to
+  invalidate everything in the namespace at once, without tracking keys.
+- Single-flight recomputation: on a miss only one caller recomputes a value
+  while concurrent callers wait briefly for it, so an expired hot key does
+  not send every request to the database at the same moment.
+
+The default cache is the two-level cache in utils/tiered_cache.py.
+"""
+import functools
+import time
+
+from django.core.cache import cache
+
+MISSING = object()
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def get_version(namespace):
+    """Current version number of a cache namespace"""
+    key = _version_key(namespace)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a lost version key never reuses an old number
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every key built with versioned_key(namespace, ...)"""
+    key = _version_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time() * 1000)
+        cache.set(key, version, None)
+        return version
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, str(get_version(namespace))] + [str(part) for part in parts])
+
+
+def get_or_set_single_flight(key, compute, timeout, lock_timeout=10, wait=2.0):
+    """
+    Return the cached value for `key`, computing and storing it on a miss.
+    Only the caller that wins the lock computes; the others poll for up to
+    `wait` seconds before giving up and computing it themselves.
+    """
+    value = cache.get(key, MISSING)
+    if value is not MISSING:
+        return value
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        value = cache.get(key, MISSING)
+        if value is not MISSING:
+            return value
+    return compute()
+
+
+def cached(namespace, timeout=300):
+    """
+    Decorator caching a function's result per positional arguments under a
+    versioned namespace; call bump_version(namespace) to invalidate.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            key = versioned_key(namespace, func.__name__, *args)
+            return get_or_set_single_flight(key, lambda: func(*args), timeout)
+        return wrapper
+    return decorator
+
+
+def cache_stats():
+    """L1 hit/miss/eviction counters of the default cache in this process"""
+    stats = getattr(cache, 'stats', None)
+    return stats() if stats else {}
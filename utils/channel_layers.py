@@ -0,0 +1,149 @@
+"""
+Channel layers: deliver events to open WebSocket connections.
+
+Each connection (chat/consumers.py) gets a channel, a queue read by its own
+coroutine, and joins groups such as 'chat.offer.42'. group_send() puts an
+event on the channel of every member of a group. It is a plain function,
+safe to call from sync views and services in any thread; delivery is handed
+to the event loop of each receiving connection.
+
+Two layers, chosen with CHANNEL_LAYER:
+
+- 'memory': groups live in this process. Enough for one ASGI worker process,
+  and for tests.
+- 'redis': group_send publishes to Redis and every process delivers to its
+  own members, so several workers or hosts can serve one conversation
+  (needs the redis package; CHANNEL_LAYER_URL points at the server).
+"""
+import asyncio
+import json
+import logging
+import threading
+import uuid
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+logger = logging.getLogger(__name__)
+
+# Events waiting for a slow connection beyond this are dropped
+CHANNEL_CAPACITY = 100
+
+
+class InMemoryChannelLayer:
+    def __init__(self):
+        self._channels = {}  # name: (event loop, asyncio.Queue)
+        self._groups = {}  # group: set of channel names
+        self._lock = threading.Lock()
+
+    def new_channel(self):
+        """Create a channel bound to the running event loop; call from the connection's coroutine"""
+        name = uuid.uuid4().hex
+        with self._lock:
+            self._channels[name] = (asyncio.get_running_loop(), asyncio.Queue(CHANNEL_CAPACITY))
+        return name
+
+    def close_channel(self, name):
+        with self._lock:
+            self._channels.pop(name, None)
+            for members in self._groups.values():
+                members.discard(name)
+            self._groups = {group: members for group, members in self._groups.items() if members}
+
+    async def receive(self, name):
+        """Wait for the next event on a channel"""
+        return await self._channels[name][1].get()
+
+    def group_add(self, group, name):
+        with self._lock:
+            self._groups.setdefault(group, set()).add(name)
+
+    def group_discard(self, group, name):
+        with self._lock:
+            members = self._groups.get(group)
+            if members is not None:
+                members.discard(name)
+                if not members:
+                    del self._groups[group]
+
+    def group_send(self, group, event):
+        """Send an event (a JSON-serialisable dict) to every channel in the group"""
+        self._deliver(group, event)
+
+    def _deliver(self, group, event):
+        with self._lock:
+            targets = [self._channels[name] for name in self._groups.get(group, ()) if name in self._channels]
+        for loop, queue in targets:
+            try:
+                loop.call_soon_threadsafe(self._put, queue, event)
+            except RuntimeError:
+                # The connection's event loop has shut down
+                pass
+
+    @staticmethod
+    def _put(queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            logger.warning("Dropping event for a connection that is not reading its channel")
+
+
+class RedisChannelLayer(InMemoryChannelLayer):
+    """
+    Groups are published as Redis channels. A listener thread per process
+    subscribes to all of them and delivers to this process's members.
+    """
+
+    def __init__(self, url, prefix='channels:'):
+        super().__init__()
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("CHANNEL_LAYER='redis' requires the redis package")
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+        self._listener = None
+
+    def group_add(self, group, name):
+        super().group_add(group, name)
+        self._ensure_listener()
+
+    def group_send(self, group, event):
+        self._redis.publish(f'{self.prefix}{group}', json.dumps(event))
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='channel-layer-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        pubsub = self._redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(f'{self.prefix}*')
+        for message in pubsub.listen():
+            try:
+                group = message['channel'].decode()[len(self.prefix):]
+                self._deliver(group, json.loads(message['data']))
+            except Exception:
+                logger.exception("Could not deliver a channel layer event")
+
+
+_layer = None
+_layer_lock = threading.Lock()
+
+
+def get_channel_layer():
+    """The process-wide channel layer configured by CHANNEL_LAYER"""
+    global _layer
+    if _layer is None:
+        with _layer_lock:
+            if _layer is None:
+                backend = getattr(settings, 'CHANNEL_LAYER', 'memory')
+                if backend == 'memory':
+                    _layer = InMemoryChannelLayer()
+                elif backend == 'redis':
+                    _layer = RedisChannelLayer(getattr(settings, 'CHANNEL_LAYER_URL', 'redis://127.0.0.1:6379/2'))
+                else:
+                    raise ImproperlyConfigured(f"Unknown CHANNEL_LAYER {backend!r}; use 'memory' or 'redis'")
+    return _layer
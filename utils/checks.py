@@ -0,0 +1,21 @@
+"""
+Deployment checks (`manage.py check --deploy`, run by build.sh) for settings
+that work on one process but not once the site runs several. Registered by
+utils.apps.UtilsConfig.ready().
+"""
+from django.core.checks import Tags, Warning, register
+
+from utils.tiered_cache import is_process_local
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_cache(app_configs, **kwargs):
+    """The shared cache tier must be shared: page invalidation relies on it"""
+    if not is_process_local('default'):
+        return []
+    return [Warning(
+        "The shared cache is a per-process locmem cache.",
+        hint="Set CACHE_BACKEND to db, file or redis so every web and runworker process "
+             "sees the same cache versions.",
+        id='utils.W001',
+    )]
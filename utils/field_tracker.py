@@ -0,0 +1,67 @@
+"""
+Original values of selected model fields.
+
+A model using FieldTrackerMixin lists the fields to watch in `tracked_fields`.
+Their values are recorded when an instance is loaded from the database (and
+again after each save and refresh_from_db), so signals and services can ask
+what changed without re-reading the row:
+
+    listing = Listing.objects.get(pk=pk)
+    listing.status = 'approved'
+    listing.has_changed('status')     # True
+    listing.previous_value('status')  # 'pending'
+
+Fields deferred with only()/defer() are recorded when Django loads them on
+first access. A deferred field assigned before it was ever loaded has an
+unknown original value: previous_value() returns UNKNOWN and has_changed()
+returns True.
+"""
+from django.db.models import DEFERRED
+
+UNKNOWN = object()
+
+
+class FieldTrackerMixin:
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._tracked_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in cls.tracked_fields and value is not DEFERRED
+        }
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        # Also reached when a deferred field is loaded on first access
+        self._track_current(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have already seen the old values by now
+        self._track_current(kwargs.get('update_fields'))
+
+    def _track_current(self, fields=None):
+        if not hasattr(self, '_tracked_values'):
+            self._tracked_values = {}
+        deferred = self.get_deferred_fields()
+        for name in fields if fields is not None else self.tracked_fields:
+            if name in self.tracked_fields and name not in deferred:
+                self._tracked_values[name] = getattr(self, name)
+
+    def previous_value(self, name):
+        """
+        The value `name` had in the database when this instance was loaded or
+        last saved: None for unsaved instances, UNKNOWN if it was never loaded
+        """
+        if self._state.adding:
+            return None
+        return getattr(self, '_tracked_values', {}).get(name, UNKNOWN)
+
+    def has_changed(self, name):
+        if self._state.adding:
+            return True
+        previous = self.previous_value(name)
+        return previous is UNKNOWN or previous != getattr(self, name)
@@ -0,0 +1,88 @@
+"""
+Resized copies of listing images for responsive templates.
+
+Every upload gets one copy per width in DERIVATIVE_WIDTHS (never upscaled),
+each as WebP and as a JPEG fallback. Orientation from EXIF is applied to the
+pixels and the metadata is dropped, so location data in phone photos never
+reaches other users. Paths are recorded on ListingImage.derivatives:
+
+    {"webp": {"320": "listings/derivatives/...", ...}, "jpeg": {...}}
+"""
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+from .image_validation import PILLOW_AVAILABLE
+
+if PILLOW_AVAILABLE:
+    from PIL import Image, ImageOps
+
+DERIVATIVE_WIDTHS = (320, 640, 1024)
+DERIVATIVE_FORMATS = {
+    # format: (Pillow format, extension, save options)
+    'webp': ('WEBP', 'webp', {'quality': 75, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+DERIVATIVES_DIR = 'listings/derivatives'
+
+
+def build_derivatives(source):
+    """
+    Resize an image file (path or file object) to every derivative width.
+    Returns {format: {width: encoded bytes}}; an empty dict without Pillow.
+    """
+    if not PILLOW_AVAILABLE:
+        return {}
+
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode in ('RGBA', 'LA') or 'transparency' in img.info:
+            # Flatten transparency onto white for JPEG
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+        original_width = img.width
+
+        widths = [w for w in DERIVATIVE_WIDTHS if w < original_width] or [original_width]
+        built = {name: {} for name in DERIVATIVE_FORMATS}
+        for width in widths:
+            height = max(1, round(img.height * width / original_width))
+            resized = img if width == original_width else img.resize((width, height), Image.LANCZOS)
+            for name, (pil_format, _, options) in DERIVATIVE_FORMATS.items():
+                buffer = io.BytesIO()
+                # No exif= argument: the re-encoded file carries no EXIF block
+                resized.save(buffer, pil_format, **options)
+                built[name][width] = buffer.getvalue()
+    return built
+
+
+def store_derivatives(listing_image, built):
+    """Save built derivatives to storage and record their paths on the image"""
+    delete_derivatives(listing_image)
+    stem = os.path.splitext(os.path.basename(listing_image.image.name))[0]
+    derivatives = {}
+    for name, by_width in built.items():
+        extension = DERIVATIVE_FORMATS[name][1]
+        derivatives[name] = {
+            str(width): default_storage.save(
+                f'{DERIVATIVES_DIR}/{stem}_{width}w.{extension}', ContentFile(data)
+            )
+            for width, data in by_width.items()
+        }
+    listing_image.derivatives = derivatives
+    listing_image.processing_status = 'ready'
+    listing_image.processing_error = ''
+    listing_image.save(update_fields=[
+        'derivatives', 'processing_status', 'processing_error',
+        'dhash', 'dhash_band_0', 'dhash_band_1', 'dhash_band_2', 'dhash_band_3',
+    ])
+
+
+def delete_derivatives(listing_image):
+    for by_width in (listing_image.derivatives or {}).values():
+        for path in by_width.values():
+            default_storage.delete(path)
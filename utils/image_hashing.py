@@ -0,0 +1,69 @@
+"""
+Perceptual hashing of listing images.
+
+dhash() reduces an image to a 64-bit difference hash: re-encoded, resized or
+lightly edited copies of a photo hash to values a few bits apart. Hashes are
+stored as signed 64-bit integers together with four 16-bit bands. Two hashes
+at most HASH_BANDS - 1 bits apart must agree on at least one band, so an
+indexed equality lookup on the bands finds every candidate without scanning
+the whole table. Exact distances are computed by the database from the bands
+(hamming_distance_expression), so the closest candidates can be selected
+there however many share a band.
+"""
+from .image_validation import PILLOW_AVAILABLE
+
+if PILLOW_AVAILABLE:
+    from PIL import Image, ImageOps
+
+HASH_BITS = 64
+HASH_BANDS = 4
+BAND_BITS = HASH_BITS // HASH_BANDS
+
+
+def dhash(source):
+    """64-bit difference hash of an image file (path or file object), or None without Pillow"""
+    if not PILLOW_AVAILABLE:
+        return None
+    with Image.open(source) as img:
+        img = ImageOps.exif_transpose(img)
+        small = img.convert('L').resize((9, 8), Image.LANCZOS)
+        pixels = list(small.getdata())
+
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def to_signed(value):
+    """Unsigned 64-bit hash to the signed value a BigIntegerField can hold"""
+    return value - (1 << HASH_BITS) if value >= 1 << (HASH_BITS - 1) else value
+
+
+def to_unsigned(value):
+    return value + (1 << HASH_BITS) if value < 0 else value
+
+
+def hash_bands(value):
+    """The HASH_BANDS BAND_BITS-bit slices of an unsigned hash, high bits first"""
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (BAND_BITS * (HASH_BANDS - 1 - i))) & mask for i in range(HASH_BANDS)]
+
+
+def hamming_distance_expression(value):
+    """
+    Database expression for the bit distance between an unsigned hash and the
+    hash of each row: the set bits of the XOR of every band, added up bit by
+    bit since databases have no portable popcount.
+    """
+    from django.db.models import F, Value
+
+    distance = Value(0)
+    for i, band in enumerate(hash_bands(value)):
+        xor = F(f'dhash_band_{i}').bitxor(band)
+        for bit in range(BAND_BITS):
+            distance += xor.bitrightshift(bit).bitand(1)
+    return distance
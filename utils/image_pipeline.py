@@ -0,0 +1,192 @@
+"""
+Off-request processing of uploaded listing images.
+
+Requests only run the cheap upload checks and save the file; the image row
+starts as processing_status='pending'. Once the transaction commits, the
+file is handed to a pool of worker processes that verify it with Pillow and
+build the resized copies (utils/image_derivatives.py). The worker function
+only touches image data; storage writes and the status update happen back
+in the web process, in the pool's result callback.
+
+IMAGE_PROCESSING_WORKERS sets the pool size; 0 processes images in the
+calling thread, after commit. Images left 'pending' or 'processing' by a
+restart are picked up by `python manage.py runworker` once they are
+STALE_IMAGE_SECONDS old, or at once by `python manage.py generate_image_derivatives`.
+"""
+import functools
+import io
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .image_derivatives import build_derivatives, store_derivatives
+from .image_hashing import dhash
+from .image_validation import verify_image_content
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Images still unprocessed this long after upload were lost by a restart
+STALE_IMAGE_SECONDS = 600
+
+
+def get_executor():
+    """The process pool shared by this web process, or None when disabled"""
+    global _executor
+    workers = getattr(settings, 'IMAGE_PROCESSING_WORKERS', 2)
+    if workers <= 0:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            # spawn: children must not inherit the parent's threads and DB connections
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+        return _executor
+
+
+def _reset_executor():
+    global _executor
+    with _executor_lock:
+        _executor = None
+
+
+def process_image_file(source):
+    """
+    Verify an image, build its derivatives and perceptual hash. Runs in a pool process, so it
+    takes a file path or raw bytes and returns plain data.
+    """
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    is_valid, error = verify_image_content(source)
+    if not is_valid:
+        return {'error': error}
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    derivatives = build_derivatives(source)
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return {'derivatives': derivatives, 'dhash': dhash(source)}
+
+
+def process_listing_images(image_ids):
+    """Process images in the background once the current transaction commits"""
+    image_ids = list(image_ids)
+    if image_ids:
+        transaction.on_commit(lambda: _submit(image_ids))
+
+
+def process_listing_image(listing_image):
+    """Process one image synchronously in this process"""
+    _finish(listing_image.pk, _run(process_image_file, _source_for(listing_image)))
+
+
+def process_stale_images(limit=100):
+    """
+    Process, in this process, images that a restarted web process left
+    'pending' or 'processing'. Returns the number of images processed.
+    """
+    from listings.models import ListingImage
+
+    cutoff = timezone.now() - timedelta(seconds=STALE_IMAGE_SECONDS)
+    images = ListingImage.objects.filter(
+        processing_status__in=['pending', 'processing'], uploaded_at__lt=cutoff,
+    ).order_by('id')[:limit]
+    processed = 0
+    for image in images:
+        try:
+            process_listing_image(image)
+        except Exception:
+            logger.exception(f"Could not process stale image {image.pk}")
+            continue
+        processed += 1
+    return processed
+
+
+def _source_for(listing_image):
+    try:
+        # Workers can read local files themselves
+        return listing_image.image.path
+    except NotImplementedError:
+        with listing_image.image.open('rb') as f:
+            return f.read()
+
+
+def _submit(image_ids):
+    from listings.models import ListingImage
+
+    executor = get_executor()
+    for image in ListingImage.objects.filter(id__in=image_ids, processing_status='pending'):
+        ListingImage.objects.filter(pk=image.pk).update(processing_status='processing')
+        source = _source_for(image)
+        if executor is not None:
+            try:
+                future = executor.submit(process_image_file, source)
+                future.add_done_callback(functools.partial(_on_done, image.pk, threading.get_ident()))
+                continue
+            except (BrokenProcessPool, RuntimeError) as e:
+                logger.error(f"Image pool unavailable, processing image {image.pk} inline: {e}")
+                _reset_executor()
+                executor = None
+        _finish(image.pk, _run(process_image_file, source))
+
+
+def _run(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        return {'error': f"Processing failed: {e}"}
+
+
+def _on_done(image_id, submitting_thread, future):
+    try:
+        try:
+            result = future.result()
+        except Exception as e:
+            result = {'error': f"Processing failed: {e}"}
+        _finish(image_id, result)
+    except Exception:
+        logger.exception(f"Could not record processing result for image {image_id}")
+    finally:
+        # Callbacks normally run on the pool's management thread, which has
+        # its own database connection to release
+        if threading.get_ident() != submitting_thread:
+            connection.close()
+
+
+def _finish(image_id, result):
+    """Record a worker result on the image"""
+    from listings.models import ListingImage
+
+    image = ListingImage.objects.filter(pk=image_id).first()
+    if image is None:
+        # Deleted while it was being processed
+        return
+    if 'error' in result:
+        logger.warning(f"Image {image_id} failed processing: {result['error']}")
+        ListingImage.objects.filter(pk=image_id).update(
+            processing_status='failed',
+            processing_error=result['error'],
+        )
+    else:
+        if result.get('dhash') is not None:
+            image.set_dhash(result['dhash'])
+        store_derivatives(image, result['derivatives'])
+        if image.dhash is not None:
+            from services.moderation_service import flag_duplicate_images
+            flag_duplicate_images(image)
+
+    # The last image of a new listing hands it to auto-moderation; images of
+    # older listings (e.g. backfilled by process_stale_images) do not
+    if not ListingImage.objects.filter(listing_id=image.listing_id, processing_status__in=['pending', 'processing']).exists():
+        from moderation.models import ModerationQueue
+        from services.moderation_service import auto_moderate
+        if ModerationQueue.objects.filter(listing_id=image.listing_id, status='pending', auto_moderation=True).exists():
+            auto_moderate(image.listing_id)
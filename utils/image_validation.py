@@ -12,9 +12,11 @@ ALLOWED_IMAGE_TYPES = ['JPEG', 'PNG', 'JPG']
 MAX_IMAGE_SIZE = 5 * 1024 * 1024  # 5MB
 MAX_IMAGES_PER_LISTING = 5
 
-def validate_image_file(image):
+def validate_image_file(image, verify=True):
     """
     Validate a single image file.
+    With verify=False only the cheap checks (size, extension) run; the upload
+    is then verified by the image pipeline (utils/image_pipeline.py).
     Returns (is_valid, error_message)
     """
     if not image:
@@ -29,32 +31,39 @@ def validate_image_file(image):
     if ext not in ALLOWED_IMAGE_TYPES:
         return False, f"Invalid file type. Allowed types: {', '.join(ALLOWED_IMAGE_TYPES)}"
     
-    # Try to open and validate with Pillow if available
-    if PILLOW_AVAILABLE:
-        try:
-            # Reset file pointer
-            image.seek(0)
-            img = Image.open(image)
+    if verify:
+        # Reset file pointer
+        image.seek(0)
+        is_valid, error = verify_image_content(image)
+        # Reset file pointer again after verify
+        image.seek(0)
+        if not is_valid:
+            return False, error
+    
+    return True, None
+
+def verify_image_content(source):
+    """
+    Open and verify image data (a path or file object) with Pillow.
+    Returns (is_valid, error_message); always valid if Pillow is not installed.
+    """
+    if not PILLOW_AVAILABLE:
+        # If Pillow is not available, just check extension
+        # This is a basic validation - for production, Pillow should be installed
+        return True, None
+    try:
+        with Image.open(source) as img:
             img.verify()
-            
-            # Reset file pointer again after verify
-            image.seek(0)
-            
             # Check if it's a valid image format
             if img.format not in ['JPEG', 'PNG']:
                 return False, "Invalid image format. Only JPEG and PNG are allowed"
-        except Exception as e:
-            return False, f"Invalid image file: {str(e)}"
-    else:
-        # If Pillow is not available, just check extension
-        # This is a basic validation - for production, Pillow should be installed
-        pass
-    
+    except Exception as e:
+        return False, f"Invalid image file: {str(e)}"
     return True, None
 
-def validate_images(images, max_count=MAX_IMAGES_PER_LISTING):
+def validate_images(images, max_count=MAX_IMAGES_PER_LISTING, verify=True):
     """
-    Validate multiple image files.
+    Validate multiple image files (see validate_image_file for `verify`).
     Returns (is_valid, error_message, valid_images)
     """
     if not images:
@@ -65,7 +74,7 @@ def validate_images(images, max_count=MAX_IMAGES_PER_LISTING):
     
     valid_images = []
     for idx, image in enumerate(images):
-        is_valid, error = validate_image_file(image)
+        is_valid, error = validate_image_file(image, verify=verify)
         if not is_valid:
             return False, f"Image {idx + 1}: {error}", []
         valid_images.append(image)
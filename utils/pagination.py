@@ -0,0 +1,154 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are addressed by the ordering values of the last row seen rather than
+by an offset, so fetching page N costs the same as page 1 as long as an index
+covers the ordering. The ordering must end in a unique column (normally id).
+Columns may mix directions as long as the index declares the same ones.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+
+def _json_value(value):
+    # Keep full microsecond precision; a truncated timestamp would skip rows
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    raw = json.dumps([_json_value(value) for value in values]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, queryset, ordering):
+    """Decode a cursor into python values for each ordering field"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(ordering):
+        raise InvalidCursor(cursor)
+
+    converted = []
+    for name, value in zip(ordering, values):
+        name = name.lstrip('-')
+        try:
+            field = queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation such as search_rank: keep the JSON value
+            converted.append(value)
+            continue
+        try:
+            converted.append(field.to_python(value))
+        except ValidationError:
+            raise InvalidCursor(cursor)
+    return converted
+
+
+def keyset_filter(ordering, values):
+    """Q object selecting rows strictly after `values` in `ordering`"""
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        descending = name.startswith('-')
+        name = name.lstrip('-')
+        lookup = f"{name}__{'lt' if descending else 'gt'}"
+        condition |= equal & Q(**{lookup: value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=20):
+    """Return a KeysetPage of `page_size` rows after `cursor`"""
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = decode_cursor(cursor, queryset, ordering)
+        queryset = queryset.filter(keyset_filter(ordering, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, name.lstrip('-')) for name in ordering])
+    return KeysetPage(items, next_cursor)
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    DRF pagination on (created_at, id) by default.
+    Views can change the ordering with a `keyset_ordering` attribute.
+    """
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_page_size(self, request):
+        from rest_framework.settings import api_settings
+        page_size = api_settings.PAGE_SIZE or 20
+        try:
+            requested = int(request.query_params.get(self.page_size_query_param, page_size))
+        except (TypeError, ValueError):
+            requested = page_size
+        return max(1, min(requested, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        ordering = getattr(view, 'keyset_ordering', self.ordering)
+        cursor = request.query_params.get(self.cursor_query_param)
+        try:
+            self.page = paginate_keyset(queryset, ordering, cursor, self.get_page_size(request))
+        except InvalidCursor:
+            raise NotFound('Invalid cursor')
+        return self.page.items
+
+    def get_next_link(self):
+        if not self.page.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.page.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
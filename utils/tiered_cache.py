@@ -0,0 +1,185 @@
+"""
+Two-level cache backend.
+
+L1 is a small LRU dictionary inside each process; L2 is a shared cache
+(file, database or Redis) configured under another alias. Reads are served
+from L1 when possible and fall back to L2; writes go to both. L1 entries
+live for at most LOCAL_TIMEOUT seconds, which bounds how long one process
+can see a value another process has already changed.
+
+Atomic operations (add, incr, decr) and keys matching LOCAL_SKIP_PREFIXES
+(the cache version numbers from utils/cache.py) always go to L2.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# One L1 store per process and location, shared by the per-thread cache instances
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class _LocalStore:
+    def __init__(self):
+        self.data = OrderedDict()  # key -> (expires_at, pickled value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+def _get_store(name):
+    with _stores_lock:
+        if name not in _stores:
+            _stores[name] = _LocalStore()
+        return _stores[name]
+
+
+class TieredCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED_ALIAS', 'shared')
+        self._local_max_entries = int(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._local_timeout = float(options.get('LOCAL_TIMEOUT', 5))
+        self._local_skip_prefixes = tuple(options.get('LOCAL_SKIP_PREFIXES', ('version:',)))
+        self._store = _get_store(location or 'default')
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        return self.make_and_validate_key(key, version=version)
+
+    def _skip_local(self, key):
+        return key.startswith(self._local_skip_prefixes)
+
+    def _local_get(self, local_key):
+        store = self._store
+        with store.lock:
+            entry = store.data.get(local_key)
+            if entry is None:
+                return None
+            expires_at, pickled = entry
+            if expires_at < time.monotonic():
+                del store.data[local_key]
+                return None
+            store.data.move_to_end(local_key)
+            store.hits += 1
+        return pickled
+
+    def _local_set(self, local_key, value, timeout):
+        ttl = self._local_timeout
+        if timeout is not None:
+            ttl = min(ttl, timeout)
+        if ttl <= 0:
+            self._local_delete(local_key)
+            return
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        store = self._store
+        with store.lock:
+            store.data[local_key] = (time.monotonic() + ttl, pickled)
+            store.data.move_to_end(local_key)
+            while len(store.data) > self._local_max_entries:
+                store.data.popitem(last=False)
+                store.evictions += 1
+
+    def _local_delete(self, local_key):
+        store = self._store
+        with store.lock:
+            store.data.pop(local_key, None)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        skip_local = self._skip_local(key)
+        if not skip_local:
+            pickled = self._local_get(local_key)
+            if pickled is not None:
+                return pickle.loads(pickled)
+
+        missing = object()
+        value = self.shared.get(key, missing, version=version)
+        with self._store.lock:
+            if value is missing:
+                self._store.misses += 1
+            else:
+                self._store.shared_hits += 1
+        if value is missing:
+            return default
+        if not skip_local:
+            self._local_set(local_key, value, None)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.get_backend_timeout(timeout)
+        self.shared.set(key, value, timeout, version=version)
+        if not self._skip_local(key):
+            self._local_set(self._local_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # Must be decided by L2 so it works as a lock across processes
+        added = self.shared.add(key, value, self.get_backend_timeout(timeout), version=version)
+        if added:
+            self._local_delete(self._local_key(key, version))
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.touch(key, self.get_backend_timeout(timeout), version=version)
+
+    def delete(self, key, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if not self._skip_local(key) and self._local_get(self._local_key(key, version)) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._local_delete(self._local_key(key, version))
+        return self.shared.decr(key, delta, version=version)
+
+    def clear(self):
+        self.clear_local()
+        self.shared.clear()
+
+    def clear_local(self):
+        """Empty this process's L1 only"""
+        with self._store.lock:
+            self._store.data.clear()
+
+    def stats(self):
+        """Hit/miss/eviction counters of this process's L1 since it started"""
+        store = self._store
+        with store.lock:
+            return {
+                'hits': store.hits,
+                'shared_hits': store.shared_hits,
+                'misses': store.misses,
+                'evictions': store.evictions,
+                'local_entries': len(store.data),
+            }
+
+    def close(self, **kwargs):
+        # The shared alias is closed by Django's own request_finished handler
+        pass
+
+
+def is_process_local(alias='default'):
+    """Whether cache `alias`, or the shared tier behind it, is only visible to this process"""
+    backend = caches[alias]
+    if isinstance(backend, TieredCache):
+        backend = backend.shared
+    return isinstance(backend, LocMemCache)